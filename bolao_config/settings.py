@@ -176,9 +176,27 @@ INTERNAL_IPS = [
     '127.0.0.1',
 ]
 
+# Cache compartilhado por todos os processos (web, comandos e agendador): a
+# versão do hall da fama trocada pelo rollup_global_scores precisa chegar ao
+# site. A tabela do DatabaseCache é criada pela migração pools 0029 (ou por
+# manage.py createcachetable); CACHE_BACKEND/CACHE_LOCATION trocam por Redis.
+CACHES = {
+    'default': {
+        'BACKEND': config('CACHE_BACKEND', default='django.core.cache.backends.db.DatabaseCache'),
+        'LOCATION': config('CACHE_LOCATION', default='bolao_cache'),
+    }
+}
+if CACHES['default']['BACKEND'].endswith('DatabaseCache'):
+    CACHES['default']['OPTIONS'] = {'MAX_ENTRIES': config('CACHE_MAX_ENTRIES', default=20000, cast=int)}
+
 # Chave da API Football-Data.org
 FOOTBALL_API_KEY = config('FOOTBALL_API_KEY', default='')
 
+# Respostas brutas das APIs, para reprocessar offline (desativado por padrão; ex.: BASE_DIR / 'api_payloads')
+API_PAYLOAD_DIR = config('API_PAYLOAD_DIR', default=None)
+# Dias de respostas mantidos pelo prune_api_payloads
+API_PAYLOAD_RETENTION_DAYS = config('API_PAYLOAD_RETENTION_DAYS', default=30, cast=int)
+
 # ========================================
 # CONFIGURAÇÕES DE SEGURANÇA (Produção)
 # ========================================
@@ -7,4 +7,5 @@ urlpatterns = [
     path('', views.home, name='home'),
     path('about/', views.about, name='about'),
     path('contact/', views.contact, name='contact'),
+    path('hall-of-fame/', views.hall_of_fame, name='hall_of_fame'),
 ]
\ No newline at end of file
@@ -1,5 +1,6 @@
 from django.shortcuts import render
 from pools.models import Pool
+from pools.rollup import get_hall_of_fame, HALL_OF_FAME_MIN_BETS
 
 def home(request):
     context = {}
@@ -71,3 +72,23 @@ def about(request):
 
 def contact(request):
     return render(request, 'core/contact.html')
+
+def hall_of_fame(request):
+    """Ranking global de todos os bolões (geral, por competição ou por temporada), do rollup noturno"""
+    scope, key = 'overall', ''
+    if request.GET.get('competition', '').isdigit():
+        scope, key = 'competition', request.GET['competition']
+    elif request.GET.get('season'):
+        scope, key = 'season', request.GET['season'][:50]
+    
+    # Competição ou temporada desconhecida cai no ranking geral
+    data = get_hall_of_fame(scope, key)
+    context = {
+        'ranking': data['ranking'],
+        'competitions': data['competitions'],
+        'seasons': data['seasons'],
+        'scope': data['scope'],
+        'key': data['key'],
+        'min_bets': HALL_OF_FAME_MIN_BETS,
+    }
+    return render(request, 'core/hall_of_fame.html', context)
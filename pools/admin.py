@@ -1,6 +1,6 @@
 from django.contrib import admin
 from django.utils.html import format_html
-from .models import Sport, Competition, Pool, Match, Bet, Participation, Championship, Team, Game, Standing
+from .models import Sport, Competition, Pool, Match, Bet, Participation, Championship, Team, Game, Standing, ScoringJob, PoolRescore
 
 class PoolAdmin(admin.ModelAdmin):
     list_display = ['name', 'owner', 'competition', 'status', 'visibility']  # Removido 'admin'
@@ -51,6 +51,17 @@ class StandingAdmin(admin.ModelAdmin):
     list_filter = ('championship',)
     search_fields = ('team__name',)
 
+@admin.register(ScoringJob)
+class ScoringJobAdmin(admin.ModelAdmin):
+    list_display = ('match', 'status', 'attempts', 'bets_updated', 'created_at', 'finished_at', 'lag')
+    list_filter = ('status',)
+    readonly_fields = ('created_at', 'started_at', 'finished_at', 'last_error')
+
+@admin.register(PoolRescore)
+class PoolRescoreAdmin(admin.ModelAdmin):
+    list_display = ('pool', 'status', 'bets_processed', 'bets_changed', 'created_at', 'finished_at')
+    list_filter = ('status',)
+
 admin.site.register(Sport)
 admin.site.register(Competition)
 admin.site.register(Pool, PoolAdmin)
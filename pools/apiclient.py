@@ -0,0 +1,241 @@
+"""
+Shared HTTP client of the external sports APIs.
+
+Every provider request goes through ApiClient.get: one keep-alive
+requests.Session per process (connections are reused across requests and
+sync threads instead of a TCP and TLS handshake per call), explicit connect
+and read timeouts so a hung provider cannot stall the scheduler, and retries
+of connection errors, timeouts, 429 and 5xx responses with jittered
+exponential backoff that honours Retry-After. Every attempt takes a token
+from the host's rate limiter (pools.ratelimit) and is counted in the
+per-endpoint latency and error statistics (see stats and format_stats).
+The bodies of the 200 responses are captured to the payload store
+(pools.payloads) when one is configured.
+
+replay_client builds a client that serves the stored payloads instead, for
+offline replays; use_client swaps it in as the process-wide client.
+"""
+
+import logging
+import random
+import threading
+import time
+from contextlib import contextmanager
+from email.utils import parsedate_to_datetime
+
+import requests
+from django.conf import settings
+from requests.adapters import HTTPAdapter
+
+from .payloads import ReplaySession, endpoint_of, get_payload_store
+from .ratelimit import limiter_for
+
+logger = logging.getLogger(__name__)
+
+# (conexão, leitura) em segundos; sobrescrito por settings.API_HTTP_TIMEOUT
+DEFAULT_TIMEOUT = (5, 30)
+DEFAULT_RETRIES = 3
+BACKOFF_BASE = 1.0
+BACKOFF_MAX = 60.0
+# Espera máxima aceita de um Retry-After, para não travar um worker
+RETRY_AFTER_MAX = 120.0
+POOL_SIZE = 10
+
+RETRY_STATUSES = frozenset({429, 500, 502, 503, 504})
+
+
+def retry_after_seconds(value, now=None):
+    """Seconds asked by a Retry-After header (delta-seconds or HTTP date), or None"""
+    if not value:
+        return None
+    try:
+        return max(float(value), 0.0)
+    except ValueError:
+        pass
+    try:
+        moment = parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+    now = now if now is not None else time.time()
+    return max(moment.timestamp() - now, 0.0)
+
+
+class EndpointStats:
+    """Attempts, retries, errors and latency of one endpoint"""
+
+    __slots__ = ('requests', 'retries', 'errors', 'statuses', 'total_time', 'max_time')
+
+    def __init__(self):
+        self.requests = 0
+        self.retries = 0
+        self.errors = 0
+        self.statuses = {}
+        self.total_time = 0.0
+        self.max_time = 0.0
+
+    def as_dict(self):
+        return {
+            'requests': self.requests,
+            'retries': self.retries,
+            'errors': self.errors,
+            'statuses': dict(self.statuses),
+            'avg_ms': round(self.total_time / self.requests * 1000, 1) if self.requests else 0.0,
+            'max_ms': round(self.max_time * 1000, 1),
+        }
+
+
+class ApiClient:
+    """Pooled, retrying, rate-limited GET client; safe to share between threads"""
+
+    def __init__(self, session=None, timeout=None, retries=DEFAULT_RETRIES, backoff_base=BACKOFF_BASE,
+                 backoff_max=BACKOFF_MAX, sleep=time.sleep, clock=time.monotonic, rand=random.random,
+                 store=None, rate_limited=True):
+        if session is None:
+            session = requests.Session()
+            adapter = HTTPAdapter(pool_connections=POOL_SIZE, pool_maxsize=POOL_SIZE)
+            session.mount('https://', adapter)
+            session.mount('http://', adapter)
+        self.session = session
+        self.timeout = timeout or getattr(settings, 'API_HTTP_TIMEOUT', DEFAULT_TIMEOUT)
+        self.retries = retries
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.sleep = sleep
+        self.clock = clock
+        self.rand = rand
+        self.store = store
+        self.rate_limited = rate_limited
+        self._stats = {}
+        self._lock = threading.Lock()
+
+    def backoff(self, attempt, response=None):
+        """
+        Seconds to wait before retry number `attempt` (from 1): the response's
+        Retry-After when given (capped at RETRY_AFTER_MAX), otherwise full
+        jitter over an exponential ceiling, so concurrent workers that failed
+        together do not retry together.
+        """
+        if response is not None:
+            retry_after = retry_after_seconds(response.headers.get('Retry-After'))
+            if retry_after is not None:
+                return min(retry_after, RETRY_AFTER_MAX)
+        return self.rand() * min(self.backoff_max, self.backoff_base * 2 ** (attempt - 1))
+
+    def get(self, url, **kwargs):
+        """
+        GET a provider URL. Returns the response, which after the retries may
+        still be a 429 or 5xx one (callers check status_code); raises the last
+        requests exception when every attempt failed to connect or timed out.
+        """
+        kwargs.setdefault('timeout', self.timeout)
+        endpoint = endpoint_of(url)
+        limiter = limiter_for(url) if self.rate_limited else None
+        attempt = 0
+        while True:
+            if limiter is not None:
+                limiter.acquire()
+            started = self.clock()
+            try:
+                response = self.session.get(url, **kwargs)
+            except (requests.ConnectionError, requests.Timeout) as e:
+                self._record(endpoint, self.clock() - started, None, retry=attempt > 0)
+                if attempt >= self.retries:
+                    self._record_error(endpoint)
+                    raise
+                attempt += 1
+                wait = self.backoff(attempt)
+                logger.warning(f"{endpoint}: {e.__class__.__name__}, tentativa {attempt} em {wait:.1f}s")
+                self.sleep(wait)
+                continue
+
+            self._record(endpoint, self.clock() - started, response.status_code, retry=attempt > 0)
+            if response.status_code not in RETRY_STATUSES:
+                if response.status_code == 200 and self.store is not None:
+                    self.capture(endpoint, kwargs.get('params'), response)
+                return response
+            if attempt >= self.retries:
+                self._record_error(endpoint)
+                return response
+            attempt += 1
+            wait = self.backoff(attempt, response)
+            logger.warning(f"{endpoint}: HTTP {response.status_code}, tentativa {attempt} em {wait:.1f}s")
+            response.close()
+            self.sleep(wait)
+
+    def capture(self, endpoint, params, response):
+        """Save a response body to the payload store; a failure only logs"""
+        try:
+            self.store.save(endpoint, params, response.content, response.headers)
+        except OSError as e:
+            logger.warning(f"{endpoint}: payload não armazenado ({e})")
+
+    def _record(self, endpoint, elapsed, status, retry):
+        with self._lock:
+            stats = self._stats.get(endpoint)
+            if stats is None:
+                stats = self._stats[endpoint] = EndpointStats()
+            stats.requests += 1
+            stats.retries += retry
+            key = status if status is not None else 'error'
+            stats.statuses[key] = stats.statuses.get(key, 0) + 1
+            stats.total_time += elapsed
+            stats.max_time = max(stats.max_time, elapsed)
+
+    def _record_error(self, endpoint):
+        with self._lock:
+            self._stats[endpoint].errors += 1
+
+    def stats(self):
+        """{endpoint: counters} snapshot of the statistics since the last reset"""
+        with self._lock:
+            return {endpoint: stats.as_dict() for endpoint, stats in sorted(self._stats.items())}
+
+    def reset_stats(self):
+        with self._lock:
+            self._stats = {}
+
+
+def format_stats(stats):
+    """One line per endpoint of an ApiClient.stats() snapshot"""
+    return [
+        f"{endpoint}: {counters['requests']} requests, {counters['retries']} retries, "
+        f"{counters['errors']} errors, avg {counters['avg_ms']} ms, max {counters['max_ms']} ms"
+        for endpoint, counters in stats.items()
+    ]
+
+
+_client = None
+_client_lock = threading.Lock()
+
+
+def get_client():
+    """The process-wide ApiClient"""
+    global _client
+    with _client_lock:
+        if _client is None:
+            _client = ApiClient(store=get_payload_store())
+        return _client
+
+
+def replay_client(store=None, until=None):
+    """Client answering from the payload store (latest payloads up to `until`), without network or quota"""
+    store = store or get_payload_store()
+    return ApiClient(session=ReplaySession(store, until), retries=0, rate_limited=False)
+
+
+@contextmanager
+def use_client(client):
+    """Make `client` the process-wide client inside the block"""
+    global _client
+    with _client_lock:
+        previous, _client = _client, client
+    try:
+        yield client
+    finally:
+        with _client_lock:
+            _client = previous
+
+
+def api_get(url, **kwargs):
+    """GET through the shared client: pooled, rate-limited and retried"""
+    return get_client().get(url, **kwargs)
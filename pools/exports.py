@@ -0,0 +1,113 @@
+"""
+Streaming CSV exports of a pool's ranking and bets matrix.
+
+Rows are produced by generators and sent with StreamingHttpResponse, so the
+first bytes leave right away and memory stays flat whatever the pool size.
+The database is read in keyset chunks (MySQL drivers buffer a whole result
+set, even through iterator(), so big results are split instead): the ranking
+pages through the (pool, -points, user) index and the bets matrix reads the
+bets of MATRIX_CHUNK participants at a time. Exports can optionally be
+gzip-compressed on the fly.
+"""
+
+import csv
+import zlib
+
+from django.utils import timezone
+
+from .leaderboard import keyset_page
+from .models import Bet, Match, Participation
+
+EXPORT_CHUNK = 1000
+
+# Participantes por leitura de apostas na matriz (linhas = participantes x partidas)
+MATRIX_CHUNK = 200
+
+
+class Echo:
+    """File-like object whose write() returns the value, for csv.writer"""
+
+    def write(self, value):
+        return value
+
+
+def csv_lines(header, rows):
+    """Encode a header and rows as CSV, one bytes line at a time"""
+    writer = csv.writer(Echo())
+    yield writer.writerow(header).encode('utf-8')
+    for row in rows:
+        yield writer.writerow(row).encode('utf-8')
+
+
+def gzip_stream(chunks, level=6):
+    """Compress a stream of bytes chunks into a gzip stream, incrementally"""
+    compressor = zlib.compressobj(level, zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+    for chunk in chunks:
+        data = compressor.compress(chunk)
+        if data:
+            yield data
+    yield compressor.flush()
+
+
+RANKING_HEADER = ['Posição', 'Usuário', 'Pontos', 'Apostas', 'Aproveitamento (%)']
+
+
+def ranking_rows(pool):
+    """Ranking rows in order, read in keyset pages of EXPORT_CHUNK participants"""
+    rows = Participation.objects.filter(pool=pool).values(
+        'rank', 'user__username', 'points', 'total_bets', 'accuracy', 'user_id'
+    )
+    cursor = None
+    while True:
+        page, cursor, _ = keyset_page(rows, EXPORT_CHUNK, cursor=cursor)
+        for row in page:
+            yield [row['rank'], row['user__username'], row['points'], row['total_bets'], row['accuracy']]
+        if cursor is None:
+            break
+
+
+BETS_HEADER = [
+    'Usuário', 'ID da partida', 'Data', 'Mandante', 'Visitante', 'Placar',
+    'Palpite mandante', 'Palpite visitante', 'Pontos',
+]
+
+
+def bets_matrix_rows(pool, now=None):
+    """
+    One row per participant x match, for the matches that already started
+    (predictions on upcoming matches stay private). Participants without a bet
+    on a match get empty prediction cells.
+    """
+    now = now or timezone.now()
+    matches = [
+        (
+            match.id,
+            timezone.localtime(match.start_time).strftime('%d/%m/%Y %H:%M'),
+            str(match.home_team or ''),
+            str(match.away_team or ''),
+            f"{match.home_score} x {match.away_score}" if match.home_score is not None and match.away_score is not None else '',
+        )
+        for match in Match.objects.filter(pool=pool, start_time__lte=now)
+        .select_related('home_team', 'away_team').order_by('start_time', 'id')
+    ]
+    if not matches:
+        return
+
+    participants = Participation.objects.filter(pool=pool).order_by('user_id').values_list('user_id', 'user__username')
+    last_user_id = 0
+    while True:
+        chunk = list(participants.filter(user_id__gt=last_user_id)[:MATRIX_CHUNK])
+        if not chunk:
+            break
+        last_user_id = chunk[-1][0]
+
+        bets = {
+            (user_id, match_id): (home, away, points)
+            for user_id, match_id, home, away, points in Bet.objects.filter(
+                pool=pool, user_id__in=[user_id for user_id, _ in chunk], match_id__in=[match[0] for match in matches]
+            ).values_list('user_id', 'match_id', 'home_score_bet', 'away_score_bet', 'points_earned')
+        }
+        for user_id, username in chunk:
+            for match_id, kickoff, home_team, away_team, score in matches:
+                home, away, points = bets.get((user_id, match_id), ('', '', ''))
+                yield [username, match_id, kickoff, home_team, away_team, score, home, away, points]
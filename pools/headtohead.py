@@ -0,0 +1,148 @@
+"""
+Head-to-head comparison of two participants of a pool.
+
+The pool's finished bets are loaded once into a participants x matches bet
+matrix (predicted scores and points, as small NumPy arrays) and cached per
+results version, so a comparison is two row lookups and a few vectorized
+operations over the season's matches instead of per-match queries.
+"""
+
+import numpy as np
+from django.core.cache import cache
+from django.utils import timezone
+
+from .models import Bet, Match, Participation
+from .ranking import pool_cache_key
+
+BET_MATRIX_CACHE_TIMEOUT = 60 * 60 * 24
+
+# Célula sem aposta nas matrizes de palpites
+NO_BET = -1
+
+
+def build_bet_matrix(pool):
+    """
+    Bet matrix of a pool's finished matches, in kickoff order.
+
+    Three queries: the matches, the participants and the bets. Returns a dict
+    with 'user_ids' (sorted), 'matches' (list of {'id', 'kickoff', 'round',
+    'home_team', 'away_team', 'home_score', 'away_score'}), the results as
+    arrays 'real_home' and 'real_away' and the participants x matches arrays
+    'home' and 'away' (predicted scores, NO_BET where there is no bet) and
+    'points'.
+    """
+    matches = list(
+        Match.objects.filter(pool=pool, finished=True, home_score__isnull=False, away_score__isnull=False)
+        .order_by('start_time', 'id')
+        .values('id', 'start_time', 'round', 'home_team__name', 'away_team__name', 'home_score', 'away_score')
+    )
+    user_ids = np.array(
+        Participation.objects.filter(pool=pool).order_by('user_id').values_list('user_id', flat=True), dtype=np.int64
+    )
+    match_ids = np.array([match['id'] for match in matches], dtype=np.int64)
+    order = np.argsort(match_ids)
+
+    shape = (len(user_ids), len(matches))
+    home = np.full(shape, NO_BET, dtype=np.int16)
+    away = np.full(shape, NO_BET, dtype=np.int16)
+    points = np.zeros(shape, dtype=np.int16)
+
+    rows = list(Bet.objects.filter(pool=pool, match_id__in=match_ids.tolist()).values_list(
+        'user_id', 'match_id', 'home_score_bet', 'away_score_bet', 'points_earned'
+    ))
+    if rows and len(user_ids):
+        bet_users, bet_matches, bet_home, bet_away, bet_points = np.array(rows, dtype=np.int64).T
+        # Apostas de quem saiu do bolão ficam de fora
+        known = np.isin(bet_users, user_ids)
+        user_index = np.searchsorted(user_ids, bet_users[known])
+        match_index = order[np.searchsorted(match_ids[order], bet_matches[known])]
+        home[user_index, match_index] = bet_home[known]
+        away[user_index, match_index] = bet_away[known]
+        points[user_index, match_index] = bet_points[known]
+
+    return {
+        'user_ids': user_ids,
+        'matches': [
+            {
+                'id': match['id'],
+                'kickoff': match['start_time'],
+                'round': match['round'],
+                'home_team': match['home_team__name'] or '',
+                'away_team': match['away_team__name'] or '',
+                'home_score': match['home_score'],
+                'away_score': match['away_score'],
+            }
+            for match in matches
+        ],
+        'real_home': np.array([match['home_score'] for match in matches], dtype=np.int16),
+        'real_away': np.array([match['away_score'] for match in matches], dtype=np.int16),
+        'home': home,
+        'away': away,
+        'points': points,
+    }
+
+
+def get_bet_matrix(pool):
+    """Cached build_bet_matrix for the pool's current results"""
+    key = pool_cache_key(pool, 'bet_matrix')
+    matrix = cache.get(key)
+    if matrix is None:
+        matrix = build_bet_matrix(pool)
+        cache.set(key, matrix, BET_MATRIX_CACHE_TIMEOUT)
+    return matrix
+
+
+def head_to_head(matrix, user_a, user_b):
+    """
+    Compare two participants over the matches both bet on.
+
+    Returns None when either is not in the matrix, otherwise a dict with
+    'summary' (points, wins and draws over the common matches, plus common
+    exact-score hits), 'matches' (per common match: the match, both
+    predictions and points and the 'winner': 'a', 'b' or 'draw'),
+    'difference' (cumulative points of a minus b after each common match)
+    and 'common_exact' (ids of the matches both got exactly right).
+    """
+    user_ids = matrix['user_ids']
+    if len(user_ids) == 0:
+        return None
+    rows = np.minimum(np.searchsorted(user_ids, [user_a, user_b]), len(user_ids) - 1)
+    if (user_ids[rows] != [user_a, user_b]).any():
+        return None
+
+    home, away, points = matrix['home'][rows], matrix['away'][rows], matrix['points'][rows].astype(np.int64)
+    common = np.flatnonzero((home != NO_BET).all(axis=0))
+    home, away, points = home[:, common], away[:, common], points[:, common]
+
+    exact = (home == matrix['real_home'][common]) & (away == matrix['real_away'][common])
+    both_exact = exact.all(axis=0)
+    difference = np.cumsum(points[0] - points[1])
+    winner = np.where(points[0] > points[1], 'a', np.where(points[0] < points[1], 'b', 'draw'))
+
+    return {
+        'summary': {
+            'common_matches': len(common),
+            'points_a': int(points[0].sum()),
+            'points_b': int(points[1].sum()),
+            'wins_a': int((points[0] > points[1]).sum()),
+            'wins_b': int((points[0] < points[1]).sum()),
+            'draws': int((points[0] == points[1]).sum()),
+            'exact_a': int(exact[0].sum()),
+            'exact_b': int(exact[1].sum()),
+            'common_exact': int(both_exact.sum()),
+        },
+        'matches': [
+            {
+                **matrix['matches'][match_index],
+                'kickoff': timezone.localtime(matrix['matches'][match_index]['kickoff']).isoformat(),
+                'bet_a': [int(home[0, i]), int(away[0, i])],
+                'bet_b': [int(home[1, i]), int(away[1, i])],
+                'points_a': int(points[0, i]),
+                'points_b': int(points[1, i]),
+                'winner': str(winner[i]),
+            }
+            for i, match_index in enumerate(common.tolist())
+        ],
+        'difference': difference.tolist(),
+        'common_exact': [matrix['matches'][i]['id'] for i in common[both_exact].tolist()],
+    }
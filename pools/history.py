@@ -0,0 +1,101 @@
+"""
+Cumulative points history per round.
+
+Scoring keeps one RoundPoints row per (pool, participant, round) with the
+points earned in that round (see pools.scoring.apply_bucket_deltas). The
+evolution of any set of participants is read with one query over those rows
+(plus one for the pool's rounds), laid out as a participants x rounds array
+and accumulated with a cumulative sum, instead of looking up every
+participant's bet on every match.
+
+WeekPoints holds the same points bucketed by the ISO week of kickoff, so a
+ranking over any window of weeks or rounds (last week, last month, rounds
+10-15) sums a handful of bucket rows per participant.
+"""
+
+from datetime import timedelta
+
+import numpy as np
+from django.contrib.auth import get_user_model
+from django.db.models import Sum
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+
+from .models import Match, RoundPoints, WeekPoints
+from .ranking import competition_ranks
+
+
+def round_label(round_number):
+    """Chart label of a round; matches without a round are grouped under 0"""
+    return f"R{round_number}" if round_number else "Extra"
+
+
+def points_history(pool, user_ids):
+    """
+    Cumulative points per round for the given participants.
+
+    Returns (rounds, history): the sorted round numbers of the pool's
+    finished matches and {user_id: [cumulative points after each round]}.
+    Participants without points in a round keep their previous total.
+    """
+    user_ids = [int(user_id) for user_id in user_ids]
+    rounds = np.array(sorted(
+        Match.objects.filter(pool=pool, finished=True).annotate(
+            round_number=Coalesce('round', 0)
+        ).order_by().values_list('round_number', flat=True).distinct()
+    ), dtype=np.int64)
+
+    history = np.zeros((len(user_ids), len(rounds)), dtype=np.int64)
+    rows = list(RoundPoints.objects.filter(pool=pool, user_id__in=user_ids).values_list('user_id', 'round', 'points'))
+    if rows and len(rounds):
+        row_users, row_rounds, points = (np.array(column, dtype=np.int64) for column in zip(*rows))
+        index = {user_id: i for i, user_id in enumerate(user_ids)}
+        positions = np.searchsorted(rounds, row_rounds)
+        # Rodadas sem partida finalizada (resultado desfeito) ficam de fora
+        known = (positions < len(rounds)) & (rounds[np.minimum(positions, len(rounds) - 1)] == row_rounds)
+        np.add.at(
+            history,
+            (np.array([index[user_id] for user_id in row_users[known].tolist()], dtype=np.int64), positions[known]),
+            points[known],
+        )
+
+    cumulative = np.cumsum(history, axis=1)
+    return rounds.tolist(), {user_id: cumulative[i].tolist() for i, user_id in enumerate(user_ids)}
+
+
+def last_weeks(count=1, moment=None):
+    """(first, last) Mondays of the `count` ISO weeks ending with the week of `moment` (default: now)"""
+    last = WeekPoints.week_of(moment or timezone.now())
+    return last - timedelta(weeks=count - 1), last
+
+
+def window_ranking(pool, weeks=None, rounds=None, limit=None):
+    """
+    Ranking of the points earned within a window of buckets.
+
+    weeks is an inclusive (first, last) pair of Mondays (see last_weeks) and
+    rounds an inclusive (first, last) pair of round numbers. Only
+    participants with points in the window are listed. Returns a list of
+    {'user', 'points', 'position'} dicts (competition positions), with the
+    users read in one batch.
+    """
+    if rounds is not None:
+        buckets = RoundPoints.objects.filter(pool=pool, round__range=rounds)
+    else:
+        buckets = WeekPoints.objects.filter(pool=pool, week__range=weeks or last_weeks())
+
+    totals = list(
+        buckets.values('user_id').annotate(total=Sum('points')).filter(total__gt=0)
+        .order_by('-total', 'user_id').values_list('user_id', 'total')
+    )
+    if not totals:
+        return []
+
+    positions = competition_ranks([total for _, total in totals])
+    totals = list(zip(totals, positions.tolist()))[:limit]
+    users = get_user_model().objects.select_related('profile').in_bulk([user_id for (user_id, _), _ in totals])
+    return [
+        {'user': users[user_id], 'points': total, 'position': position}
+        for (user_id, total), position in totals
+        if user_id in users
+    ]
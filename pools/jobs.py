@@ -0,0 +1,162 @@
+"""
+Deferred scoring work queue.
+
+Saving a finished Match only enqueues a ScoringJob (see
+pools.models.update_bets_points). The process_scoring_jobs worker claims
+pending jobs in batches, scores the match with pools.scoring.score_match and
+sends the result e-mails. Jobs are keyed by Match.result_version, so each
+actual score change is scored once; jobs superseded by a newer version are
+skipped. Scoring is idempotent, so a job that is retried or processed twice
+never double-counts points.
+
+A running job holds a lease: its worker renews heartbeat_at every
+HEARTBEAT_SECONDS while its batch runs (see heartbeat), and requeue_stale_jobs only takes back
+jobs whose lease expired (the worker died), however long the scoring and the
+e-mails legitimately take. The attempt counter doubles as a fencing token: a
+worker whose job was taken back finishes without sending e-mails or
+overwriting the new claim.
+"""
+
+import logging
+import threading
+from contextlib import contextmanager
+from datetime import timedelta
+
+from django.db import connection, transaction
+from django.db.models import F, Min, Q
+from django.utils import timezone
+
+from .models import ScoringJob
+from .scoring import score_match
+
+logger = logging.getLogger(__name__)
+
+RETRY_BASE_SECONDS = 30
+# Renovação do lease de um job em execução; bem menor que o stale_after do worker
+HEARTBEAT_SECONDS = 30
+
+
+def claim_jobs(batch_size=50):
+    """Atomically mark up to batch_size due jobs as running and return them"""
+    with transaction.atomic():
+        jobs = list(
+            ScoringJob.objects.select_for_update(
+                skip_locked=connection.features.has_select_for_update_skip_locked
+            ).filter(
+                status='pending',
+                available_at__lte=timezone.now()
+            ).order_by('available_at')[:batch_size]
+        )
+        if jobs:
+            now = timezone.now()
+            for job in jobs:
+                job.status = 'running'
+                job.attempts += 1
+                job.started_at = job.heartbeat_at = now
+            ScoringJob.objects.bulk_update(jobs, ['status', 'attempts', 'started_at', 'heartbeat_at'])
+    return jobs
+
+
+def claimed(jobs):
+    """Filter matching the given jobs while still running under their current claims"""
+    condition = Q(pk__in=[])
+    for job in jobs:
+        condition |= Q(pk=job.pk, attempts=job.attempts)
+    return ScoringJob.objects.filter(condition, status='running')
+
+
+@contextmanager
+def heartbeat(jobs, interval=HEARTBEAT_SECONDS):
+    """
+    Renew the lease of claimed jobs from a background thread while the block
+    runs; a worker wraps its whole batch, so the jobs waiting for their turn
+    are not taken back either.
+    """
+    stop = threading.Event()
+
+    def renew():
+        renewed = False
+        try:
+            while not stop.wait(interval):
+                renewed = True
+                claimed(jobs).update(heartbeat_at=timezone.now())
+        except Exception as e:
+            logger.warning(f"Heartbeat dos jobs de pontuação falhou: {e}")
+        finally:
+            if renewed:
+                connection.close()
+
+    thread = threading.Thread(target=renew, name='scoring-jobs-heartbeat', daemon=True)
+    thread.start()
+    try:
+        yield
+    finally:
+        stop.set()
+        thread.join()
+
+
+def finish_job(job, **fields):
+    """Store the outcome of a claimed job, unless the claim was lost meanwhile"""
+    for name, value in fields.items():
+        setattr(job, name, value)
+    return claimed([job]).update(**fields) > 0
+
+
+def run_job(job):
+    """Process a claimed job; on error, schedule a retry with exponential backoff"""
+    from .signals import send_result_notifications
+
+    try:
+        match = job.match
+        if job.result_version < match.result_version:
+            # Resultado corrigido depois: o job da versão nova fará a pontuação
+            finish_job(job, status='done', finished_at=timezone.now())
+            return True
+        job.bets_updated = score_match(match)
+        if not claimed([job]).exists():
+            # Job devolvido à fila e reivindicado por outro worker: ele envia os e-mails
+            logger.warning(f"Job de pontuação {job.pk} perdeu o lease; e-mails não enviados")
+            return False
+        send_result_notifications(match)
+    except Exception as e:
+        logger.error(f"Erro ao processar job de pontuação {job.pk}: {e}")
+        if job.attempts >= job.max_attempts:
+            finish_job(job, status='failed', last_error=str(e), finished_at=timezone.now())
+        else:
+            finish_job(
+                job, status='pending', last_error=str(e),
+                available_at=timezone.now() + timedelta(seconds=RETRY_BASE_SECONDS * 2 ** (job.attempts - 1)),
+            )
+        return False
+
+    return finish_job(job, status='done', bets_updated=job.bets_updated, finished_at=timezone.now(), last_error='')
+
+
+def requeue_stale_jobs(stale_after=timedelta(minutes=10)):
+    """
+    Take back running jobs whose lease expired (no heartbeat for stale_after,
+    so their worker died): back to the queue, or failed when they already
+    used all their attempts. Returns the number of jobs taken back.
+    """
+    now = timezone.now()
+    stale = ScoringJob.objects.filter(
+        Q(heartbeat_at__lt=now - stale_after) | Q(heartbeat_at__isnull=True, started_at__lt=now - stale_after),
+        status='running',
+    )
+    failed = stale.filter(attempts__gte=F('max_attempts')).update(
+        status='failed', finished_at=now, last_error='Worker abandonou o job (lease expirado)'
+    )
+    return failed + stale.filter(attempts__lt=F('max_attempts')).update(status='pending', available_at=now)
+
+
+def queue_stats():
+    """Queue depth and lag (age of the oldest due job) for monitoring"""
+    now = timezone.now()
+    pending = ScoringJob.objects.filter(status='pending')
+    oldest = pending.filter(available_at__lte=now).aggregate(oldest=Min('created_at'))['oldest']
+    return {
+        'pending': pending.count(),
+        'running': ScoringJob.objects.filter(status='running').count(),
+        'failed': ScoringJob.objects.filter(status='failed').count(),
+        'lag_seconds': (now - oldest).total_seconds() if oldest else 0,
+    }
@@ -0,0 +1,452 @@
+"""
+Materialized pool leaderboard.
+
+Each Participation row carries the participant's leaderboard columns: points,
+competition rank, bet counters, accuracy, average points and last movement.
+Scoring keeps them current incrementally: the point and counter deltas of
+the scored bets are added with F() updates (pools.scoring), then
+refresh_leaderboard recomputes ranks and derived columns in memory for the
+affected pools and writes only the rows that changed.
+
+Streaks and trends are extended incrementally by advance_streaks when a
+match is scored: each participation keeps its latest points
+(recent_points), so the new bets are enough when the match is the bettor's
+latest one. Otherwise (a match scored out of kickoff order, a corrected
+result) refresh_streaks recomputes the affected participants with a single
+pass over their scored bets ordered by kickoff.
+
+refresh_snapshots keeps one packed RankingSnapshot per completed round,
+derived from the current points minus the RoundPoints of later rounds, so
+round_movements can tell where everyone stood N rounds ago without
+replaying any bets.
+
+Pages then read the leaderboard with one indexed scan over (pool, rank)
+instead of aggregating the bets on every request, and user_positions answers
+"where am I" for all of a user's pools at once with index seeks. Big pools are
+read in pages with keyset_page: cursors over (points, user id) seek the
+(pool, -points, user) index, so any page costs the same as the first one.
+"""
+
+import base64
+from collections import defaultdict
+
+import numpy as np
+from django.db.models import Case, Count, F, Q, Value, When
+from django.utils import timezone
+
+from .models import Bet, Match, Participation, RankingSnapshot, RoundPoints
+from .ranking import competition_ranks, pack_standings
+
+LEADERBOARD_FIELDS = ('rank', 'last_movement', 'accuracy', 'avg_points')
+STREAK_FIELDS = ('current_streak', 'longest_streak', 'trend')
+STREAK_STATE_FIELDS = STREAK_FIELDS + ('recent_points',)
+
+# Tendência: média das TREND_WINDOW apostas mais recentes contra as TREND_WINDOW anteriores
+TREND_WINDOW = 3
+TREND_UP, TREND_DOWN = 1.2, 0.8
+
+
+def update_rows(model, rows, fields):
+    """
+    Write {pk: values} rows (values in `fields` order) with a single UPDATE:
+    per field, one CASE grouped by value, so the statement count does not
+    depend on the number of rows. Returns the number of rows updated.
+    """
+    if not rows:
+        return 0
+    updates = {}
+    for position, name in enumerate(fields):
+        by_value = defaultdict(list)
+        for pk, values in rows.items():
+            by_value[values[position]].append(pk)
+        updates[name] = Case(
+            *[When(pk__in=pks, then=Value(value)) for value, pks in by_value.items()],
+            default=F(name),
+            output_field=model._meta.get_field(name),
+        )
+    return model.objects.filter(pk__in=list(rows)).update(**updates)
+
+
+def refresh_leaderboard(pool_ids):
+    """
+    Recompute rank, movement, accuracy and average points of the given pools.
+
+    One read per pool and one UPDATE of the changed rows. Movement is
+    only updated for participants whose rank actually changed, so it keeps
+    showing the last move until the next one. Returns the number of rows
+    written.
+    """
+    written = 0
+    for pool_id in sorted(set(pool_ids)):
+        rows = list(Participation.objects.filter(pool_id=pool_id).values_list(
+            'id', 'points', 'correct_bets', 'finished_bets', *LEADERBOARD_FIELDS
+        ))
+        if not rows:
+            continue
+
+        ids, points, correct, finished, old_rank, old_movement = (
+            np.array(column, dtype=np.int64) for column in list(zip(*rows))[:6]
+        )
+        old_accuracy, old_avg = (np.array(column, dtype=np.float64) for column in list(zip(*rows))[6:])
+
+        rank = competition_ranks(points)
+        moved = (old_rank > 0) & (old_rank != rank)
+        movement = np.where(moved, old_rank - rank, old_movement)
+
+        with np.errstate(divide='ignore', invalid='ignore'):
+            accuracy = np.where(finished > 0, np.round(correct * 100 / finished, 2), 0.0)
+            avg_points = np.where(finished > 0, np.round(points / finished, 2), 0.0)
+
+        changed = (
+            (rank != old_rank) | (movement != old_movement) |
+            (accuracy != old_accuracy) | (avg_points != old_avg)
+        )
+        if not changed.any():
+            continue
+
+        update_rows(
+            Participation,
+            {
+                int(ids[i]): (int(rank[i]), int(movement[i]), float(accuracy[i]), float(avg_points[i]))
+                for i in np.flatnonzero(changed)
+            },
+            LEADERBOARD_FIELDS,
+        )
+        written += int(changed.sum())
+    return written
+
+
+def bet_trend(recent_points):
+    """
+    'up', 'down' or 'stable' from the latest finished bets' points (oldest first).
+
+    Compares the average of the last TREND_WINDOW bets with the average of up
+    to TREND_WINDOW bets before them.
+    """
+    recent = recent_points[-TREND_WINDOW:]
+    previous = recent_points[-2 * TREND_WINDOW:-TREND_WINDOW]
+    if len(recent) < TREND_WINDOW or not previous:
+        return 'stable'
+
+    recent_avg = sum(recent) / len(recent)
+    previous_avg = sum(previous) / len(previous)
+    if recent_avg > previous_avg * TREND_UP:
+        return 'up'
+    if recent_avg < previous_avg * TREND_DOWN:
+        return 'down'
+    return 'stable'
+
+
+def streak_states(rows):
+    """
+    Streak state per participant from (user_id, points) rows ordered by user
+    and kickoff. A single pass keeping only the current participant's
+    state. Returns {user_id: (current_streak, longest_streak, recent)},
+    where recent holds the latest 2 * TREND_WINDOW points, oldest first.
+    """
+    results = {}
+    user_id = None
+    current = longest = 0
+    recent = []
+    for row_user, points in rows:
+        if row_user != user_id:
+            if user_id is not None:
+                results[user_id] = (current, longest, recent)
+            user_id, current, longest, recent = row_user, 0, 0, []
+        current = current + 1 if points > 0 else 0
+        longest = max(longest, current)
+        recent.append(points)
+        if len(recent) > 2 * TREND_WINDOW:
+            del recent[0]
+    if user_id is not None:
+        results[user_id] = (current, longest, recent)
+    return results
+
+
+def compute_streaks(rows):
+    """Streaks and trend per participant: {user_id: (current_streak, longest_streak, trend)}"""
+    return {
+        user_id: (current, longest, bet_trend(recent))
+        for user_id, (current, longest, recent) in streak_states(rows).items()
+    }
+
+
+def streak_values(current, longest, recent):
+    """STREAK_STATE_FIELDS values of a streak state"""
+    return (current, longest, bet_trend(recent), ','.join(str(points) for points in recent))
+
+
+def refresh_streaks(pool_ids, user_ids=None):
+    """
+    Recompute current streak, longest streak and trend of the given pools
+    (only of the given participants, when user_ids is passed).
+
+    The scored bets are streamed once, ordered by participant and kickoff,
+    and only the participations whose values changed are written. Returns
+    the number of rows written.
+    """
+    written = 0
+    users = Q() if user_ids is None else Q(user_id__in=list(user_ids))
+    for pool_id in sorted(set(pool_ids)):
+        rows = Bet.objects.filter(users, pool_id=pool_id, match__scored=True).order_by(
+            'user_id', 'match__start_time', 'match_id'
+        ).values_list('user_id', 'points_earned')
+        states = streak_states(rows.iterator(chunk_size=5000))
+
+        changed = {}
+        for participation_id, user_id, *stored in Participation.objects.filter(users, pool_id=pool_id).values_list(
+            'id', 'user_id', *STREAK_STATE_FIELDS
+        ):
+            values = streak_values(*states.get(user_id, (0, 0, [])))
+            if tuple(stored) != values:
+                changed[participation_id] = values
+
+        update_rows(Participation, changed, STREAK_STATE_FIELDS)
+        written += len(changed)
+    return written
+
+
+def advance_streaks(match_id, kickoff, bets):
+    """
+    Extend the streaks and trends with the bets of a match scored for the
+    first time, given as (user_id, pool_id, points) rows.
+
+    For each bettor whose latest scored bet is older than this match (by
+    kickoff, then match id), the new points are appended to the stored
+    state. Bettors with a later scored bet, or without a stored state yet,
+    are recomputed with refresh_streaks. Returns the number of rows written.
+    """
+    bets = [(int(user_id), int(pool_id), int(points)) for user_id, pool_id, points in bets]
+    pool_ids = sorted({pool_id for _, pool_id, _ in bets})
+    if not pool_ids:
+        return 0
+
+    # Partidas já pontuadas depois desta: poucas, pois a pontuação segue o calendário
+    later_matches = list(Match.objects.filter(
+        Q(start_time__gt=kickoff) | Q(start_time=kickoff, pk__gt=match_id), scored=True
+    ).values_list('id', flat=True))
+    later = set(Bet.objects.filter(pool_id__in=pool_ids, match_id__in=later_matches).values_list(
+        'pool_id', 'user_id'
+    ).distinct()) if later_matches else set()
+    stored = {
+        (pool_id, user_id): (participation_id, tuple(state))
+        for participation_id, pool_id, user_id, *state in Participation.objects.filter(
+            pool_id__in=pool_ids
+        ).values_list('id', 'pool_id', 'user_id', *STREAK_STATE_FIELDS)
+    }
+
+    changed = {}
+    recompute = defaultdict(set)
+    for user_id, pool_id, points in bets:
+        participation_id, state = stored.get((pool_id, user_id), (None, None))
+        if participation_id is None:
+            continue
+        current, longest, _, recent = state
+        if (pool_id, user_id) in later or recent is None:
+            recompute[pool_id].add(user_id)
+            continue
+        recent = [int(value) for value in recent.split(',') if value] + [points]
+        current = current + 1 if points > 0 else 0
+        values = streak_values(current, max(longest, current), recent[-2 * TREND_WINDOW:])
+        if values != state:
+            changed[participation_id] = values
+
+    update_rows(Participation, changed, STREAK_STATE_FIELDS)
+    written = len(changed)
+    for pool_id, user_ids in recompute.items():
+        written += refresh_streaks([pool_id], user_ids)
+    return written
+
+
+def completed_rounds(pool_id):
+    """Sorted round numbers of a pool whose matches are all finished (roundless matches aside)"""
+    return sorted(
+        round_number for round_number, total, finished in Match.objects.filter(pool_id=pool_id, round__gt=0)
+        .values('round').annotate(total=Count('id'), finished=Count('id', filter=Q(finished=True)))
+        .order_by().values_list('round', 'total', 'finished')
+        if total == finished
+    )
+
+
+def refresh_snapshots(pool_ids, from_round=0):
+    """
+    Rebuild the ranking snapshots of the completed rounds >= from_round.
+
+    Scoring calls this with the round of the scored match: while a round is
+    being played nothing is built, the snapshot is written when its last
+    match is scored, and a corrected result rewrites the snapshots of its
+    round and of the later completed ones (roundless matches count in every
+    round, so they use from_round=0). The standings after round R are the
+    participants' current points minus their RoundPoints of rounds after R:
+    one read of the participations and one of the later buckets, whatever
+    the number of rounds rebuilt. Snapshots of rounds no longer complete
+    are dropped. Returns the number of snapshots written.
+    """
+    written = 0
+    for pool_id in sorted(set(pool_ids)):
+        completed = completed_rounds(pool_id)
+        RankingSnapshot.objects.filter(pool_id=pool_id, round__gte=from_round).exclude(round__in=completed).delete()
+        targets = [round_number for round_number in completed if round_number >= from_round]
+        if not targets:
+            continue
+
+        rows = list(Participation.objects.filter(pool_id=pool_id).order_by('user_id').values_list('user_id', 'points'))
+        later = list(RoundPoints.objects.filter(pool_id=pool_id, round__gt=targets[0]).exclude(points=0).values_list(
+            'user_id', 'round', 'points'
+        ))
+        user_ids, current = np.array(rows, dtype=np.int64).reshape(-1, 2).T
+        bucket_users, bucket_rounds, bucket_points = np.array(later, dtype=np.int64).reshape(-1, 3).T
+        # Buckets de quem saiu do bolão não entram
+        known = np.isin(bucket_users, user_ids)
+        positions = np.searchsorted(user_ids, bucket_users)
+
+        existing = dict(RankingSnapshot.objects.filter(pool_id=pool_id, round__in=targets).values_list('round', 'id'))
+        now = timezone.now()
+        created, updated = [], []
+        for round_number in targets:
+            after = known & (bucket_rounds > round_number)
+            points = current - np.bincount(positions[after], weights=bucket_points[after], minlength=len(user_ids)).astype(np.int64)
+            order = np.lexsort((user_ids, -points))
+            snapshot = RankingSnapshot(
+                id=existing.get(round_number), pool_id=pool_id, round=round_number,
+                participants=len(user_ids), standings=pack_standings(user_ids[order], points[order]), updated_at=now,
+            )
+            (updated if snapshot.id else created).append(snapshot)
+
+        RankingSnapshot.objects.bulk_create(created, batch_size=100)
+        RankingSnapshot.objects.bulk_update(updated, ['participants', 'standings', 'updated_at'], batch_size=100)
+        written += len(targets)
+    return written
+
+
+def round_movements(pool, current_round, user_ids, rounds_ago=1):
+    """
+    Where the given participants stood `rounds_ago` completed rounds before
+    current_round (the latest round with results).
+
+    Reads a single snapshot. Returns (round, {user_id: (position, points)}),
+    or (None, {}) when the pool has no such snapshot yet.
+    """
+    offset = max(rounds_ago, 1) - 1
+    snapshots = list(RankingSnapshot.objects.filter(pool=pool, round__lt=current_round).order_by('-round')[offset:offset + 1])
+    if not snapshots:
+        return None, {}
+    return snapshots[0].round, snapshots[0].positions(user_ids)
+
+
+def user_positions(user, pool_ids=None, around=0):
+    """
+    Position of a user in each of their pools, batched across pools.
+
+    One read of the user's participations, one grouped count of participants
+    and, when around > 0, one query for the participants ranked within
+    `around` positions of the user in every pool (a range seek on the
+    (pool, rank) index per pool). Returns {pool_id: {'position', 'points',
+    'total_participants', 'neighbours'}} for every pool in pool_ids (default:
+    the pools the user takes part in); position and points are None where the
+    user does not participate. neighbours lists {'user_id', 'username',
+    'points', 'position'} dicts ordered by position, the user included.
+    """
+    participations = Participation.objects.filter(user=user)
+    if pool_ids is not None:
+        pool_ids = list(pool_ids)
+        participations = participations.filter(pool_id__in=pool_ids)
+    own = {pool_id: (rank, points) for pool_id, rank, points in participations.values_list('pool_id', 'rank', 'points')}
+    if pool_ids is None:
+        pool_ids = list(own)
+    if not pool_ids:
+        return {}
+
+    totals = dict(
+        Participation.objects.filter(pool_id__in=pool_ids).values('pool_id')
+        .annotate(total=Count('id')).values_list('pool_id', 'total')
+    )
+
+    neighbours = {pool_id: [] for pool_id in pool_ids}
+    if around > 0 and own:
+        window = Q()
+        for pool_id, (rank, _) in own.items():
+            window |= Q(pool_id=pool_id, rank__range=(max(rank - around, 1), rank + around))
+        for pool_id, user_id, username, points, rank in Participation.objects.filter(window).order_by(
+            'pool_id', 'rank', 'id'
+        ).values_list('pool_id', 'user_id', 'user__username', 'points', 'rank'):
+            neighbours[pool_id].append({'user_id': user_id, 'username': username, 'points': points, 'position': rank})
+
+    return {
+        pool_id: {
+            'position': own.get(pool_id, (None, None))[0],
+            'points': own.get(pool_id, (None, None))[1],
+            'total_participants': totals.get(pool_id, 0),
+            'neighbours': neighbours[pool_id],
+        }
+        for pool_id in pool_ids
+    }
+
+
+def encode_cursor(direction, points, user_id):
+    """Opaque cursor: 'a' (rows after) or 'b' (rows before) the (points, user_id) row"""
+    return base64.urlsafe_b64encode(f"{direction}:{points}:{user_id}".encode()).decode().rstrip('=')
+
+
+def decode_cursor(cursor):
+    """(direction, points, user_id) of a cursor; ValueError when malformed"""
+    try:
+        direction, points, user_id = base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4)).decode().split(':')
+        points, user_id = int(points), int(user_id)
+    except (ValueError, UnicodeDecodeError) as error:
+        raise ValueError(f"Invalid cursor: {cursor}") from error
+    if direction not in ('a', 'b'):
+        raise ValueError(f"Invalid cursor: {cursor}")
+    return direction, points, user_id
+
+
+def _row_key(row):
+    if isinstance(row, dict):
+        return row['points'], row['user_id']
+    return row.points, row.user_id
+
+
+def keyset_page(rows, limit, cursor=None, anchor=None):
+    """
+    One page of a pool's ranking ordered by points (desc) and user id.
+
+    rows is a Participation queryset of one pool (instances, or values()
+    including 'points' and 'user_id'). cursor continues from a previous page
+    (see encode_cursor); anchor, a (points, user_id) pair, returns the page
+    that has that row in the middle ("jump to my row"). Every page is read
+    with one or two index seeks. Returns (rows, next_cursor, previous_cursor).
+    """
+    forward = rows.order_by('-points', 'user_id')
+    backward = rows.order_by('points', '-user_id')
+
+    def after(points, user_id, inclusive=False):
+        same = Q(points=points, user_id__gte=user_id) if inclusive else Q(points=points, user_id__gt=user_id)
+        return forward.filter(Q(points__lt=points) | same)
+
+    def before(points, user_id):
+        return backward.filter(Q(points__gt=points) | Q(points=points, user_id__lt=user_id))
+
+    has_previous = False
+    if anchor is not None:
+        above = list(before(*anchor)[:limit // 2 + 1])
+        has_previous = len(above) > limit // 2
+        start = _row_key(above[:limit // 2][-1]) if limit // 2 and above else anchor
+        page = list(after(*start, inclusive=True)[:limit + 1])
+        has_next = len(page) > limit
+    elif cursor is not None:
+        direction, points, user_id = decode_cursor(cursor)
+        if direction == 'a':
+            page = list(after(points, user_id)[:limit + 1])
+            has_next, has_previous = len(page) > limit, True
+        else:
+            page = list(before(points, user_id)[:limit + 1])
+            has_next, has_previous = True, len(page) > limit
+            page = page[:limit][::-1]
+    else:
+        page = list(forward[:limit + 1])
+        has_next = len(page) > limit
+
+    page = page[:limit]
+    next_cursor = encode_cursor('a', *_row_key(page[-1])) if page and has_next else None
+    previous_cursor = encode_cursor('b', *_row_key(page[0])) if page and has_previous else None
+    return page, next_cursor, previous_cursor
@@ -0,0 +1,121 @@
+"""
+Provisional "as it stands" leaderboard while matches are in play.
+
+Live scores only exist on Game (the API sync writes them every run); pool
+Matches are updated once the game is FINISHED, and their bets scored a bit
+later by the scoring worker. This module scores the bets of in-play matches
+against the current live scores, and those of finished matches still
+waiting for the worker against their final score, in memory, adds them to
+the stored Participation.points and ranks the result. Nothing is written to
+the database.
+
+The provisional board is cached per pool for LIVE_CACHE_TIMEOUT seconds, so
+frequent refreshes on busy match days cost one cache read. The cache key
+includes Pool.results_version, so a final result replaces the provisional
+numbers immediately.
+"""
+
+import numpy as np
+from django.core.cache import cache
+from django.db.models import Q
+from django.utils import timezone
+
+from .models import Bet, Match, Participation
+from .ranking import competition_ranks, pool_cache_key
+from .scoring import ScoringRules, score_predictions
+
+LIVE_CACHE_TIMEOUT = 15
+
+
+def get_live_ranking(pool):
+    """Cached compute_live_ranking; None when no match of the pool is in play or awaiting scoring"""
+    key = pool_cache_key(pool, 'live')
+    ranking = cache.get(key)
+    if ranking is None:
+        # Guardar também a ausência de jogos ao vivo ({}), para não repetir a consulta
+        ranking = compute_live_ranking(pool) or {}
+        cache.set(key, ranking, LIVE_CACHE_TIMEOUT)
+    return ranking or None
+
+
+def compute_live_ranking(pool):
+    """
+    Provisional points and positions from the live scores of in-play matches
+    and the final scores of finished matches not scored yet.
+
+    Returns None when there is no such match, otherwise a dict with 'matches'
+    (live or final scores, with a 'finished' flag) and 'participants': {user_id: {'points', 'live_points',
+    'position', 'movement'}}, where movement is the number of places gained
+    (negative when lost) compared with the official ranking.
+    """
+    in_play = Q(
+        finished=False,
+        related_game__status='live',
+        related_game__home_score__isnull=False,
+        related_game__away_score__isnull=False,
+    )
+    # Encerradas mas ainda na fila de pontuação: os pontos ainda não estão em Participation
+    awaiting_scoring = Q(finished=True, home_score__isnull=False, away_score__isnull=False)
+    live_matches = [
+        (match_id, home_team or game_home_team, away_team or game_away_team, *(
+            (home, away) if finished else (game_home, game_away)
+        ), finished)
+        for (
+            match_id, finished, home_team, away_team, game_home_team, game_away_team,
+            home, away, game_home, game_away,
+        ) in Match.objects.filter(in_play | awaiting_scoring, pool=pool, scored=False).values_list(
+            'id', 'finished', 'home_team__name', 'away_team__name',
+            'related_game__home_team__name', 'related_game__away_team__name',
+            'home_score', 'away_score', 'related_game__home_score', 'related_game__away_score',
+        )
+    ]
+    if not live_matches:
+        return None
+
+    participations = list(Participation.objects.filter(pool=pool).values_list('user_id', 'points'))
+    if not participations:
+        return None
+    user_ids, points = (np.array(column, dtype=np.int64) for column in zip(*participations))
+
+    live_scores = {match_id: (home, away) for match_id, _, _, home, away, _ in live_matches}
+    live_points = np.zeros(len(user_ids), dtype=np.int64)
+
+    bets = list(Bet.objects.filter(pool=pool, match_id__in=list(live_scores)).values_list(
+        'user_id', 'match_id', 'home_score_bet', 'away_score_bet'
+    ))
+    if bets:
+        bet_users, bet_matches, home_bet, away_bet = (np.array(column, dtype=np.int64) for column in zip(*bets))
+        home_real = np.array([live_scores[match_id][0] for match_id in bet_matches.tolist()], dtype=np.int64)
+        away_real = np.array([live_scores[match_id][1] for match_id in bet_matches.tolist()], dtype=np.int64)
+        bet_points = score_predictions(home_bet, away_bet, home_real, away_real, ScoringRules.from_pool(pool))
+
+        # Soma por participante (apostas de quem saiu do bolão são ignoradas)
+        order = np.argsort(user_ids)
+        positions = np.searchsorted(user_ids, bet_users, sorter=order)
+        positions = np.minimum(positions, len(user_ids) - 1)
+        known = user_ids[order[positions]] == bet_users
+        np.add.at(live_points, order[positions[known]], bet_points[known])
+
+    provisional = points + live_points
+    official_ranks = competition_ranks(points)
+    provisional_ranks = competition_ranks(provisional)
+
+    return {
+        'updated_at': timezone.now().isoformat(),
+        'matches': [
+            {
+                'id': match_id, 'home_team': home_team, 'away_team': away_team,
+                'home_score': home, 'away_score': away, 'finished': finished,
+            }
+            for match_id, home_team, away_team, home, away, finished in live_matches
+        ],
+        'participants': {
+            int(user_id): {
+                'points': int(provisional[i]),
+                'live_points': int(live_points[i]),
+                'position': int(provisional_ranks[i]),
+                'movement': int(official_ranks[i] - provisional_ranks[i]),
+            }
+            for i, user_id in enumerate(user_ids)
+        },
+    }
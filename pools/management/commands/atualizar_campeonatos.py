@@ -1,8 +1,11 @@
-from django.core.management.base import BaseCommand
+from django.core.management.base import BaseCommand, CommandError
 from django.utils import timezone
-from datetime import timedelta
+from django.utils.dateparse import parse_date, parse_datetime
+from datetime import datetime, time
 from pools.models import Championship
-from pools.services import get_api_service
+from pools.scheduler import due_championships, sync_championships, DEFAULT_WORKERS
+from pools.services import format_sync_report
+from pools.apiclient import get_client, format_stats
 import logging
 
 logger = logging.getLogger(__name__)
@@ -21,54 +24,84 @@ class Command(BaseCommand):
             type=str,
             help='Slug of a specific championship to update',
         )
+        parser.add_argument(
+            '--full',
+            action='store_true',
+            help='Fetch the whole season instead of the window changed since the last update',
+        )
+        parser.add_argument(
+            '--workers',
+            type=int,
+            default=DEFAULT_WORKERS,
+            help='Championships updated concurrently (requests share the API rate limit)',
+        )
+        parser.add_argument(
+            '--replay',
+            action='store_true',
+            help='Rebuild games and standings from the captured API payloads, without network access',
+        )
+        parser.add_argument(
+            '--until',
+            type=str,
+            help='With --replay, only use payloads captured up to this date or datetime (ISO format)',
+        )
     
     def handle(self, *args, **options):
         if options['championship']:
             # Update specific championship
             try:
-                championship = Championship.objects.get(slug=options['championship'])
-                self.update_championship(championship)
+                championships = [Championship.objects.get(slug=options['championship'])]
             except Championship.DoesNotExist:
                 self.stdout.write(self.style.ERROR(f"Championship '{options['championship']}' not found."))
-            return
-        
-        # Filter championships that need updating
-        championships = Championship.objects.filter(auto_update=True)
-        
-        if not options['all']:
-            # Only championships that haven't been updated recently
-            championships = championships.filter(
-                last_update__lte=timezone.now() - timedelta(hours=24)
-            )
+                return
+        elif options['all'] or options['replay']:
+            championships = list(Championship.objects.filter(auto_update=True))
+        else:
+            # Only championships due according to their own update_frequency
+            championships = due_championships()
         
-        if not championships.exists():
+        if not championships:
             self.stdout.write("No championships to update.")
             return
-            
+        
         for championship in championships:
-            self.update_championship(championship)
+            self.stdout.write(f"Updating championship: {championship.name}")
+        until = self.parse_until(options['until']) if options['until'] else None
+        for result in sync_championships(
+            championships, workers=options['workers'], full=options['full'], replay=options['replay'], until=until
+        ):
+            self.report_result(*result)
+        self.report_api_stats()
     
-    def update_championship(self, championship):
-        self.stdout.write(f"Updating championship: {championship.name}")
-        
-        service = get_api_service(championship)
-        if not service:
+    def parse_until(self, value):
+        """Aware datetime of --until; a bare date means the end of that day"""
+        day = parse_date(value)
+        moment = datetime.combine(day, time.max) if day else parse_datetime(value)
+        if moment is None:
+            raise CommandError(f"Invalid --until value '{value}'.")
+        if timezone.is_naive(moment):
+            moment = timezone.make_aware(moment)
+        return moment
+    
+    def report_api_stats(self):
+        """Print and reset the HTTP client's per-endpoint counters"""
+        client = get_client()
+        for line in format_stats(client.stats()):
+            self.stdout.write(f"  API {line}")
+        client.reset_stats()
+    
+    def report_result(self, championship, success, report):
+        if success is None:
             self.stdout.write(self.style.ERROR(
                 f"API provider '{championship.api_provider}' not supported."
             ))
-            return
-            
-        try:
-            success = service.execute_update()
-            if success:
-                self.stdout.write(self.style.SUCCESS(
-                    f"Championship '{championship.name}' updated successfully."
-                ))
-            else:
-                self.stdout.write(self.style.ERROR(
-                    f"Error updating championship '{championship.name}'."
-                ))
-        except Exception as e:
+        elif success:
+            self.stdout.write(self.style.SUCCESS(
+                f"Championship '{championship.name}' updated successfully."
+            ))
+            if report:
+                self.stdout.write(f"  {format_sync_report(report)}")
+        else:
             self.stdout.write(self.style.ERROR(
-                f"Exception updating championship '{championship.name}': {str(e)}"
-            ))
\ No newline at end of file
+                f"Error updating championship '{championship.name}'."
+            ))
@@ -1,6 +1,6 @@
 from django.core.management.base import BaseCommand
 from pools.models import Partida, Match
-import requests
+from pools.apiclient import api_get
 from datetime import datetime
 
 class Command(BaseCommand):
@@ -11,7 +11,7 @@ class Command(BaseCommand):
         
         # Exemplo com API fictícia - substitua pela API real escolhida
         url = "https://api.brasileirao.com/jogos/resultados"
-        response = requests.get(url)
+        response = api_get(url)
         
         if response.status_code == 200:
             data = response.json()
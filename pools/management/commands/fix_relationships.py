@@ -46,19 +46,14 @@ class Command(BaseCommand):
         
         self.stdout.write(f'Criados {created_relations} relacionamentos Game->Match')
         
-        # 3. Recalcular pontos das apostas
-        from pools.models import Bet
+        # 3. Recalcular pontos das apostas (em lotes, por bolão)
+        from pools.models import Bet, Pool
+        from pools.scoring import rescore_pool
         
         updated_bets = 0
-        for match in Match.objects.filter(finished=True):
-            bets = Bet.objects.filter(match=match)
-            for bet in bets:
-                # Recalcular pontos
-                old_points = bet.points_earned
-                bet.calculate_points()
-                bet.save()
-                if bet.points_earned != old_points:
-                    updated_bets += 1
+        for pool in Pool.objects.all():
+            for chunk in rescore_pool(pool):
+                updated_bets += chunk['changed']
         
         self.stdout.write(f'Recalculados pontos de {updated_bets} apostas')
         
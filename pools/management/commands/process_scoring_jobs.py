@@ -0,0 +1,54 @@
+from django.core.management.base import BaseCommand
+from datetime import timedelta
+from pools.jobs import claim_jobs, run_job, requeue_stale_jobs, queue_stats, heartbeat
+import time
+
+
+class Command(BaseCommand):
+    help = 'Worker that processes queued result-scoring jobs'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=50, help='Jobs claimed per batch')
+        parser.add_argument('--interval', type=int, default=5, help='Seconds to sleep when the queue is empty')
+        parser.add_argument('--stale-after', type=int, default=600, help='Seconds without a heartbeat before a running job is considered abandoned')
+        parser.add_argument('--once', action='store_true', help='Process the jobs currently due and exit')
+        parser.add_argument('--stats', action='store_true', help='Show queue depth and lag and exit')
+
+    def handle(self, *args, **options):
+        if options['stats']:
+            self.show_stats()
+            return
+
+        self.stdout.write('Scoring worker started. Press Ctrl+C to stop.')
+        try:
+            while True:
+                requeue_stale_jobs(timedelta(seconds=options['stale_after']))
+                processed = self.process_batch(options['batch_size'])
+
+                if options['once'] and not processed:
+                    break
+                if not processed:
+                    time.sleep(options['interval'])
+        except KeyboardInterrupt:
+            self.stdout.write('\nScoring worker stopped.')
+
+    def process_batch(self, batch_size):
+        jobs = claim_jobs(batch_size)
+        if not jobs:
+            return 0
+
+        with heartbeat(jobs):
+            succeeded = sum(1 for job in jobs if run_job(job))
+        stats = queue_stats()
+        self.stdout.write(
+            f"Processed {len(jobs)} jobs ({succeeded} ok, {len(jobs) - succeeded} retrying/failed) - "
+            f"pending: {stats['pending']}, lag: {stats['lag_seconds']:.0f}s"
+        )
+        return len(jobs)
+
+    def show_stats(self):
+        stats = queue_stats()
+        self.stdout.write(f"Pending: {stats['pending']}")
+        self.stdout.write(f"Running: {stats['running']}")
+        self.stdout.write(f"Failed: {stats['failed']}")
+        self.stdout.write(f"Lag: {stats['lag_seconds']:.0f}s")
@@ -0,0 +1,27 @@
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from pools.payloads import get_payload_store
+
+
+class Command(BaseCommand):
+    help = 'Delete the captured API payloads older than the retention (keeps the latest of each query)'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--days',
+            type=int,
+            default=getattr(settings, 'API_PAYLOAD_RETENTION_DAYS', 30),
+            help='Days of payloads to keep (default: settings.API_PAYLOAD_RETENTION_DAYS)',
+        )
+
+    def handle(self, *args, **options):
+        store = get_payload_store()
+        if store is None:
+            self.stdout.write(self.style.ERROR('API_PAYLOAD_DIR not configured, nothing to prune.'))
+            return
+        entries, blobs = store.prune(timezone.now() - timedelta(days=max(options['days'], 0)))
+        self.stdout.write(self.style.SUCCESS(f"Removed {entries} index entries and {blobs} payload files."))
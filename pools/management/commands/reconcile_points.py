@@ -0,0 +1,53 @@
+from django.core.management.base import BaseCommand
+from pools.models import Pool
+from pools.scoring import reconcile_participation_points, reconcile_point_buckets, COUNTER_FIELDS
+
+
+class Command(BaseCommand):
+    help = 'Recompute participation points, leaderboard counters and round/week point buckets from the bets, repair any drift and rebuild the ranking snapshots'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--pool',
+            type=str,
+            help='Slug of a specific pool to reconcile',
+        )
+        parser.add_argument(
+            '--dry-run',
+            action='store_true',
+            help='Only report drifted participations, do not repair them',
+        )
+
+    def handle(self, *args, **options):
+        pool = None
+        if options['pool']:
+            try:
+                pool = Pool.objects.get(slug=options['pool'])
+            except Pool.DoesNotExist:
+                self.stdout.write(self.style.ERROR(f"Pool '{options['pool']}' not found."))
+                return
+
+        drift = reconcile_participation_points(pool=pool, dry_run=options['dry_run'])
+
+        for participation_id, stored, expected in drift:
+            changes = ', '.join(
+                f"{field} {old} -> {new}"
+                for field, old, new in zip(COUNTER_FIELDS, stored, expected)
+                if old != new
+            )
+            self.stdout.write(f"  Participation {participation_id}: {changes}")
+
+        bucket_drift = reconcile_point_buckets(pool=pool, dry_run=options['dry_run'])
+        for bucket, pool_id, user_id, key, stored, expected in bucket_drift:
+            self.stdout.write(f"  Pool {pool_id}, user {user_id}, {bucket} {key}: points {stored} -> {expected}")
+
+        if not drift and not bucket_drift:
+            self.stdout.write(self.style.SUCCESS('No drift found.'))
+        elif options['dry_run']:
+            self.stdout.write(self.style.WARNING(
+                f'{len(drift)} participations and {len(bucket_drift)} point bucket rows with drift (dry run).'
+            ))
+        else:
+            self.stdout.write(self.style.SUCCESS(
+                f'{len(drift)} participations and {len(bucket_drift)} point bucket rows repaired.'
+            ))
@@ -0,0 +1,43 @@
+from django.core.management.base import BaseCommand
+from pools.models import Pool
+from pools.simulation import refresh_title_odds, DEFAULT_SIMULATIONS, MAX_SIMULATIONS, SIMULATION_CHUNK
+
+
+class Command(BaseCommand):
+    help = 'Precompute the Monte Carlo title odds of the pools whose results changed (run every few minutes)'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--pool',
+            type=str,
+            help='Slug of a specific pool to refresh',
+        )
+        parser.add_argument(
+            '--simulations',
+            type=int,
+            default=DEFAULT_SIMULATIONS,
+            help=f'Simulated seasons per pool ({SIMULATION_CHUNK} to {MAX_SIMULATIONS})',
+        )
+        parser.add_argument(
+            '--force',
+            action='store_true',
+            help='Recompute even when the stored odds are of the current results',
+        )
+
+    def handle(self, *args, **options):
+        pools = Pool.objects.exclude(status='finished')
+        if options['pool']:
+            pools = Pool.objects.filter(slug=options['pool'])
+            if not pools.exists():
+                self.stdout.write(self.style.ERROR(f"Pool '{options['pool']}' not found."))
+                return
+
+        simulations = max(SIMULATION_CHUNK, min(options['simulations'], MAX_SIMULATIONS))
+        refreshed = 0
+        for pool in pools.iterator():
+            odds, computed = refresh_title_odds(pool, simulations, force=options['force'])
+            if computed:
+                refreshed += 1
+                self.stdout.write(f"  {pool.slug}: {odds['remaining_matches']} remaining matches, {simulations} simulations")
+
+        self.stdout.write(self.style.SUCCESS(f"Title odds refreshed for {refreshed} pools."))
@@ -0,0 +1,87 @@
+from django.core.management.base import BaseCommand
+from pools.models import Pool, PoolRescore, Bet, Participation
+from pools.ranking import competition_ranks
+from pools.scoring import rescore_pool
+import numpy as np
+
+
+class Command(BaseCommand):
+    help = 'Rescore the whole bet history of a pool in resumable chunks (e.g. after a rule change)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('pool', nargs='?', type=str, help='Slug of the pool to rescore')
+        parser.add_argument('--pending', action='store_true', help='Process rescores queued by rule changes')
+        parser.add_argument('--chunk-size', type=int, default=5000, help='Bets per chunk/transaction')
+        parser.add_argument('--dry-run', action='store_true', help='Report how many bets and ranks would change, without writing')
+        parser.add_argument('--restart', action='store_true', help='Ignore the saved checkpoint and start from the first bet')
+
+    def handle(self, *args, **options):
+        if options['pending']:
+            rescores = PoolRescore.objects.exclude(status='done').select_related('pool')
+            if not rescores.exists():
+                self.stdout.write("No pending rescores.")
+            for rescore in rescores:
+                self.run(rescore.pool, rescore, options['chunk_size'])
+            return
+
+        if not options['pool']:
+            self.stdout.write(self.style.ERROR("Inform a pool slug or use --pending."))
+            return
+
+        try:
+            pool = Pool.objects.get(slug=options['pool'])
+        except Pool.DoesNotExist:
+            self.stdout.write(self.style.ERROR(f"Pool '{options['pool']}' not found."))
+            return
+
+        if options['dry_run']:
+            self.dry_run(pool, options['chunk_size'])
+            return
+
+        rescore = PoolRescore.objects.filter(pool=pool).exclude(status='done').first()
+        if rescore is None:
+            rescore = PoolRescore.objects.create(pool=pool)
+        elif options['restart']:
+            rescore = PoolRescore.request(pool)
+        self.run(pool, rescore, options['chunk_size'])
+
+    def run(self, pool, rescore, chunk_size):
+        total = Bet.objects.filter(pool=pool, match__finished=True, match__scored=True).count()
+        if rescore.last_bet_id:
+            self.stdout.write(f"Resuming rescore of '{pool.name}' after bet {rescore.last_bet_id}")
+        else:
+            self.stdout.write(f"Rescoring '{pool.name}' ({total} finished bets)")
+
+        for chunk in rescore_pool(pool, rescore=rescore, chunk_size=chunk_size):
+            percentage = rescore.bets_processed / total * 100 if total else 100
+            self.stdout.write(
+                f"  {rescore.bets_processed}/{total} ({percentage:.1f}%) - "
+                f"{chunk['changed']} changed in this chunk"
+            )
+
+        self.stdout.write(self.style.SUCCESS(
+            f"Pool '{pool.name}' rescored: {rescore.bets_processed} bets, {rescore.bets_changed} changed."
+        ))
+
+    def dry_run(self, pool, chunk_size):
+        processed = changed = 0
+        deltas = {}
+        for chunk in rescore_pool(pool, chunk_size=chunk_size, dry_run=True):
+            processed += chunk['processed']
+            changed += chunk['changed']
+            for user_id, delta in chunk['deltas'].items():
+                deltas[user_id] = deltas.get(user_id, 0) + delta
+
+        participations = list(Participation.objects.filter(pool=pool).values_list('user_id', 'points'))
+        if participations:
+            user_ids, points = (np.array(column, dtype=np.int64) for column in zip(*participations))
+            new_points = points + np.array([deltas.get(int(user_id), 0) for user_id in user_ids], dtype=np.int64)
+            ranks_changed = int((competition_ranks(points) != competition_ranks(new_points)).sum())
+        else:
+            ranks_changed = 0
+
+        self.stdout.write(f"Dry run for '{pool.name}':")
+        self.stdout.write(f"  Bets checked: {processed}")
+        self.stdout.write(f"  Bets that would change: {changed}")
+        self.stdout.write(f"  Participants whose points would change: {sum(1 for delta in deltas.values() if delta)}")
+        self.stdout.write(f"  Participants whose rank would change: {ranks_changed}")
@@ -0,0 +1,32 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from pools.models import Bet, GlobalScore, Match
+from pools.rollup import rollup_pending_matches, ROLLUP_MATCH_CHUNK
+
+
+class Command(BaseCommand):
+    help = 'Add the bets scored since the previous run to the global rankings (run nightly)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--chunk-size', type=int, default=ROLLUP_MATCH_CHUNK, help='Matches rolled up per transaction')
+        parser.add_argument(
+            '--rebuild',
+            action='store_true',
+            help='Discard the global rankings and roll up every scored match again',
+        )
+
+    def handle(self, *args, **options):
+        if options['rebuild']:
+            with transaction.atomic():
+                GlobalScore.objects.all().delete()
+                Bet.objects.filter(rolled_up_points__isnull=False).update(rolled_up_points=None)
+                flagged = Match.objects.filter(scored=True).update(rollup_pending=True)
+            self.stdout.write(f"Global rankings discarded; {flagged} scored matches flagged for rollup.")
+
+        totals = rollup_pending_matches(chunk_size=options['chunk_size'])
+        if not totals['matches']:
+            self.stdout.write(self.style.SUCCESS('Nothing to roll up.'))
+            return
+        self.stdout.write(self.style.SUCCESS(
+            f"Rolled up {totals['bets']} bets from {totals['matches']} matches ({totals['rows']} global score rows updated)."
+        ))
@@ -0,0 +1,41 @@
+from django.db import close_old_connections
+from django.utils import timezone
+from concurrent.futures import ThreadPoolExecutor
+from pools.management.commands.atualizar_campeonatos import Command as UpdateCommand
+from pools.scheduler import due_championships, sync_championships, DEFAULT_WORKERS
+import time
+
+
+class Command(UpdateCommand):
+    help = 'Scheduler that keeps syncing the championships due by their update_frequency, concurrently'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--workers', type=int, default=DEFAULT_WORKERS, help='Championships synced concurrently')
+        parser.add_argument('--interval', type=int, default=60, help='Seconds between checks for due championships')
+        parser.add_argument('--once', action='store_true', help='Sync the championships due now and exit')
+
+    def handle(self, *args, **options):
+        self.stdout.write('Sync scheduler started. Press Ctrl+C to stop.')
+        executor = ThreadPoolExecutor(max_workers=options['workers'], thread_name_prefix='sync')
+        try:
+            while True:
+                close_old_connections()
+                started = time.monotonic()
+                championships = due_championships()
+                if championships:
+                    self.stdout.write(
+                        f"[{timezone.localtime():%H:%M:%S}] Syncing {len(championships)} championships: "
+                        + ', '.join(championship.name for championship in championships)
+                    )
+                    for result in sync_championships(championships, executor=executor):
+                        self.report_result(*result)
+                    self.report_api_stats()
+                    self.stdout.write(f"  Done in {time.monotonic() - started:.1f}s")
+
+                if options['once']:
+                    break
+                time.sleep(max(options['interval'] - (time.monotonic() - started), 1))
+        except KeyboardInterrupt:
+            self.stdout.write('\nSync scheduler stopped.')
+        finally:
+            executor.shutdown(wait=True)
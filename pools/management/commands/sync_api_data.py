@@ -1,8 +1,11 @@
 from django.core.management.base import BaseCommand
 from django.utils import timezone
+from django.db.models import F, Q
 from pools.models import Championship, Game, Team, Competition, Match, Sport
-import requests
-from datetime import datetime, timedelta
+from pools.services import FootballDataApiService, conditional_get, remember_validators, sync_window, format_sync_report
+from pools.apiclient import api_get, get_client, format_stats, replay_client, use_client
+from pools.payloads import get_payload_store
+from datetime import timedelta
 from django.conf import settings
 import time
 
@@ -12,10 +15,25 @@ class Command(BaseCommand):
     def add_arguments(self, parser):
         parser.add_argument('--competition', type=str, default='BSA', help='Código da competição')
         parser.add_argument('--update-results', action='store_true', help='Atualizar resultados')
+        parser.add_argument('--full', action='store_true', help='Buscar a temporada inteira em vez da janela incremental')
+        parser.add_argument('--replay', action='store_true', help='Reprocessar as respostas armazenadas, sem acessar a API')
 
     def handle(self, *args, **options):
+        if not options['replay']:
+            self.sync(options, None)
+            return
+        
+        # Replay: mesmas etapas, com as respostas lidas do armazenamento local
+        store = get_payload_store()
+        if store is None:
+            self.stdout.write(self.style.ERROR('API_PAYLOAD_DIR não configurado'))
+            return
+        with use_client(replay_client(store)):
+            self.sync(options, store)
+
+    def sync(self, options, store):
         api_key = settings.FOOTBALL_API_KEY
-        if not api_key:
+        if not api_key and store is None:
             self.stdout.write(self.style.ERROR('FOOTBALL_API_KEY não configurada'))
             return
 
@@ -27,7 +45,7 @@ class Command(BaseCommand):
 
         # 1. Buscar competição
         try:
-            comp_response = requests.get(f'{base_url}/competitions/{competition_code}', headers=headers)
+            comp_response = api_get(f'{base_url}/competitions/{competition_code}', headers=headers)
             comp_data = comp_response.json()
             
             # Buscar ou criar Sport primeiro
@@ -48,104 +66,112 @@ class Command(BaseCommand):
             self.stdout.write(self.style.ERROR(f'Erro competição: {e}'))
             return
 
-        # 2. Buscar times
-        try:
-            teams_response = requests.get(f'{base_url}/competitions/{competition_code}/teams', headers=headers)
-            teams_data = teams_response.json()
-            
-            teams_created = 0
-            for team_data in teams_data['teams']:
-                _, created = Team.objects.get_or_create(
-                    external_api_id=str(team_data['id']),
-                    defaults={
-                        'name': team_data['name'],
-                        'short_name': team_data.get('shortName', team_data['name'][:20]),
-                        'code': team_data.get('tla', '')[:3],
-                        'championship': championship,  # Adicionar o championship
-                    }
-                )
-                if created:
-                    teams_created += 1
-            
-            self.stdout.write(f'  Times novos: {teams_created}')
-        except Exception as e:
-            self.stdout.write(self.style.ERROR(f'Erro times: {e}'))
+        started = timezone.now()
 
-        # 3. Buscar partidas (últimos 7 dias + próximos 30 dias)
-        date_from = (timezone.now() - timedelta(days=7)).strftime('%Y-%m-%d')
-        date_to = (timezone.now() + timedelta(days=30)).strftime('%Y-%m-%d')
-        
+        # 2. Buscar times (nada a fazer se a API responder 304)
         try:
-            matches_response = requests.get(
-                f'{base_url}/competitions/{competition_code}/matches',
-                headers=headers,
-                params={'dateFrom': date_from, 'dateTo': date_to}
+            teams_response = conditional_get(
+                championship, 'teams', f'{base_url}/competitions/{competition_code}/teams', headers
             )
-            matches_data = matches_response.json()
-            
-            matches_created = 0
-            matches_updated = 0
-            
-            for match_data in matches_data['matches']:
-                if not match_data.get('homeTeam') or not match_data.get('awayTeam'):
-                    continue
-                
-                home_team = Team.objects.filter(external_api_id=str(match_data['homeTeam']['id'])).first()
-                away_team = Team.objects.filter(external_api_id=str(match_data['awayTeam']['id'])).first()
-                
-                if not home_team or not away_team:
-                    continue
+            if teams_response is None:
+                self.stdout.write('  Times: sem alterações')
+            else:
+                teams_data = teams_response.json()
                 
-                utc_date = datetime.fromisoformat(match_data['utcDate'].replace('Z', '+00:00'))
+                teams_created = 0
+                for team_data in teams_data['teams']:
+                    _, created = Team.objects.get_or_create(
+                        external_api_id=str(team_data['id']),
+                        defaults={
+                            'name': team_data['name'],
+                            'short_name': team_data.get('shortName', team_data['name'][:20]),
+                            'code': team_data.get('tla', '')[:3],
+                            'championship': championship,  # Adicionar o championship
+                        }
+                    )
+                    if created:
+                        teams_created += 1
                 
-                game, created = Game.objects.update_or_create(
-                    external_api_id=str(match_data['id']),
-                    defaults={
-                        'championship': championship,
-                        'round': match_data.get('matchday', 1),
-                        'home_team': home_team,
-                        'away_team': away_team,
-                        'datetime': utc_date,
-                        'home_score': match_data['score']['fullTime'].get('home'),
-                        'away_score': match_data['score']['fullTime'].get('away'),
-                        'finished': match_data['status'] == 'FINISHED',
-                    }
-                )
-                
-                if created:
-                    matches_created += 1
-                else:
-                    matches_updated += 1
-            
-            self.stdout.write(f'  Partidas: {matches_created} criadas, {matches_updated} atualizadas')
+                remember_validators(championship, 'teams', teams_response)
+                self.stdout.write(f'  Times novos: {teams_created}')
         except Exception as e:
-            self.stdout.write(self.style.ERROR(f'Erro partidas: {e}'))
+            self.stdout.write(self.style.ERROR(f'Erro times: {e}'))
 
-        # 4. Atualizar resultados e calcular pontos
+        # 3. Buscar partidas: só a janela que pode ter mudado desde a última sincronização
+        #    (no replay, todas as respostas armazenadas, em ordem)
+        if store is not None:
+            try:
+                service = FootballDataApiService(championship)
+                service.replay_matches(store, competition=competition_code)
+                self.stdout.write(f'  {format_sync_report(service.report)}')
+            except Exception as e:
+                self.stdout.write(self.style.ERROR(f'Erro partidas: {e}'))
+        else:
+            matches_ok = self.sync_matches(championship, options, base_url, competition_code, headers, started)
+            # A janela incremental só avança depois de uma busca bem-sucedida
+            if matches_ok:
+                championship.last_update = started
+            championship.save(update_fields=['last_update', 'api_validators'])
+        for line in format_stats(get_client().stats()):
+            self.stdout.write(f'  API {line}')
+        get_client().reset_stats()
+
+        # 4. Conferir os resultados de todas as partidas ligadas a jogos finalizados
         if options['update_results']:
             self.stdout.write('Atualizando resultados...')
             
-            finished_games = Game.objects.filter(
-                finished=True,
-                home_score__isnull=False,
-                away_score__isnull=False,
-                championship=championship
-            )
+            outdated = Match.objects.filter(
+                related_game__championship=championship,
+                related_game__finished=True,
+                related_game__home_score__isnull=False,
+                related_game__away_score__isnull=False,
+            ).filter(
+                Q(home_score__isnull=True) | Q(away_score__isnull=True) |
+                ~Q(home_score=F('related_game__home_score')) | ~Q(away_score=F('related_game__away_score'))
+            ).select_related('related_game')
             
             updated = 0
-            for game in finished_games:
-                # Buscar matches relacionados através do related_game
-                related_matches = Match.objects.filter(related_game=game)
-                
-                for match in related_matches:
-                    if match.home_score != game.home_score or match.away_score != game.away_score:
-                        match.home_score = game.home_score
-                        match.away_score = game.away_score
-                        match.finished = True
-                        match.result = match.calculate_result()
-                        match.save()
-                        updated += 1
+            for match in outdated:
+                match.home_score = match.related_game.home_score
+                match.away_score = match.related_game.away_score
+                match.finished = True
+                match.result = match.calculate_result()
+                match.save()
+                updated += 1
             
             self.stdout.write(self.style.SUCCESS(f'Resultados atualizados: {updated}'))
 
-        self.stdout.write(self.style.SUCCESS('Sincronização concluída'))
\ No newline at end of file
+        self.stdout.write(self.style.SUCCESS('Sincronização concluída'))
+
+    def sync_matches(self, championship, options, base_url, competition_code, headers, started):
+        if options['full']:
+            params = {}
+        elif championship.last_update:
+            params = sync_window(championship.last_update, started)
+        else:
+            params = {
+                'dateFrom': (started - timedelta(days=7)).strftime('%Y-%m-%d'),
+                'dateTo': (started + timedelta(days=30)).strftime('%Y-%m-%d'),
+            }
+        
+        try:
+            matches_response = conditional_get(
+                championship, 'matches', f'{base_url}/competitions/{competition_code}/matches', headers, params
+            )
+            if matches_response is None:
+                self.stdout.write('  Partidas: sem alterações')
+            elif matches_response.status_code != 200:
+                self.stdout.write(self.style.ERROR(f'Erro partidas: HTTP {matches_response.status_code}'))
+                return False
+            else:
+                matches = [
+                    match_data for match_data in matches_response.json()['matches']
+                    if (match_data.get('homeTeam') or {}).get('id') is not None and (match_data.get('awayTeam') or {}).get('id') is not None
+                ]
+                report = FootballDataApiService(championship).ingest_matches(matches)
+                remember_validators(championship, 'matches', matches_response, params)
+                self.stdout.write(f'  {format_sync_report(report)}')
+            return True
+        except Exception as e:
+            self.stdout.write(self.style.ERROR(f'Erro partidas: {e}'))
+            return False
@@ -0,0 +1,37 @@
+# Generated by Django 5.2 on 2026-10-18 07:19
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('pools', '0011_alter_match_away_team_alter_match_home_team'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ScoringJob',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('status', models.CharField(choices=[('pending', 'Pending'), ('running', 'Running'), ('done', 'Done'), ('failed', 'Failed')], default='pending', max_length=10)),
+                ('attempts', models.PositiveIntegerField(default=0)),
+                ('max_attempts', models.PositiveIntegerField(default=5)),
+                ('available_at', models.DateTimeField(default=django.utils.timezone.now, help_text='Job is not picked up before this time (retry backoff)')),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('started_at', models.DateTimeField(blank=True, null=True)),
+                ('finished_at', models.DateTimeField(blank=True, null=True)),
+                ('bets_updated', models.IntegerField(default=0)),
+                ('last_error', models.TextField(blank=True)),
+                ('match', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='scoring_jobs', to='pools.match')),
+            ],
+            options={
+                'verbose_name': 'Scoring job',
+                'verbose_name_plural': 'Scoring jobs',
+                'ordering': ['available_at'],
+                'indexes': [models.Index(fields=['status', 'available_at'], name='pools_scori_status_6e1649_idx')],
+            },
+        ),
+    ]
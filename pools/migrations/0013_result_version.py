@@ -0,0 +1,23 @@
+# Generated by Django 5.2 on 2026-10-18 07:20
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('pools', '0012_scoringjob'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='match',
+            name='result_version',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='scoringjob',
+            name='result_version',
+            field=models.PositiveIntegerField(default=0),
+        ),
+    ]
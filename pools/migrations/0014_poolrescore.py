@@ -0,0 +1,33 @@
+# Generated by Django 5.2 on 2026-10-18 07:21
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('pools', '0013_result_version'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PoolRescore',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('status', models.CharField(choices=[('pending', 'Pending'), ('running', 'Running'), ('done', 'Done')], default='pending', max_length=10)),
+                ('last_bet_id', models.BigIntegerField(default=0, help_text='Checkpoint: last bet id already rescored')),
+                ('bets_processed', models.PositiveIntegerField(default=0)),
+                ('bets_changed', models.PositiveIntegerField(default=0)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('finished_at', models.DateTimeField(blank=True, null=True)),
+                ('pool', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='rescores', to='pools.pool')),
+            ],
+            options={
+                'verbose_name': 'Pool rescore',
+                'verbose_name_plural': 'Pool rescores',
+                'ordering': ['created_at'],
+            },
+        ),
+    ]
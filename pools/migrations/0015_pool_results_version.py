@@ -0,0 +1,18 @@
+# Generated by Django 5.2 on 2026-10-18 07:25
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('pools', '0014_poolrescore'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='pool',
+            name='results_version',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+    ]
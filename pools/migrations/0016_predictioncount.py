@@ -0,0 +1,49 @@
+# Generated by Django 5.2 on 2026-10-18 07:38
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+def build_prediction_counts(apps, schema_editor):
+    """Fill the histogram from the bets placed before it existed"""
+    Bet = apps.get_model('pools', 'Bet')
+    PredictionCount = apps.get_model('pools', 'PredictionCount')
+    rows = Bet.objects.values('match_id', 'home_score_bet', 'away_score_bet').annotate(total=models.Count('id'))
+    PredictionCount.objects.bulk_create(
+        (
+            PredictionCount(
+                match_id=row['match_id'],
+                home_score_bet=row['home_score_bet'],
+                away_score_bet=row['away_score_bet'],
+                count=row['total'],
+            )
+            for row in rows.iterator()
+        ),
+        batch_size=1000,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('pools', '0015_pool_results_version'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PredictionCount',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('home_score_bet', models.PositiveSmallIntegerField()),
+                ('away_score_bet', models.PositiveSmallIntegerField()),
+                ('count', models.IntegerField(default=0)),
+                ('match', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='prediction_counts', to='pools.match')),
+            ],
+            options={
+                'verbose_name': 'Prediction Count',
+                'verbose_name_plural': 'Prediction Counts',
+                'unique_together': {('match', 'home_score_bet', 'away_score_bet')},
+            },
+        ),
+        migrations.RunPython(build_prediction_counts, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,100 @@
+# Generated by Django 5.2 on 2026-10-18 07:42
+
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import Count, Q
+
+
+def build_leaderboard(apps, schema_editor):
+    """Fill the leaderboard columns of existing participations"""
+    from pools.ranking import competition_ranks
+
+    Match = apps.get_model('pools', 'Match')
+    Bet = apps.get_model('pools', 'Bet')
+    Participation = apps.get_model('pools', 'Participation')
+
+    # Partidas já finalizadas foram pontuadas pelo fluxo antigo
+    Match.objects.filter(finished=True).update(scored=True)
+
+    pool_ids = Participation.objects.values_list('pool_id', flat=True).distinct()
+    for pool_id in pool_ids:
+        counters = {
+            row['user_id']: row
+            for row in Bet.objects.filter(pool_id=pool_id).values('user_id').annotate(
+                bets=Count('id'),
+                finished=Count('id', filter=Q(match__finished=True)),
+                correct=Count('id', filter=Q(match__finished=True, points_earned__gt=0)),
+            )
+        }
+        participations = list(Participation.objects.filter(pool_id=pool_id))
+        ranks = competition_ranks([participation.points for participation in participations])
+        for participation, rank in zip(participations, ranks):
+            row = counters.get(participation.user_id, {'bets': 0, 'finished': 0, 'correct': 0})
+            participation.rank = int(rank)
+            participation.total_bets = row['bets']
+            participation.finished_bets = row['finished']
+            participation.correct_bets = row['correct']
+            if row['finished']:
+                participation.accuracy = round(row['correct'] * 100 / row['finished'], 2)
+                participation.avg_points = round(participation.points / row['finished'], 2)
+        Participation.objects.bulk_update(
+            participations,
+            ['rank', 'total_bets', 'finished_bets', 'correct_bets', 'accuracy', 'avg_points'],
+            batch_size=1000,
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('pools', '0016_predictioncount'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='match',
+            name='scored',
+            field=models.BooleanField(default=False, editable=False),
+        ),
+        migrations.AddField(
+            model_name='participation',
+            name='accuracy',
+            field=models.FloatField(default=0),
+        ),
+        migrations.AddField(
+            model_name='participation',
+            name='avg_points',
+            field=models.FloatField(default=0),
+        ),
+        migrations.AddField(
+            model_name='participation',
+            name='correct_bets',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='participation',
+            name='finished_bets',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='participation',
+            name='last_movement',
+            field=models.IntegerField(default=0, help_text='Positions gained (negative: lost) on the last rank change'),
+        ),
+        migrations.AddField(
+            model_name='participation',
+            name='rank',
+            field=models.PositiveIntegerField(default=0, help_text='Competition rank in the pool (ties share the position)'),
+        ),
+        migrations.AddField(
+            model_name='participation',
+            name='total_bets',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddIndex(
+            model_name='participation',
+            index=models.Index(fields=['pool', 'rank'], name='pools_parti_pool_id_3f6116_idx'),
+        ),
+        migrations.RunPython(build_leaderboard, migrations.RunPython.noop),
+    ]
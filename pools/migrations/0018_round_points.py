@@ -0,0 +1,62 @@
+# Generated by Django 5.2 on 2026-10-18 07:46
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import OuterRef, Subquery, Sum
+from django.db.models.functions import Coalesce
+
+
+def build_round_points(apps, schema_editor):
+    """Copy the rounds of the related games and fill the points history"""
+    Game = apps.get_model('pools', 'Game')
+    Match = apps.get_model('pools', 'Match')
+    Bet = apps.get_model('pools', 'Bet')
+    RoundPoints = apps.get_model('pools', 'RoundPoints')
+
+    Match.objects.filter(round__isnull=True, related_game__isnull=False).update(
+        round=Subquery(Game.objects.filter(pk=OuterRef('related_game_id')).values('round')[:1])
+    )
+
+    rows = Bet.objects.filter(match__finished=True).values(
+        'pool_id', 'user_id', round_number=Coalesce('match__round', 0)
+    ).annotate(total=Sum('points_earned')).filter(total__gt=0)
+    RoundPoints.objects.bulk_create(
+        [
+            RoundPoints(pool_id=row['pool_id'], user_id=row['user_id'], round=row['round_number'], points=row['total'])
+            for row in rows.iterator()
+        ],
+        batch_size=1000,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('pools', '0017_leaderboard'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='match',
+            name='round',
+            field=models.PositiveIntegerField(blank=True, null=True),
+        ),
+        migrations.CreateModel(
+            name='RoundPoints',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('round', models.PositiveIntegerField()),
+                ('points', models.IntegerField(default=0)),
+                ('pool', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='round_points', to='pools.pool')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='round_points', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'verbose_name': 'Round points',
+                'verbose_name_plural': 'Round points',
+                'unique_together': {('pool', 'user', 'round')},
+            },
+        ),
+        migrations.RunPython(build_round_points, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,50 @@
+# Generated by Django 5.2 on 2026-10-18 07:48
+
+from django.db import migrations, models
+
+
+def build_streaks(apps, schema_editor):
+    """Fill the streak columns of existing participations"""
+    from pools.leaderboard import STREAK_FIELDS, compute_streaks
+
+    Bet = apps.get_model('pools', 'Bet')
+    Participation = apps.get_model('pools', 'Participation')
+
+    pool_ids = Participation.objects.values_list('pool_id', flat=True).distinct()
+    for pool_id in pool_ids:
+        streaks = compute_streaks(
+            Bet.objects.filter(pool_id=pool_id, match__finished=True).order_by(
+                'user_id', 'match__start_time', 'id'
+            ).values_list('user_id', 'points_earned').iterator()
+        )
+        participations = list(Participation.objects.filter(pool_id=pool_id, user_id__in=list(streaks)))
+        for participation in participations:
+            for field, value in zip(STREAK_FIELDS, streaks[participation.user_id]):
+                setattr(participation, field, value)
+        Participation.objects.bulk_update(participations, STREAK_FIELDS, batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('pools', '0018_round_points'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='participation',
+            name='current_streak',
+            field=models.PositiveIntegerField(default=0, help_text='Consecutive scoring bets up to the latest finished match'),
+        ),
+        migrations.AddField(
+            model_name='participation',
+            name='longest_streak',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='participation',
+            name='trend',
+            field=models.CharField(choices=[('up', 'Up'), ('down', 'Down'), ('stable', 'Stable')], default='stable', max_length=6),
+        ),
+        migrations.RunPython(build_streaks, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,77 @@
+# Generated by Django 5.2 on 2026-10-18 07:51
+
+import django.db.models.deletion
+from django.conf import settings
+from collections import defaultdict
+from datetime import timedelta
+
+from django.db import migrations, models
+from django.utils import timezone
+
+
+def build_week_points(apps, schema_editor):
+    """Bucket the points of existing finished bets by the ISO week of kickoff"""
+    Bet = apps.get_model('pools', 'Bet')
+    WeekPoints = apps.get_model('pools', 'WeekPoints')
+
+    totals = defaultdict(int)
+    for pool_id, user_id, points, kickoff in Bet.objects.filter(match__finished=True).values_list(
+        'pool_id', 'user_id', 'points_earned', 'match__start_time'
+    ).iterator():
+        day = timezone.localtime(kickoff).date()
+        totals[(pool_id, user_id, day - timedelta(days=day.weekday()))] += points
+
+    WeekPoints.objects.bulk_create(
+        [
+            WeekPoints(pool_id=pool_id, user_id=user_id, week=week, points=points)
+            for (pool_id, user_id, week), points in totals.items()
+            if points
+        ],
+        batch_size=1000,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('pools', '0019_participation_streaks'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='WeekPoints',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('week', models.DateField()),
+                ('points', models.IntegerField(default=0)),
+            ],
+            options={
+                'verbose_name': 'Week points',
+                'verbose_name_plural': 'Week points',
+            },
+        ),
+        migrations.AddIndex(
+            model_name='roundpoints',
+            index=models.Index(fields=['pool', 'round'], name='pools_round_pool_id_1c3d29_idx'),
+        ),
+        migrations.AddField(
+            model_name='weekpoints',
+            name='pool',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='week_points', to='pools.pool'),
+        ),
+        migrations.AddField(
+            model_name='weekpoints',
+            name='user',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='week_points', to=settings.AUTH_USER_MODEL),
+        ),
+        migrations.AddIndex(
+            model_name='weekpoints',
+            index=models.Index(fields=['pool', 'week'], name='pools_weekp_pool_id_667e0f_idx'),
+        ),
+        migrations.AlterUniqueTogether(
+            name='weekpoints',
+            unique_together={('pool', 'user', 'week')},
+        ),
+        migrations.RunPython(build_week_points, migrations.RunPython.noop),
+    ]
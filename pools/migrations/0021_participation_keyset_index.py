@@ -0,0 +1,19 @@
+# Generated by Django 5.2 on 2026-10-18 07:54
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('pools', '0020_week_points'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='participation',
+            index=models.Index(fields=['pool', '-points', 'user'], name='participation_keyset_idx'),
+        ),
+    ]
@@ -0,0 +1,29 @@
+# Generated by Django 5.2 on 2026-10-18 08:00
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('pools', '0021_participation_keyset_index'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='RankingSnapshot',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('round', models.PositiveIntegerField()),
+                ('participants', models.PositiveIntegerField(default=0)),
+                ('standings', models.BinaryField()),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('pool', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='ranking_snapshots', to='pools.pool')),
+            ],
+            options={
+                'ordering': ['pool', 'round'],
+                'unique_together': {('pool', 'round')},
+            },
+        ),
+    ]
@@ -0,0 +1,51 @@
+# Generated by Django 5.2 on 2026-10-18 08:03
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+def flag_scored_matches(apps, schema_editor):
+    """The first rollup run counts the matches scored before this migration"""
+    Match = apps.get_model('pools', 'Match')
+    Match.objects.filter(scored=True).update(rollup_pending=True)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('pools', '0022_ranking_snapshot'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='bet',
+            name='rolled_up_points',
+            field=models.IntegerField(blank=True, editable=False, null=True),
+        ),
+        migrations.AddField(
+            model_name='match',
+            name='rollup_pending',
+            field=models.BooleanField(db_index=True, default=False, editable=False),
+        ),
+        migrations.CreateModel(
+            name='GlobalScore',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('scope', models.CharField(choices=[('overall', 'Overall'), ('competition', 'Competition'), ('season', 'Season')], max_length=20)),
+                ('key', models.CharField(blank=True, max_length=50)),
+                ('bets', models.PositiveIntegerField(default=0)),
+                ('correct_bets', models.PositiveIntegerField(default=0)),
+                ('points', models.IntegerField(default=0)),
+                ('avg_points', models.FloatField(default=0)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='global_scores', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'indexes': [models.Index(fields=['scope', 'key', '-avg_points'], name='globalscore_ranking_idx')],
+                'unique_together': {('scope', 'key', 'user')},
+            },
+        ),
+        migrations.RunPython(flag_scored_matches, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.2 on 2026-10-18 08:07
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('pools', '0023_global_scores'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='championship',
+            name='api_validators',
+            field=models.JSONField(blank=True, default=dict, editable=False),
+        ),
+    ]
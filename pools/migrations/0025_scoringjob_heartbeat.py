@@ -0,0 +1,18 @@
+# Generated by Django 5.2 on 2026-10-18 14:12
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('pools', '0024_championship_api_validators'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='scoringjob',
+            name='heartbeat_at',
+            field=models.DateTimeField(blank=True, help_text="Last renewal of the running worker's lease", null=True),
+        ),
+    ]
@@ -0,0 +1,30 @@
+# Generated by Django 5.2 on 2026-10-18 14:40
+
+from django.db import migrations, models
+
+
+def drop_duplicate_jobs(apps, schema_editor):
+    """Keep the oldest job of each (match, result_version) before the unique constraint"""
+    ScoringJob = apps.get_model('pools', 'ScoringJob')
+    duplicates = ScoringJob.objects.values('match_id', 'result_version').annotate(
+        first=models.Min('id'), total=models.Count('id')
+    ).filter(total__gt=1)
+    for row in duplicates.iterator():
+        ScoringJob.objects.filter(match_id=row['match_id'], result_version=row['result_version']).exclude(
+            id=row['first']
+        ).delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('pools', '0025_scoringjob_heartbeat'),
+    ]
+
+    operations = [
+        migrations.RunPython(drop_duplicate_jobs, migrations.RunPython.noop),
+        migrations.AlterUniqueTogether(
+            name='scoringjob',
+            unique_together={('match', 'result_version')},
+        ),
+    ]
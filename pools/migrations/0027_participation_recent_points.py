@@ -0,0 +1,18 @@
+# Generated by Django 5.2 on 2026-10-18 15:21
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('pools', '0026_scoringjob_unique_version'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='participation',
+            name='recent_points',
+            field=models.CharField(blank=True, editable=False, max_length=64, null=True),
+        ),
+    ]
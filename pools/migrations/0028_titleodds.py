@@ -0,0 +1,30 @@
+# Generated by Django 5.2 on 2026-10-18 19:02
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('pools', '0027_participation_recent_points'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='TitleOdds',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('results_version', models.PositiveIntegerField()),
+                ('simulations', models.PositiveIntegerField()),
+                ('remaining_matches', models.PositiveIntegerField()),
+                ('participants', models.JSONField(default=dict)),
+                ('computed_at', models.DateTimeField(auto_now=True)),
+                ('pool', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='title_odds', to='pools.pool')),
+            ],
+            options={
+                'verbose_name': 'Title odds',
+                'verbose_name_plural': 'Title odds',
+            },
+        ),
+    ]
@@ -0,0 +1,20 @@
+# Generated by Django 5.2 on 2026-10-18 19:30
+
+from django.core.management import call_command
+from django.db import migrations
+
+
+def create_cache_table(apps, schema_editor):
+    """Table of the shared DatabaseCache (settings.CACHES); a no-op for other backends"""
+    call_command('createcachetable', database=schema_editor.connection.alias, verbosity=0)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('pools', '0028_titleodds'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_cache_table, migrations.RunPython.noop),
+    ]
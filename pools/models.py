@@ -1,13 +1,19 @@
-from django.db import models
+from django.db import IntegrityError, models, transaction
 from django.conf import settings
 from django.urls import reverse
 from django.utils.text import slugify
 import uuid
-from django.db.models.signals import post_save
+from django.db.models import F
+from django.db.models.signals import post_save, post_delete
 from django.dispatch import receiver
 from django.core.exceptions import ValidationError
 from django.utils import timezone
 from django.utils.crypto import get_random_string
+from datetime import timedelta
+
+import numpy as np
+
+from .ranking import unpack_standings
 
 class Sport(models.Model):
     name = models.CharField(max_length=100)
@@ -58,6 +64,8 @@ class Championship(models.Model):
     auto_update = models.BooleanField(default=False)
     update_frequency = models.IntegerField(default=24, help_text="Update frequency in hours")
     last_update = models.DateTimeField(null=True, blank=True)
+    # Validadores HTTP (ETag/Last-Modified) da última resposta de cada endpoint da API
+    api_validators = models.JSONField(default=dict, blank=True, editable=False)
     
     def save(self, *args, **kwargs):
         if not self.slug:
@@ -67,6 +75,17 @@ class Championship(models.Model):
     def __str__(self):
         return f"{self.name} {self.season}"
     
+    def next_update_at(self):
+        """When the next automatic update is due (None: right away)"""
+        if self.last_update is None:
+            return None
+        return self.last_update + timedelta(hours=self.update_frequency)
+    
+    def is_due(self, now=None):
+        """Whether auto_update is on and update_frequency hours passed since the last update"""
+        next_update = self.next_update_at()
+        return self.auto_update and (next_update is None or next_update <= (now or timezone.now()))
+    
     class Meta:
         verbose_name = "Championship"
         verbose_name_plural = "Championships"
@@ -168,6 +187,32 @@ class Pool(models.Model):
     # Invitation key
     invitation_key = models.UUIDField(default=uuid.uuid4, editable=False)
     
+    # Bumped (via F()) whenever scoring or the match list changes; keys the caches of derived stats
+    results_version = models.PositiveIntegerField(default=0, editable=False)
+    
+    SCORING_FIELDS = ('exact_score_points', 'correct_difference_points', 'correct_winner_points', 'wrong_points')
+    
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        rules = instance.loaded_scoring_rules()
+        if rules is not None:
+            instance._loaded_rules = rules
+        return instance
+    
+    def get_scoring_rules(self):
+        return tuple(getattr(self, field, None) for field in self.SCORING_FIELDS)
+    
+    def loaded_scoring_rules(self):
+        """
+        The scoring rules read from __dict__, or None when any of them is
+        deferred: reading a deferred field reloads the instance through
+        from_db again (only(), defer() and cascade deletes load Pools so).
+        """
+        if self.get_deferred_fields().intersection(self.SCORING_FIELDS):
+            return None
+        return tuple(self.__dict__[field] for field in self.SCORING_FIELDS)
+    
     def save(self, *args, **kwargs):
         # Ensure slug is generated from name
         if not self.slug:
@@ -178,7 +223,30 @@ class Pool(models.Model):
             while Pool.objects.filter(slug=self.slug).exists():
                 self.slug = f"{orig_slug}-{counter}"
                 counter += 1
+        
+        # Sem snapshot (instância nova ou com regras adiadas) não há mudança a detectar
+        rules = self.loaded_scoring_rules()
+        rules_changed = hasattr(self, '_loaded_rules') and rules is not None and rules != self._loaded_rules
+        
+        # results_version só é alterado por bump_results_version; um save com
+        # instância antiga não pode sobrescrever o valor atual
+        if not self._state.adding and kwargs.get('update_fields') is None:
+            kwargs['update_fields'] = [
+                field.name for field in self._meta.concrete_fields
+                if not field.primary_key and field.name != 'results_version'
+            ]
         super().save(*args, **kwargs)
+        if rules is not None:
+            self._loaded_rules = rules
+        
+        # Point rules changed: queue a rescore of the pool's whole history
+        if rules_changed:
+            PoolRescore.request(self)
+    
+    @classmethod
+    def bump_results_version(cls, pool_ids):
+        """Invalidate every cache derived from these pools' results"""
+        return cls.objects.filter(pk__in=list(pool_ids)).update(results_version=F('results_version') + 1)
     
     def get_absolute_url(self):
         return reverse('pools:detail', kwargs={'slug': self.slug})
@@ -258,6 +326,12 @@ class Participation(models.Model):
         ('completed', 'Completed'),
     )
     
+    TREND_CHOICES = (
+        ('up', 'Up'),
+        ('down', 'Down'),
+        ('stable', 'Stable'),
+    )
+    
     user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE)
     pool = models.ForeignKey(Pool, on_delete=models.CASCADE)
     joined_date = models.DateTimeField(auto_now_add=True)
@@ -265,8 +339,28 @@ class Participation(models.Model):
     payment_status = models.CharField(max_length=20, choices=PAYMENT_STATUS_CHOICES, default='pending')
     payment_method = models.CharField(max_length=20, blank=True)
     
+    # Materialized leaderboard, kept up to date by scoring (see pools.leaderboard)
+    rank = models.PositiveIntegerField(default=0, help_text="Competition rank in the pool (ties share the position)")
+    last_movement = models.IntegerField(default=0, help_text="Positions gained (negative: lost) on the last rank change")
+    total_bets = models.PositiveIntegerField(default=0)
+    finished_bets = models.PositiveIntegerField(default=0)
+    correct_bets = models.PositiveIntegerField(default=0)
+    accuracy = models.FloatField(default=0)
+    avg_points = models.FloatField(default=0)
+    current_streak = models.PositiveIntegerField(default=0, help_text="Consecutive scoring bets up to the latest finished match")
+    longest_streak = models.PositiveIntegerField(default=0)
+    trend = models.CharField(max_length=6, choices=TREND_CHOICES, default='stable')
+    # Points of the latest scored bets, oldest first ("10,0,3"): lets scoring extend the
+    # streaks and trend from the new bets only (NULL: not computed yet)
+    recent_points = models.CharField(max_length=64, null=True, blank=True, editable=False)
+    
     class Meta:
         unique_together = ('user', 'pool')
+        indexes = [
+            models.Index(fields=['pool', 'rank']),
+            # Paginação por cursor do ranking (pontos desc, usuário)
+            models.Index(fields=['pool', '-points', 'user'], name='participation_keyset_idx'),
+        ]
         verbose_name = 'Participation'
         verbose_name_plural = 'Participations'
         
@@ -290,6 +384,68 @@ class Match(models.Model):
         null=True, blank=True, 
         related_name="pool_matches"
     )
+    # Round of the championship (copied from the related game); groups the points history
+    round = models.PositiveIntegerField(null=True, blank=True)
+    # Incremented on every actual change of a finished result (including undoing it); scoring runs once per version
+    result_version = models.PositiveIntegerField(default=0, editable=False)
+    # Set by the first scoring: the bets already count as finished in the leaderboard
+    scored = models.BooleanField(default=False, editable=False)
+    # Points changed since the last global rollup (see pools.rollup)
+    rollup_pending = models.BooleanField(default=False, editable=False, db_index=True)
+    
+    RESULT_FIELDS = ('home_score', 'away_score', 'finished')
+    
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # Campos adiados não entram no snapshot: lê-los recarregaria a instância via from_db
+        deferred = instance.get_deferred_fields()
+        if not deferred.intersection(cls.RESULT_FIELDS):
+            instance._loaded_result = tuple(instance.__dict__[field] for field in cls.RESULT_FIELDS)
+        if 'related_game_id' not in deferred:
+            instance._loaded_game_id = instance.__dict__['related_game_id']
+        return instance
+    
+    def get_result_state(self):
+        return (self.home_score, self.away_score, self.finished)
+    
+    def has_scorable_result(self):
+        return self.finished and self.home_score is not None and self.away_score is not None
+    
+    def save(self, *args, **kwargs):
+        # Só gera nova versão quando o placar final realmente muda; desfazer um
+        # resultado (partida reaberta ou placar apagado) também, para estornar os pontos
+        result_state = self.get_result_state()
+        loaded = getattr(self, '_loaded_result', None)
+        if loaded is None and not self._state.adding:
+            # Instância carregada com o resultado adiado: compara com o gravado
+            loaded = Match.objects.filter(pk=self.pk).values_list(*self.RESULT_FIELDS).first()
+        was_scorable = loaded is not None and loaded[2] and None not in loaded[:2]
+        self._result_changed = (
+            (self.has_scorable_result() or was_scorable) and
+            result_state != loaded
+        )
+        if self._result_changed:
+            self.result_version += 1
+            if kwargs.get('update_fields') is not None:
+                kwargs['update_fields'] = set(kwargs['update_fields']) | {'result_version'}
+        # A rodada vem do jogo ligado; só é buscada quando a ligação muda
+        game_changed = self._state.adding or self.related_game_id != getattr(self, '_loaded_game_id', None)
+        if self.round is None and self.related_game_id and game_changed:
+            if Match.related_game.is_cached(self):
+                self.round = self.related_game.round
+            else:
+                self.round = Game.objects.filter(pk=self.related_game_id).values_list('round', flat=True).first()
+        # scored e rollup_pending só são alterados pela pontuação e pelo rollup;
+        # um save com instância antiga não pode desmarcá-los
+        if not self._state.adding and kwargs.get('update_fields') is None:
+            kwargs['update_fields'] = [
+                field.name for field in self._meta.concrete_fields
+                if not field.primary_key and field.name not in ('scored', 'rollup_pending')
+            ]
+        super().save(*args, **kwargs)
+        self._loaded_result = result_state
+        self._loaded_game_id = self.related_game_id
     
     def calculate_result(self):
         """Calculate the match result: '1' for home win, '2' for away win, 'X' for draw"""
@@ -307,44 +463,17 @@ class Match(models.Model):
             self.home_score = self.related_game.home_score
             self.away_score = self.related_game.away_score
             self.result = self.calculate_result()
-            self.save()
-            
-            # Update scores of related bets
-            self.update_bet_scores()
+            self.finished = True
+            self.save()  # post_save queues the scoring of related bets
     
     def update_bet_scores(self):
-        pool = self.pool
-        bets = self.bets.all()
-        
-        for bet in bets:
-            # Resultado real
-            home_actual = self.home_score
-            away_actual = self.away_score
-            
-            # Aposta do usuário
-            home_bet = bet.home_bet
-            away_bet = bet.away_bet
-            
-            # Default points
-            points = pool.wrong_points
-            
-            # Correct exact score
-            if home_actual == home_bet and away_actual == away_bet:
-                points = pool.exact_score_points
-            
-            # Correct winner and goal difference
-            elif (home_actual - away_actual) == (home_bet - away_bet):
-                points = pool.correct_difference_points
-            
-            # Only correct winner or draw
-            elif (home_actual > away_actual and home_bet > away_bet) or \
-                 (home_actual < away_actual and home_bet < away_bet) or \
-                 (home_actual == away_actual and home_bet == away_bet):
-                points = pool.correct_winner_points
-            
-            # Update bet points
-            bet.points = points
-            bet.save()
+        """Rescore all bets of this match with the pool's point rules"""
+        from .scoring import score_match
+        return score_match(self)
+    
+    def get_crowd_prediction(self):
+        """Summary of the bets placed on this match (see PredictionCount)"""
+        return PredictionCount.summaries([self.pk]).get(self.pk)
     
     def update_from_game(self):
         if not self.related_game:
@@ -355,10 +484,7 @@ class Match(models.Model):
             self.away_score = self.related_game.away_score
             self.result = self.calculate_result()
             self.finished = True
-            self.save()
-            
-            # Update bet scores
-            self.update_bet_scores()
+            self.save()  # post_save queues the scoring of related bets
             return True
             
         return False
@@ -376,6 +502,8 @@ class Bet(models.Model):
     home_score_bet = models.PositiveSmallIntegerField()
     away_score_bet = models.PositiveSmallIntegerField()
     points_earned = models.IntegerField(default=0)
+    # Points already counted in the global rollup (None: not counted yet)
+    rolled_up_points = models.IntegerField(null=True, blank=True, editable=False)
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
     
@@ -389,48 +517,44 @@ class Bet(models.Model):
     
     def calculate_points(self):
         """
-        Calculate points earned based on the real result and the bet.
-        Rules:
-        - 10 points for exact result
-        - 5 points for correct winner and goal difference (except draws with different scores)
-        - 3 points for correct winner or draw
-        - 0 points for error
+        Calculate points earned based on the real result and the bet,
+        using the point values configured on the pool:
+        - exact_score_points for exact result
+        - correct_difference_points for correct winner and goal difference (except draws with different scores)
+        - correct_winner_points for correct winner or draw
+        - wrong_points for error
         """
         if not self.match.finished or self.match.home_score is None or self.match.away_score is None:
             return 0
-            
-        # Exact score match
-        if self.home_score_bet == self.match.home_score and self.away_score_bet == self.match.away_score:
-            return 10
-            
-        # Correct winner and goal difference
-        real_diff = self.match.home_score - self.match.away_score
-        bet_diff = self.home_score_bet - self.away_score_bet
         
-        # Special rule for draws
-        if self.match.home_score == self.match.away_score and self.home_score_bet == self.away_score_bet:
-            if self.match.home_score != self.home_score_bet:
-                return 3
-                
-        # Other cases with same difference
-        if (real_diff == bet_diff) and (
-            (self.match.home_score > self.match.away_score and self.home_score_bet > self.away_score_bet) or
-            (self.match.home_score < self.match.away_score and self.home_score_bet < self.away_score_bet)
-        ):
-            return 5
-            
-        # Correct winner or draw
-        real_result = 0 if self.match.home_score == self.match.away_score else (1 if self.match.home_score > self.match.away_score else -1)
-        bet_result = 0 if self.home_score_bet == self.away_score_bet else (1 if self.home_score_bet > self.away_score_bet else -1)
-        
-        if real_result == bet_result:
-            return 3
-            
-        return 0
+        from .scoring import ScoringRules, score_predictions
+        return int(score_predictions(
+            self.home_score_bet,
+            self.away_score_bet,
+            self.match.home_score,
+            self.match.away_score,
+            ScoringRules.from_pool(self.pool)
+        ))
+    
+    PREDICTION_FIELDS = ('match_id', 'home_score_bet', 'away_score_bet')
+    
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # Campos adiados não entram no snapshot: lê-los recarregaria a instância via from_db
+        if not instance.get_deferred_fields().intersection(cls.PREDICTION_FIELDS):
+            instance._loaded_prediction = tuple(instance.__dict__[field] for field in cls.PREDICTION_FIELDS)
+        return instance
+    
+    def get_prediction(self):
+        return (self.match_id, self.home_score_bet, self.away_score_bet)
     
     def save(self, *args, **kwargs):
-        if self.match.finished:
-            self.points_earned = self.calculate_points()
+        if not self._state.adding and getattr(self, '_loaded_prediction', None) is None:
+            # Instância carregada com o palpite adiado: compara com o gravado
+            self._loaded_prediction = Bet.objects.filter(pk=self.pk).values_list(*self.PREDICTION_FIELDS).first()
+        # Pontos e totais de apostas em partidas já pontuadas: ver score_bet_on_scored_match
+        self._prediction_changed = self._state.adding or self.get_prediction() != getattr(self, '_loaded_prediction', None)
         super().save(*args, **kwargs)
     
     def clean(self):
@@ -438,30 +562,404 @@ class Bet(models.Model):
         if hasattr(self, 'match') and self.match and self.match.start_time <= timezone.now():
             raise ValidationError("Cannot place bets on matches that have already started.")
 
+class PredictionCount(models.Model):
+    """
+    Crowd prediction histogram: number of bets on a match with a given scoreline.
+    
+    Maintained incrementally by the Bet save/delete signals, so the summary of
+    a match is read from a handful of rows whatever its number of bets.
+    """
+    match = models.ForeignKey(Match, on_delete=models.CASCADE, related_name='prediction_counts')
+    home_score_bet = models.PositiveSmallIntegerField()
+    away_score_bet = models.PositiveSmallIntegerField()
+    count = models.IntegerField(default=0)
+    
+    class Meta:
+        unique_together = ('match', 'home_score_bet', 'away_score_bet')
+        verbose_name = 'Prediction Count'
+        verbose_name_plural = 'Prediction Counts'
+    
+    def __str__(self):
+        return f"{self.match}: {self.home_score_bet} x {self.away_score_bet} ({self.count})"
+    
+    @classmethod
+    def record(cls, match_id, home_score_bet, away_score_bet, delta):
+        """Add delta to a scoreline's counter with an F() update"""
+        if delta > 0:
+            cls.objects.get_or_create(
+                match_id=match_id, home_score_bet=home_score_bet, away_score_bet=away_score_bet
+            )
+        return cls.objects.filter(
+            match_id=match_id, home_score_bet=home_score_bet, away_score_bet=away_score_bet
+        ).update(count=F('count') + delta)
+    
+    @classmethod
+    def summaries(cls, match_ids, top=5):
+        """
+        Crowd summary per match id: total bets, home/draw/away percentages,
+        average predicted goals and the most predicted scorelines.
+        """
+        histograms = {}
+        for match_id, home, away, count in cls.objects.filter(
+            match_id__in=list(match_ids), count__gt=0
+        ).values_list('match_id', 'home_score_bet', 'away_score_bet', 'count'):
+            histograms.setdefault(match_id, []).append((home, away, count))
+        
+        summaries = {}
+        for match_id, histogram in histograms.items():
+            total = sum(count for _, _, count in histogram)
+            home_wins = sum(count for home, away, count in histogram if home > away)
+            draws = sum(count for home, away, count in histogram if home == away)
+            histogram.sort(key=lambda row: -row[2])
+            summaries[match_id] = {
+                'total': total,
+                'home_percentage': home_wins * 100 / total,
+                'draw_percentage': draws * 100 / total,
+                'away_percentage': (total - home_wins - draws) * 100 / total,
+                'avg_home_goals': sum(home * count for home, _, count in histogram) / total,
+                'avg_away_goals': sum(away * count for _, away, count in histogram) / total,
+                'top_scorelines': [
+                    {'home': home, 'away': away, 'count': count, 'percentage': count * 100 / total}
+                    for home, away, count in histogram[:top]
+                ],
+            }
+        return summaries
+
+class RoundPoints(models.Model):
+    """
+    Points a participant earned in one round of a pool (matches without a
+    round are grouped under round 0).
+    
+    Filled by scoring with the same point deltas written to Participation,
+    so the evolution of any participant is one indexed read plus a
+    cumulative sum (see pools.history).
+    """
+    pool = models.ForeignKey(Pool, on_delete=models.CASCADE, related_name='round_points')
+    user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name='round_points')
+    round = models.PositiveIntegerField()
+    points = models.IntegerField(default=0)
+    
+    class Meta:
+        unique_together = ('pool', 'user', 'round')
+        indexes = [models.Index(fields=['pool', 'round'])]
+        verbose_name = 'Round points'
+        verbose_name_plural = 'Round points'
+    
+    def __str__(self):
+        return f"{self.user} in {self.pool}, round {self.round}: {self.points}"
+
+class WeekPoints(models.Model):
+    """
+    Points a participant earned in the matches kicked off in one ISO week
+    (week is the Monday, in local time).
+    
+    Maintained by scoring next to RoundPoints; a ranking over any window of
+    weeks sums a handful of these rows (see pools.history.window_ranking).
+    """
+    pool = models.ForeignKey(Pool, on_delete=models.CASCADE, related_name='week_points')
+    user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name='week_points')
+    week = models.DateField()
+    points = models.IntegerField(default=0)
+    
+    class Meta:
+        unique_together = ('pool', 'user', 'week')
+        indexes = [models.Index(fields=['pool', 'week'])]
+        verbose_name = 'Week points'
+        verbose_name_plural = 'Week points'
+    
+    def __str__(self):
+        return f"{self.user} in {self.pool}, week of {self.week}: {self.points}"
+    
+    @staticmethod
+    def week_of(moment):
+        """Monday (local date) of the ISO week of a datetime"""
+        day = timezone.localtime(moment).date()
+        return day - timedelta(days=day.weekday())
+
+class RankingSnapshot(models.Model):
+    """
+    Standings of a pool after one of its rounds was completed: every
+    participant's cumulative points and position, packed into a single blob
+    (see pools.ranking.pack_standings), so one row per pool per round stays
+    small even for long seasons and big pools.
+    
+    Rebuilt by scoring from the RoundPoints buckets whenever a round is
+    completed or a completed round's points change (see
+    pools.leaderboard.refresh_snapshots); the ranking page reads them for
+    position movements.
+    """
+    pool = models.ForeignKey(Pool, on_delete=models.CASCADE, related_name='ranking_snapshots')
+    round = models.PositiveIntegerField()
+    participants = models.PositiveIntegerField(default=0)
+    standings = models.BinaryField()
+    updated_at = models.DateTimeField(auto_now=True)
+    
+    class Meta:
+        unique_together = ('pool', 'round')
+        ordering = ['pool', 'round']
+    
+    def __str__(self):
+        return f"{self.pool}, round {self.round}: {self.participants} participants"
+    
+    def positions(self, user_ids=None):
+        """{user_id: (position, points)}, optionally limited to the given users"""
+        ids, points, positions = unpack_standings(self.standings)
+        if user_ids is not None:
+            keep = np.isin(ids, np.fromiter(user_ids, dtype=np.int64))
+            ids, points, positions = ids[keep], points[keep], positions[keep]
+        return {
+            user_id: (position, user_points)
+            for user_id, user_points, position in zip(ids.tolist(), points.tolist(), positions.tolist())
+        }
+
+class TitleOdds(models.Model):
+    """
+    Latest Monte Carlo title odds of a pool (see pools.simulation).
+    
+    Written by the refresh_title_odds command and read by the ranking page,
+    so every process sees the same odds; results_version tells which
+    results they were computed from.
+    """
+    pool = models.OneToOneField(Pool, on_delete=models.CASCADE, related_name='title_odds')
+    results_version = models.PositiveIntegerField()
+    simulations = models.PositiveIntegerField()
+    remaining_matches = models.PositiveIntegerField()
+    # {user_id: {'first': p, 'top3': p}} (chaves em texto, como no JSON)
+    participants = models.JSONField(default=dict)
+    computed_at = models.DateTimeField(auto_now=True)
+    
+    class Meta:
+        verbose_name = 'Title odds'
+        verbose_name_plural = 'Title odds'
+    
+    def __str__(self):
+        return f"{self.pool}: odds of results v{self.results_version}"
+    
+    def as_dict(self):
+        """The odds in the format of simulation.title_odds, plus results_version"""
+        return {
+            'simulations': self.simulations,
+            'remaining_matches': self.remaining_matches,
+            'results_version': self.results_version,
+            'participants': {int(user_id): result for user_id, result in self.participants.items()},
+        }
+
+class GlobalScore(models.Model):
+    """
+    A user's performance across all the pools they play in, overall, per
+    Competition or per season.
+    
+    Maintained incrementally by the rollup_global_scores command from the
+    bets scored since its previous run (see pools.rollup), so the site-wide
+    rankings never aggregate the Bet table. Ranked by average points per
+    scored bet.
+    """
+    SCOPE_CHOICES = (
+        ('overall', 'Overall'),
+        ('competition', 'Competition'),
+        ('season', 'Season'),
+    )
+    
+    scope = models.CharField(max_length=20, choices=SCOPE_CHOICES)
+    # '' no escopo geral, id da competição ou temporada (ex.: '2025')
+    key = models.CharField(max_length=50, blank=True)
+    user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name='global_scores')
+    bets = models.PositiveIntegerField(default=0)
+    correct_bets = models.PositiveIntegerField(default=0)
+    points = models.IntegerField(default=0)
+    avg_points = models.FloatField(default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+    
+    class Meta:
+        unique_together = ('scope', 'key', 'user')
+        indexes = [models.Index(fields=['scope', 'key', '-avg_points'], name='globalscore_ranking_idx')]
+    
+    def __str__(self):
+        return f"{self.user} ({self.scope} {self.key}): {self.points} pts in {self.bets} bets"
+
+class ScoringJob(models.Model):
+    """Durable queue of result-scoring work, processed by process_scoring_jobs"""
+    STATUS_CHOICES = (
+        ('pending', 'Pending'),
+        ('running', 'Running'),
+        ('done', 'Done'),
+        ('failed', 'Failed'),
+    )
+    
+    match = models.ForeignKey(Match, on_delete=models.CASCADE, related_name='scoring_jobs')
+    result_version = models.PositiveIntegerField(default=0)
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default='pending')
+    attempts = models.PositiveIntegerField(default=0)
+    max_attempts = models.PositiveIntegerField(default=5)
+    available_at = models.DateTimeField(default=timezone.now, help_text="Job is not picked up before this time (retry backoff)")
+    created_at = models.DateTimeField(auto_now_add=True)
+    started_at = models.DateTimeField(null=True, blank=True)
+    heartbeat_at = models.DateTimeField(null=True, blank=True, help_text="Last renewal of the running worker's lease")
+    finished_at = models.DateTimeField(null=True, blank=True)
+    bets_updated = models.IntegerField(default=0)
+    last_error = models.TextField(blank=True)
+    
+    class Meta:
+        ordering = ['available_at']
+        unique_together = ['match', 'result_version']
+        indexes = [models.Index(fields=['status', 'available_at'])]
+        verbose_name = 'Scoring job'
+        verbose_name_plural = 'Scoring jobs'
+    
+    def __str__(self):
+        return f"Scoring {self.match} ({self.status})"
+    
+    @classmethod
+    def enqueue(cls, match):
+        """Queue scoring for the current result version of a match (once per version)"""
+        try:
+            with transaction.atomic():
+                return cls.objects.create(match=match, result_version=match.result_version)
+        except IntegrityError:
+            # Outro processo já enfileirou esta versão
+            return cls.objects.get(match=match, result_version=match.result_version)
+    
+    @property
+    def lag(self):
+        """Time between enqueueing and completion (or now, if still queued)"""
+        return (self.finished_at or timezone.now()) - self.created_at
+
+class PoolRescore(models.Model):
+    """Checkpointed whole-pool rescore, queued when a pool's point rules change"""
+    STATUS_CHOICES = (
+        ('pending', 'Pending'),
+        ('running', 'Running'),
+        ('done', 'Done'),
+    )
+    
+    pool = models.ForeignKey(Pool, on_delete=models.CASCADE, related_name='rescores')
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default='pending')
+    last_bet_id = models.BigIntegerField(default=0, help_text="Checkpoint: last bet id already rescored")
+    bets_processed = models.PositiveIntegerField(default=0)
+    bets_changed = models.PositiveIntegerField(default=0)
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+    
+    class Meta:
+        ordering = ['created_at']
+        verbose_name = 'Pool rescore'
+        verbose_name_plural = 'Pool rescores'
+    
+    def __str__(self):
+        return f"Rescore {self.pool} ({self.status})"
+    
+    @classmethod
+    def request(cls, pool):
+        """Queue a rescore; an unfinished one is restarted, since the rules changed again"""
+        rescore = cls.objects.filter(pool=pool).exclude(status='done').first()
+        if rescore is None:
+            return cls.objects.create(pool=pool)
+        rescore.status = 'pending'
+        rescore.last_bet_id = 0
+        rescore.bets_processed = 0
+        rescore.bets_changed = 0
+        rescore.save()
+        return rescore
+
 @receiver(post_save, sender=Match)
 def update_bets_points(sender, instance, **kwargs):
     """
-    When a match is updated as finished, recalculate the points
-    of all associated bets and update participant scores.
+    When a match result actually changes, queue the scoring of its bets
+    (or, when the result was undone, the reversal of their points).
+    Re-saves with an unchanged score are skipped (see Match.result_version).
+    The actual scoring runs in the process_scoring_jobs worker.
     """
-    if instance.finished:
-        bets = Bet.objects.filter(match=instance)
-        
-        for bet in bets:
-            old_points = bet.points_earned
-            new_points = bet.calculate_points()
-            
-            if old_points != new_points:
-                bet.points_earned = new_points
-                bet.save(update_fields=['points_earned'])
-                
-                participation = Participation.objects.get(user=bet.user, pool=bet.pool)
-                participation.points = Bet.objects.filter(
-                    user=bet.user, 
-                    pool=bet.pool, 
-                    match__finished=True
-                ).aggregate(total=models.Sum('points_earned'))['total'] or 0
-                participation.save(update_fields=['points'])
+    if getattr(instance, '_result_changed', False):
+        ScoringJob.enqueue(instance)
+    elif kwargs.get('created') and instance.pool_id:
+        # Nova partida muda a pontuação máxima possível do bolão
+        Pool.bump_results_version([instance.pool_id])
+
+@receiver(post_save, sender=Bet)
+def update_prediction_counts(sender, instance, created, **kwargs):
+    """Move the bet between scoreline counters when its prediction changes"""
+    prediction = instance.get_prediction()
+    previous = None if created else getattr(instance, '_loaded_prediction', None)
+    if prediction == previous:
+        return
+    if previous is not None:
+        PredictionCount.record(*previous, -1)
+    PredictionCount.record(*prediction, 1)
+    instance._loaded_prediction = prediction
+
+@receiver(post_delete, sender=Bet)
+def remove_prediction_count(sender, instance, **kwargs):
+    prediction = getattr(instance, '_loaded_prediction', None) or instance.get_prediction()
+    PredictionCount.record(*prediction, -1)
+
+@receiver(post_save, sender=Bet)
+def count_participation_bet(sender, instance, created, **kwargs):
+    if created:
+        Participation.objects.filter(user_id=instance.user_id, pool_id=instance.pool_id).update(
+            total_bets=F('total_bets') + 1
+        )
+
+@receiver(post_delete, sender=Bet)
+def uncount_participation_bet(sender, instance, **kwargs):
+    Participation.objects.filter(user_id=instance.user_id, pool_id=instance.pool_id, total_bets__gt=0).update(
+        total_bets=F('total_bets') - 1
+    )
+
+@receiver(post_save, sender=Bet)
+def score_bet_on_scored_match(sender, instance, created, **kwargs):
+    """
+    A bet placed or edited after its match was scored: score it through the
+    delta path, so Participation and the round/week buckets follow the bet.
+    """
+    if getattr(instance, '_prediction_changed', created) and instance.match.finished:
+        from .scoring import score_bet
+        score_bet(instance, created=created)
+
+@receiver(post_delete, sender=Bet)
+def unscore_deleted_bet(sender, instance, origin=None, **kwargs):
+    """
+    Subtract a deleted bet of a scored match from the totals. When the
+    match itself is being deleted the pools are reranked once, afterwards
+    (see invalidate_pool_results); when its pool or user is, the totals go
+    with the cascade and are left alone.
+    """
+    origin_model = origin.model if isinstance(origin, models.QuerySet) else type(origin)
+    if origin is not None and origin_model not in (Bet, Match):
+        # Bolão, competição ou usuário removidos: os totais saem junto na cascata
+        return
+    from .scoring import unscore_bet
+    cascade = isinstance(origin, Match)
+    if unscore_bet(instance, rerank=not cascade) and cascade:
+        origin._unscored_pools = getattr(origin, '_unscored_pools', set()) | {instance.pool_id}
+
+@receiver(post_delete, sender=Bet)
+def unroll_deleted_bet(sender, instance, origin=None, **kwargs):
+    """Subtract a deleted bet's rolled-up points from the global rankings"""
+    if isinstance(origin, models.Model) and origin._meta.label == settings.AUTH_USER_MODEL:
+        # O usuário inteiro está sendo removido, com os GlobalScore dele
+        return
+    from .rollup import unroll_bet
+    unroll_bet(instance)
+
+@receiver(post_save, sender=Participation)
+@receiver(post_delete, sender=Participation)
+def rerank_pool(sender, instance, created=False, **kwargs):
+    """A participant joined or left: recompute the pool's ranks"""
+    if created or kwargs.get('signal') is post_delete:
+        from .leaderboard import refresh_leaderboard
+        refresh_leaderboard([instance.pool_id])
+
+@receiver(post_delete, sender=Match)
+def invalidate_pool_results(sender, instance, **kwargs):
+    if instance.pool_id:
+        Pool.bump_results_version([instance.pool_id])
+    pool_ids = getattr(instance, '_unscored_pools', None)
+    if pool_ids:
+        from .leaderboard import refresh_leaderboard, refresh_snapshots, refresh_streaks
+        refresh_leaderboard(pool_ids)
+        refresh_streaks(pool_ids)
+        refresh_snapshots(pool_ids, from_round=instance.round or 0)
 
 class Invitation(models.Model):
     """Model for pool invitations"""
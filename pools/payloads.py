@@ -0,0 +1,220 @@
+"""
+Content-addressed store of the raw API payloads.
+
+Every 200 response of the providers is kept on disk (settings.API_PAYLOAD_DIR)
+so the games and standings can be rebuilt offline, without spending API
+quota: after an ingestion bug fix, for deterministic ingestion benchmarks or
+to feed tests. Bodies are gzipped under their SHA-256 (blobs/ab/abcd....gz),
+so the identical responses of repeated syncs are stored once, and index.jsonl
+gets one line per fetch with the endpoint, query params, time, validators
+and body hash.
+
+Capturing is off unless API_PAYLOAD_DIR is set. PayloadStore.prune (the
+prune_api_payloads command) drops the entries older than the retention and
+the blobs no entry uses any more.
+
+ReplaySession answers GETs from the store instead of the network; plugged
+into an ApiClient (see apiclient.replay_client) it replays a sync as a local
+stub of the provider. ApiIntegrationService.replay walks the stored history
+of a championship directly.
+"""
+
+import bisect
+import gzip
+import hashlib
+import json
+import logging
+import os
+import tempfile
+import threading
+from datetime import datetime, timezone as dt_timezone
+from pathlib import Path
+from urllib.parse import urlsplit
+
+import requests
+from django.conf import settings
+from requests.structures import CaseInsensitiveDict
+
+logger = logging.getLogger(__name__)
+
+INDEX_NAME = 'index.jsonl'
+COMPRESS_LEVEL = 6
+
+
+def endpoint_of(url):
+    """Key of a URL's endpoint: host and path, without the query"""
+    parts = urlsplit(url)
+    return f'{parts.hostname or ""}{parts.path}'
+
+
+def canonical_params(params):
+    """Query params as a sorted dict of strings, so equal queries compare equal"""
+    return {str(key): str(value) for key, value in sorted((params or {}).items())}
+
+
+def fetch_time(entry):
+    return entry['fetched_at']
+
+
+class PayloadStore:
+    """
+    On-disk store of API response bodies, safe to share between threads.
+    index.jsonl is read once per store and then kept in memory, with the
+    entries saved through the store added to it; entries written by another
+    process only show up in a new store.
+    """
+
+    def __init__(self, root):
+        self.root = Path(root)
+        self.lock = threading.Lock()
+        self._index = None
+
+    @property
+    def index_path(self):
+        return self.root / INDEX_NAME
+
+    def blob_path(self, digest):
+        return self.root / 'blobs' / digest[:2] / f'{digest}.gz'
+
+    def save(self, endpoint, params, body, headers=None, fetched_at=None):
+        """
+        Store a response body fetched from an endpoint (see endpoint_of)
+        with the given params. Returns the index entry.
+        """
+        digest = hashlib.sha256(body).hexdigest()
+        path = self.blob_path(digest)
+        if not path.exists():
+            path.parent.mkdir(parents=True, exist_ok=True)
+            # Arquivo temporário + rename: nunca deixa um blob pela metade
+            fd, tmp = tempfile.mkstemp(dir=path.parent, suffix='.tmp')
+            with os.fdopen(fd, 'wb') as file:
+                file.write(gzip.compress(body, COMPRESS_LEVEL))
+            os.replace(tmp, path)
+
+        headers = headers or {}
+        entry = {
+            'endpoint': endpoint,
+            'params': canonical_params(params),
+            'fetched_at': (fetched_at or datetime.now(dt_timezone.utc)).isoformat(),
+            'sha256': digest,
+            'size': len(body),
+            'etag': headers.get('ETag', ''),
+            'last_modified': headers.get('Last-Modified', ''),
+        }
+        line = json.dumps(entry, sort_keys=True) + '\n'
+        with self.lock:
+            self.root.mkdir(parents=True, exist_ok=True)
+            with open(self.index_path, 'a', encoding='utf-8') as index:
+                index.write(line)
+            if self._index is not None:
+                bisect.insort(self._index, entry, key=fetch_time)
+        return entry
+
+    def _read_index(self):
+        """Entries of index.jsonl in fetch order (none without an index)"""
+        if not self.index_path.exists():
+            return []
+        with open(self.index_path, encoding='utf-8') as index:
+            entries = [json.loads(line) for line in index if line.strip()]
+        return sorted(entries, key=fetch_time)
+
+    def entries(self, endpoint=None, params=None, until=None):
+        """
+        Index entries in fetch order, optionally of one endpoint, with exactly
+        the given params and fetched up to `until` (an aware datetime).
+        """
+        params = canonical_params(params) if params is not None else None
+        with self.lock:
+            if self._index is None:
+                self._index = self._read_index()
+            return [
+                entry for entry in self._index
+                if (endpoint is None or entry['endpoint'] == endpoint)
+                and (params is None or entry['params'] == params)
+                and (until is None or datetime.fromisoformat(entry['fetched_at']) <= until)
+            ]
+
+    def latest(self, endpoint, params=None, until=None):
+        """Most recent entry of an endpoint (with those params, when given), or None"""
+        entries = self.entries(endpoint, params, until)
+        return entries[-1] if entries else None
+
+    def body(self, entry):
+        """Raw body bytes of an entry"""
+        return gzip.decompress(self.blob_path(entry['sha256']).read_bytes())
+
+    def load(self, entry):
+        """Decoded JSON body of an entry"""
+        return json.loads(self.body(entry))
+
+    def prune(self, before):
+        """
+        Drop the entries fetched before `before` (an aware datetime), except
+        the latest one of each endpoint and params, so a replay still finds
+        the last known state, then delete the blobs no entry uses any more.
+        Returns (entries removed, blobs removed).
+        """
+        with self.lock:
+            entries = self._read_index()
+            latest = {}
+            for entry in entries:
+                latest[entry['endpoint'], json.dumps(entry['params'], sort_keys=True)] = entry
+            kept = [
+                entry for entry in entries
+                if datetime.fromisoformat(entry['fetched_at']) >= before
+                or latest[entry['endpoint'], json.dumps(entry['params'], sort_keys=True)] is entry
+            ]
+            if len(kept) < len(entries):
+                # Índice novo em arquivo temporário + rename, como os blobs
+                fd, tmp = tempfile.mkstemp(dir=self.root, suffix='.tmp')
+                with os.fdopen(fd, 'w', encoding='utf-8') as index:
+                    index.writelines(json.dumps(entry, sort_keys=True) + '\n' for entry in kept)
+                os.replace(tmp, self.index_path)
+            self._index = kept
+
+            used = {entry['sha256'] for entry in kept}
+            blobs = 0
+            for path in self.root.glob('blobs/*/*.gz'):
+                if path.name[:-len('.gz')] not in used:
+                    path.unlink()
+                    blobs += 1
+        return len(entries) - len(kept), blobs
+
+
+def get_payload_store():
+    """The store at settings.API_PAYLOAD_DIR, or None when capturing is disabled (the default)"""
+    root = getattr(settings, 'API_PAYLOAD_DIR', None)
+    return PayloadStore(root) if root else None
+
+
+class ReplaySession:
+    """
+    Stand-in for requests.Session answering GETs from a PayloadStore: the
+    latest payload of the endpoint fetched with the same params (falling back
+    to the endpoint's latest one) up to `until`, or a 404 when the endpoint
+    was never captured. Conditional headers are ignored, so a replay always
+    processes the payload.
+    """
+
+    def __init__(self, store, until=None):
+        self.store = store
+        self.until = until
+
+    def get(self, url, params=None, **kwargs):
+        endpoint = endpoint_of(url)
+        entry = self.store.latest(endpoint, params, self.until) or self.store.latest(endpoint, until=self.until)
+        response = requests.Response()
+        response.url = url
+        response.headers = CaseInsensitiveDict()
+        if entry is None:
+            response.status_code = 404
+            response._content = b'{}'
+            return response
+        response.status_code = 200
+        response._content = self.store.body(entry)
+        response.headers['Content-Type'] = 'application/json'
+        if entry['etag']:
+            response.headers['ETag'] = entry['etag']
+        if entry['last_modified']:
+            response.headers['Last-Modified'] = entry['last_modified']
+        return response
@@ -0,0 +1,178 @@
+"""
+Title-race projections: maximum attainable points, clinch and elimination.
+
+For every participant the engine computes the best and worst totals still
+possible with the pool's remaining (not yet scored) matches, and then decides
+who has mathematically clinched first place and who can no longer reach it.
+
+Outcomes are never enumerated jointly. Matches are independent, so the
+largest amount a participant C can gain on a participant L is the sum, over
+the remaining matches, of the largest per-match gain. Each match only needs
+a handful of candidate scorelines (see candidate_outcomes), and the gains
+are computed with the vectorized scoring kernel over participant x outcome
+arrays. Cheap best/worst bounds prune everyone who is obviously decided
+before the pairwise check runs.
+
+Results are cached per pool and keyed by Pool.results_version, so they are
+recomputed only after the next result is scored.
+"""
+
+from collections import defaultdict
+
+import numpy as np
+from django.core.cache import cache
+from django.utils import timezone
+
+from .models import Bet, Match, Participation
+from .ranking import pool_cache_key
+from .scoring import ScoringRules, score_predictions
+
+RACE_CACHE_TIMEOUT = 60 * 60 * 24
+
+# Rivais usados como referência na checagem par a par de eliminação
+ELIMINATION_REFERENCES = 3
+
+
+def candidate_outcomes(home_bet, away_bet):
+    """
+    Scorelines that realise every scoring pattern the predictions allow.
+
+    A participant's points depend on the actual score only through "equals my
+    prediction", the goal difference and the winner. The predicted scores
+    plus one unpredicted scoreline per relevant goal difference (each
+    predicted difference, a draw, and one unpredicted home and away win)
+    therefore cover every possible points vector of the match. Returns
+    (home_scores, away_scores) arrays.
+    """
+    home_bet = np.asarray(home_bet, dtype=np.int64)
+    away_bet = np.asarray(away_bet, dtype=np.int64)
+    base = int(max(home_bet.max(initial=0), away_bet.max(initial=0))) + 1
+
+    diffs = set((home_bet - away_bet).tolist()) | {0}
+    diffs |= {max(diffs) + 1, min(diffs) - 1}
+
+    outcomes = set(zip(home_bet.tolist(), away_bet.tolist()))
+    # Placar com mais gols que qualquer palpite: ninguém acerta o placar exato
+    outcomes |= {(base + max(diff, 0), base + max(-diff, 0)) for diff in diffs}
+
+    home_real, away_real = np.array(sorted(outcomes), dtype=np.int64).T
+    return home_real, away_real
+
+
+def get_race_status(pool):
+    """Cached compute_race_status for the pool's current results"""
+    key = pool_cache_key(pool, 'race')
+    status = cache.get(key)
+    if status is None:
+        status = compute_race_status(pool)
+        cache.set(key, status, RACE_CACHE_TIMEOUT)
+    return status
+
+
+def compute_race_status(pool, now=None):
+    """
+    Max/min attainable points, clinch and elimination for every participant.
+
+    Returns {'remaining_matches': int, 'participants': {user_id: {...}}}
+    where each participant has 'max_points', 'min_points', 'clinched' (sole
+    first place is guaranteed) and 'eliminated' (cannot finish first, not
+    even tied). Both flags are only set when mathematically certain.
+    """
+    now = now or timezone.now()
+    rules = ScoringRules.from_pool(pool)
+
+    participations = list(Participation.objects.filter(pool=pool).values_list('user_id', 'points'))
+    if not participations:
+        return {'remaining_matches': 0, 'participants': {}}
+
+    user_ids, points = (np.array(column, dtype=np.int64) for column in zip(*participations))
+    index = {user_id: i for i, user_id in enumerate(user_ids.tolist())}
+    n = len(user_ids)
+
+    # Partida encerrada mas ainda não pontuada continua em aberto: os pontos
+    # dela não estão em Participation.points. Partidas abertas aceitam palpite
+    # de quem não apostou
+    pool_open = pool.is_open_for_betting()
+    remaining = [
+        (match_id, pool_open and start_time > now)
+        for match_id, start_time in Match.objects.filter(pool=pool, scored=False).values_list('id', 'start_time')
+    ]
+
+    bets_by_match = defaultdict(list)
+    for match_id, user_id, home_bet, away_bet in Bet.objects.filter(
+        pool=pool, match__pool=pool, match__scored=False
+    ).values_list('match_id', 'user_id', 'home_score_bet', 'away_score_bet'):
+        if user_id in index:
+            bets_by_match[match_id].append((index[user_id], home_bet, away_bet))
+
+    # Limites baratos: melhor caso = placar exato em tudo que ainda pode pontuar
+    bet_count = np.zeros(n, dtype=np.int64)
+    open_bet_count = np.zeros(n, dtype=np.int64)
+    open_matches = 0
+    for match_id, is_open in remaining:
+        bettors = np.array([row[0] for row in bets_by_match.get(match_id, ())], dtype=np.int64)
+        np.add.at(bet_count, bettors, 1)
+        if is_open:
+            open_matches += 1
+            np.add.at(open_bet_count, bettors, 1)
+
+    best = points + rules.exact_score * (bet_count + open_matches - open_bet_count)
+    worst = points + rules.wrong * bet_count
+
+    leader = int(np.lexsort((-worst, -points))[0])
+    references = np.unique(np.concatenate(([leader], np.argsort(-worst, kind='stable')[:ELIMINATION_REFERENCES])))
+
+    # Só quem ainda alcança o pior caso do líder precisa da checagem par a par
+    rows = np.flatnonzero(best >= worst[leader])
+    row_position = np.full(n, -1)
+    row_position[rows] = np.arange(len(rows))
+    reference_position = np.full(n, -1)
+    reference_position[references] = np.arange(len(references))
+
+    gain = np.zeros((len(rows), len(references)), dtype=np.int64)
+    for match_id, is_open in remaining:
+        match_bets = bets_by_match.get(match_id)
+        if match_bets:
+            bettors, home_bet, away_bet = (np.array(column, dtype=np.int64) for column in zip(*match_bets))
+        else:
+            bettors = home_bet = away_bet = np.zeros(0, dtype=np.int64)
+
+        home_real, away_real = candidate_outcomes(home_bet, away_bet)
+        outcome_points = score_predictions(
+            home_bet[:, None], away_bet[:, None], home_real[None, :], away_real[None, :], rules
+        ).reshape(len(bettors), len(home_real))
+
+        # Melhor caso de quem persegue, pior caso da referência
+        high = np.full((len(rows), len(home_real)), rules.exact_score if is_open else 0, dtype=np.int64)
+        selected = row_position[bettors] >= 0
+        high[row_position[bettors[selected]]] = outcome_points[selected]
+
+        low = np.zeros((len(references), len(home_real)), dtype=np.int64)
+        selected = reference_position[bettors] >= 0
+        low[reference_position[bettors[selected]]] = outcome_points[selected]
+
+        gain += (high[:, None, :] - low[None, :, :]).max(axis=2)
+
+    # gap[c, r] = maior vantagem final possível de c sobre r
+    gap = points[rows][:, None] - points[references][None, :] + gain
+    gap[rows[:, None] == references[None, :]] = np.iinfo(np.int64).max
+
+    eliminated = best < worst.max()
+    eliminated[rows] |= (gap < 0).any(axis=1)
+
+    leader_column = int(reference_position[leader])
+    others = rows != leader
+    clinched = bool((gap[others, leader_column] < 0).all())
+
+    return {
+        'remaining_matches': len(remaining),
+        'participants': {
+            int(user_id): {
+                'max_points': int(best[i]),
+                'min_points': int(worst[i]),
+                'clinched': clinched and i == leader,
+                'eliminated': bool(eliminated[i]),
+            }
+            for i, user_id in enumerate(user_ids)
+        },
+    }
@@ -0,0 +1,111 @@
+"""
+Ranking helpers shared by the leaderboard, rescoring and analytics code.
+"""
+
+import struct
+import zlib
+
+import numpy as np
+
+# Cabeçalho dos snapshots: versão, participantes, base dos ids, maior pontuação e larguras
+SNAPSHOT_HEADER = struct.Struct('<BIqqBB')
+SNAPSHOT_VERSION = 1
+
+
+def competition_ranks(points):
+    """
+    Competition-style ranks ("1224") for an array of points, highest first.
+
+    Ties share the best position and the next distinct score skips the tied
+    places. Returns an int64 array aligned with the input.
+    """
+    points = np.asarray(points, dtype=np.int64)
+    if points.size == 0:
+        return np.zeros(0, dtype=np.int64)
+
+    # Posição = 1 + quantidade de participantes com mais pontos
+    sorted_desc = np.sort(points)[::-1]
+    return np.searchsorted(-sorted_desc, -points, side='left').astype(np.int64) + 1
+
+
+def pool_cache_key(pool, name):
+    """
+    Cache key for data derived from a pool's results.
+
+    Includes Pool.results_version, which scoring bumps on every new result,
+    so entries expire by themselves when the next result lands.
+    """
+    return f'pool:{pool.pk}:{name}:v{pool.results_version}'
+
+
+def _narrowest(values):
+    """Smallest unsigned dtype holding the non-negative int64 values"""
+    top = int(values.max()) if values.size else 0
+    for dtype in (np.uint8, np.uint16, np.uint32):
+        if top <= np.iinfo(dtype).max:
+            return np.dtype(dtype)
+    return np.dtype(np.uint64)
+
+
+def _shuffled(values, dtype):
+    """Little-endian bytes of values grouped by byte plane (compresses better)"""
+    return values.astype(dtype.newbyteorder('<')).view(np.uint8).reshape(len(values), dtype.itemsize).T.tobytes()
+
+
+def _unshuffled(data, dtype, count):
+    """Inverse of _shuffled"""
+    planes = np.frombuffer(data, dtype=np.uint8, count=count * dtype.itemsize).reshape(dtype.itemsize, count)
+    return np.ascontiguousarray(planes.T).view(dtype.newbyteorder('<')).reshape(count).astype(np.int64)
+
+
+def pack_standings(user_ids, points):
+    """
+    Pack a pool's standings into a compact bytes blob.
+
+    user_ids and points must be in leaderboard order (points descending, then
+    user id). Points are stored as the drops between consecutive participants
+    and ids as the gap to the previous id within a group of tied participants
+    (the offset from the smallest id for the first of a group), each in the
+    narrowest integer type, split in byte planes and zlib-compressed: a few
+    KB for thousands of participants. Positions are not stored, they follow
+    from the points.
+    """
+    user_ids = np.asarray(user_ids, dtype=np.int64)
+    points = np.asarray(points, dtype=np.int64)
+    count = len(user_ids)
+    id_base = int(user_ids.min()) if count else 0
+    top = int(points[0]) if count else 0
+
+    drops = -np.diff(points)
+    tied = np.concatenate([np.zeros(min(count, 1), dtype=bool), drops == 0])
+    gaps = np.where(tied, user_ids - np.concatenate([[id_base], user_ids[:-1]])[:count], user_ids - id_base)
+    id_dtype, drop_dtype = _narrowest(gaps), _narrowest(drops)
+
+    header = SNAPSHOT_HEADER.pack(SNAPSHOT_VERSION, count, id_base, top, id_dtype.itemsize, drop_dtype.itemsize)
+    return header + zlib.compress(_shuffled(gaps, id_dtype) + _shuffled(drops, drop_dtype), 9)
+
+
+def unpack_standings(data):
+    """
+    Unpack a blob written by pack_standings.
+
+    Returns (user_ids, points, positions) int64 arrays in leaderboard order,
+    positions being competition ranks.
+    """
+    data = bytes(data)
+    version, count, id_base, top, id_size, drop_size = SNAPSHOT_HEADER.unpack_from(data)
+    if version != SNAPSHOT_VERSION:
+        raise ValueError(f"Unknown snapshot version {version}")
+
+    body = zlib.decompress(data[SNAPSHOT_HEADER.size:])
+    gaps = _unshuffled(body, np.dtype(f'u{id_size}'), count)
+    drops = _unshuffled(body[count * id_size:], np.dtype(f'u{drop_size}'), max(count - 1, 0))
+    points = top - np.concatenate([np.zeros(min(count, 1), dtype=np.int64), np.cumsum(drops)])
+
+    # Ids: o primeiro de cada grupo de empatados é absoluto, os demais somam ao anterior
+    tied = np.concatenate([np.zeros(min(count, 1), dtype=bool), drops == 0])
+    group_start = np.maximum.accumulate(np.where(tied, 0, np.arange(count)))
+    absolute = np.where(tied, 0, gaps + id_base)
+    cumulative = np.cumsum(np.where(tied, gaps, absolute))
+    user_ids = cumulative - (cumulative[group_start] - absolute[group_start])
+    return user_ids, points, competition_ranks(points)
@@ -0,0 +1,65 @@
+"""
+Token-bucket rate limiting of the external sports APIs.
+
+Providers cap requests per minute per API key, and the sync scheduler calls
+them from several threads at once, so every request goes through the one
+limiter shared by the process for that API host (see limiter_for). A bucket
+allows a burst of half the quota and refills the other half over the minute,
+so no sliding 60-second window ever exceeds the quota.
+"""
+
+import threading
+import time
+from urllib.parse import urlsplit
+
+from django.conf import settings
+
+# Requisições por minuto por host; sobrescrito por settings.API_RATE_LIMITS
+DEFAULT_RATE_LIMITS = {
+    'api.football-data.org': 10,
+}
+
+
+class TokenBucket:
+    """Thread-safe token bucket; acquire() blocks until a token is available"""
+
+    def __init__(self, per_minute, burst=None, clock=time.monotonic, sleep=time.sleep):
+        self.burst = burst if burst is not None else max(per_minute // 2, 1)
+        self.rate = max(per_minute - self.burst, 1) / 60
+        self.tokens = float(self.burst)
+        self.clock = clock
+        self.sleep = sleep
+        self.updated = clock()
+        self.lock = threading.Lock()
+
+    def reserve(self):
+        """Take a token, possibly on credit; returns the seconds to wait before using it"""
+        with self.lock:
+            now = self.clock()
+            self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+            self.updated = now
+            self.tokens -= 1
+            # Saldo negativo: fila de espera, cada um aguarda sua vez
+            return 0.0 if self.tokens >= 0 else -self.tokens / self.rate
+
+    def acquire(self):
+        wait = self.reserve()
+        if wait > 0:
+            self.sleep(wait)
+        return wait
+
+
+_limiters = {}
+_limiters_lock = threading.Lock()
+
+
+def limiter_for(url):
+    """The process-wide TokenBucket of an API URL's host, or None when the host is not limited"""
+    host = urlsplit(url).hostname or ''
+    limits = {**DEFAULT_RATE_LIMITS, **getattr(settings, 'API_RATE_LIMITS', {})}
+    if not limits.get(host):
+        return None
+    with _limiters_lock:
+        if host not in _limiters:
+            _limiters[host] = TokenBucket(limits[host])
+        return _limiters[host]
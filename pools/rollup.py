@@ -0,0 +1,243 @@
+"""
+Site-wide rankings rolled up incrementally from the scored bets.
+
+GlobalScore keeps, per user, the scored bets, correct bets and points summed
+over every pool, overall, per Competition and per season. Scoring flags the
+matches whose points changed (Match.rollup_pending) and every bet remembers
+the points already counted (Bet.rolled_up_points), so rollup_pending_matches
+only reads the bets of the flagged matches and adds the difference: a new
+result adds its bets, a corrected one only the point changes and an undone
+one takes them out again. The
+rollup_global_scores command runs it nightly.
+
+The hall of fame ranks users by average points per scored bet, among those
+with at least HALL_OF_FAME_MIN_BETS bets in the scope, and is cached until
+the next rollup.
+"""
+
+import logging
+from collections import defaultdict
+
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import F, Q
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+
+from .models import Bet, Competition, GlobalScore, Match, Pool
+from .ranking import competition_ranks
+
+logger = logging.getLogger(__name__)
+
+ROLLUP_MATCH_CHUNK = 200
+
+HALL_OF_FAME_MIN_BETS = 10
+HALL_OF_FAME_SIZE = 50
+HALL_OF_FAME_CACHE_TIMEOUT = 60 * 60 * 6
+
+# Versão do cache do hall da fama, trocada a cada rollup
+HALL_OF_FAME_VERSION_KEY = 'hall_of_fame:version'
+
+SCORE_FIELDS = ('bets', 'correct_bets', 'points')
+
+
+def bet_scopes(competition_id, season):
+    """(scope, key) pairs a bet counts towards"""
+    scopes = [('overall', ''), ('competition', str(competition_id))]
+    if season:
+        scopes.append(('season', season))
+    return scopes
+
+
+def apply_global_deltas(deltas):
+    """
+    Add {(scope, key, user_id): [bets, correct_bets, points]} deltas to
+    GlobalScore: one read of the touched rows, one bulk insert of the new
+    ones and one bulk update of the others, with their averages.
+    """
+    deltas = {key: values for key, values in deltas.items() if any(values)}
+    if not deltas:
+        return 0
+
+    grouped = defaultdict(list)
+    for scope, key, user_id in deltas:
+        grouped[(scope, key)].append(user_id)
+    rows = Q()
+    for (scope, key), user_ids in grouped.items():
+        rows |= Q(scope=scope, key=key, user_id__in=user_ids)
+    existing = {(score.scope, score.key, score.user_id): score for score in GlobalScore.objects.filter(rows)}
+
+    created, updated = [], []
+    for (scope, key, user_id), values in deltas.items():
+        score = existing.get((scope, key, user_id))
+        if score is None:
+            score = GlobalScore(scope=scope, key=key, user_id=user_id)
+            created.append(score)
+        else:
+            updated.append(score)
+        for field, delta in zip(SCORE_FIELDS, values):
+            setattr(score, field, getattr(score, field) + delta)
+        score.avg_points = round(score.points / score.bets, 2) if score.bets else 0
+
+    GlobalScore.objects.bulk_create(created, batch_size=1000)
+    GlobalScore.objects.bulk_update(updated, [*SCORE_FIELDS, 'avg_points'], batch_size=1000)
+    return len(deltas)
+
+
+def rollup_pending_matches(chunk_size=ROLLUP_MATCH_CHUNK):
+    """
+    Add the bets of the matches scored since the previous run to GlobalScore.
+
+    Works in chunks of flagged matches, each in its own transaction: the
+    matches are locked (so scoring them again waits for the chunk), their
+    bets read once, the deltas applied and the bets and matches marked as
+    rolled up. Returns {'matches', 'bets', 'rows'} counts.
+    """
+    totals = {'matches': 0, 'bets': 0, 'rows': 0}
+    while True:
+        with transaction.atomic():
+            match_ids = list(
+                Match.objects.select_for_update().filter(rollup_pending=True)
+                .order_by('id').values_list('id', flat=True)[:chunk_size]
+            )
+            if not match_ids:
+                break
+
+            bets = Bet.objects.filter(match_id__in=match_ids).annotate(
+                season=Coalesce('match__related_game__championship__season', 'pool__championship__season'),
+            ).values_list('user_id', 'points_earned', 'rolled_up_points', 'match__competition_id', 'season', 'match__scored')
+
+            deltas = defaultdict(lambda: [0, 0, 0])
+            bet_count = 0
+            for user_id, points, rolled_up, competition_id, season, scored in bets.iterator(chunk_size=5000):
+                if not scored:
+                    # Resultado desfeito (ver scoring.unscore_match): a aposta sai do ranking global
+                    if rolled_up is None:
+                        continue
+                    values = (-1, -int(rolled_up > 0), -rolled_up)
+                elif rolled_up == points:
+                    continue
+                elif rolled_up is None:
+                    values = (1, int(points > 0), points)
+                else:
+                    values = (0, int(points > 0) - int(rolled_up > 0), points - rolled_up)
+                bet_count += 1
+                for scope, key in bet_scopes(competition_id, season):
+                    delta = deltas[(scope, key, user_id)]
+                    for i, value in enumerate(values):
+                        delta[i] += value
+
+            totals['rows'] += apply_global_deltas(deltas)
+            Bet.objects.filter(match_id__in=match_ids, match__scored=True).exclude(
+                rolled_up_points=F('points_earned')
+            ).update(rolled_up_points=F('points_earned'))
+            Bet.objects.filter(
+                match_id__in=match_ids, match__scored=False, rolled_up_points__isnull=False
+            ).update(rolled_up_points=None)
+            Match.objects.filter(pk__in=match_ids).update(rollup_pending=False)
+
+        totals['matches'] += len(match_ids)
+        totals['bets'] += bet_count
+
+    if totals['matches']:
+        cache.delete(HALL_OF_FAME_VERSION_KEY)
+        logger.info(
+            f"Rollup global: {totals['matches']} partidas, {totals['bets']} apostas, {totals['rows']} linhas"
+        )
+    return totals
+
+
+def hall_of_fame(scope='overall', key='', limit=HALL_OF_FAME_SIZE, min_bets=HALL_OF_FAME_MIN_BETS):
+    """
+    Top users of a scope by average points per bet (then points), as a list
+    of {'user', 'position', 'avg_points', 'points', 'bets', 'correct_bets'}
+    dicts with competition positions. One indexed read.
+    """
+    scores = list(
+        GlobalScore.objects.filter(scope=scope, key=key, bets__gte=min_bets).select_related('user', 'user__profile')
+        .order_by('-avg_points', '-points', 'user_id')[:limit]
+    )
+    positions = competition_ranks([round(score.avg_points * 100) for score in scores])
+    return [
+        {
+            'user': score.user,
+            'position': position,
+            'avg_points': score.avg_points,
+            'points': score.points,
+            'bets': score.bets,
+            'correct_bets': score.correct_bets,
+        }
+        for score, position in zip(scores, positions.tolist())
+    ]
+
+
+def hall_of_fame_scopes():
+    """Competitions (id, name) and seasons that have global scores, for the page filters"""
+    keys = defaultdict(set)
+    for scope, key in GlobalScore.objects.exclude(scope='overall').order_by().values_list('scope', 'key').distinct():
+        keys[scope].add(key)
+    competitions = list(
+        Competition.objects.filter(pk__in=[int(key) for key in keys['competition']]).values_list('id', 'name')
+    )
+    return {'competitions': competitions, 'seasons': sorted(keys['season'], reverse=True)}
+
+
+def get_hall_of_fame(scope='overall', key=''):
+    """
+    Cached hall_of_fame and hall_of_fame_scopes, refreshed after every rollup.
+
+    Only the competitions and seasons of hall_of_fame_scopes are accepted
+    (anything else falls back to the overall ranking), so request input
+    never creates cache entries of its own. The scope and key actually used
+    are returned with the data.
+    """
+    version = cache.get(HALL_OF_FAME_VERSION_KEY)
+    if version is None:
+        version = int(timezone.now().timestamp())
+        cache.set(HALL_OF_FAME_VERSION_KEY, version, None)
+
+    scopes_key = f'hall_of_fame:scopes:v{version}'
+    scopes = cache.get(scopes_key)
+    if scopes is None:
+        scopes = hall_of_fame_scopes()
+        cache.set(scopes_key, scopes, HALL_OF_FAME_CACHE_TIMEOUT)
+    known = {
+        'competition': {str(competition_id) for competition_id, _ in scopes['competitions']},
+        'season': set(scopes['seasons']),
+    }
+    if key not in known.get(scope, ()):
+        scope, key = 'overall', ''
+
+    cache_key = f'hall_of_fame:{scope}:{key}:v{version}'
+    ranking = cache.get(cache_key)
+    if ranking is None:
+        ranking = hall_of_fame(scope, key)
+        cache.set(cache_key, ranking, HALL_OF_FAME_CACHE_TIMEOUT)
+    return {'ranking': ranking, 'scope': scope, 'key': key, **scopes}
+
+
+def unroll_bet(bet):
+    """
+    Take a deleted bet out of GlobalScore: the points already rolled up for
+    it are subtracted from every scope it counted towards. Returns the
+    number of rows updated.
+    """
+    if bet.rolled_up_points is None:
+        return 0
+    match = Match.objects.filter(pk=bet.match_id).values_list(
+        'competition_id', 'related_game__championship__season'
+    ).first()
+    if match is None:
+        return 0
+    competition_id, game_season = match
+    season = game_season if game_season is not None else (
+        Pool.objects.filter(pk=bet.pool_id).values_list('championship__season', flat=True).first()
+    )
+
+    points = bet.rolled_up_points
+    rows = apply_global_deltas({
+        (scope, key, bet.user_id): [-1, -int(points > 0), -points]
+        for scope, key in bet_scopes(competition_id, season)
+    })
+    cache.delete(HALL_OF_FAME_VERSION_KEY)
+    return rows
@@ -0,0 +1,74 @@
+"""
+Concurrent championship sync scheduling.
+
+due_championships picks the championships whose auto_update and
+update_frequency make them due; sync_championships updates them on a thread
+pool. The HTTP calls are I/O bound, so the workers overlap their waits on
+the API, while every request still goes through the shared per-host token
+bucket (pools.ratelimit), keeping the provider's per-minute quota.
+"""
+
+import logging
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+from django.db import close_old_connections, connection
+from django.utils import timezone
+
+from .models import Championship
+from .services import get_api_service
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_WORKERS = 4
+
+
+def due_championships(now=None):
+    """Auto-updated championships due for an update, most overdue first"""
+    now = now or timezone.now()
+    championships = [
+        championship for championship in Championship.objects.filter(auto_update=True)
+        if championship.is_due(now)
+    ]
+    return sorted(championships, key=lambda championship: championship.next_update_at() or now)
+
+
+def sync_championship(championship_id, full=False, replay=False, until=None):
+    """
+    Update one championship from its API, in a worker thread, or with replay
+    set from the captured payloads up to `until` (see pools.payloads).
+
+    Returns (championship, success, report); success is None when the
+    provider is not supported. The thread's database connection is closed
+    afterwards.
+    """
+    close_old_connections()
+    try:
+        championship = Championship.objects.get(pk=championship_id)
+        service = get_api_service(championship)
+        if service is None:
+            return championship, None, None
+        try:
+            success = service.replay(until=until) if replay else service.execute_update(full=full)
+            return championship, success, service.report
+        except Exception:
+            logger.exception(f"Erro ao sincronizar {championship}")
+            return championship, False, None
+    finally:
+        connection.close()
+
+
+def sync_championships(championships, workers=DEFAULT_WORKERS, full=False, executor=None, replay=False, until=None):
+    """
+    Update championships concurrently; yields (championship, success, report)
+    as each one finishes. Uses the given executor, or a pool of `workers`
+    threads. replay and until are passed on to sync_championship.
+    """
+    own_executor = executor is None
+    executor = executor or ThreadPoolExecutor(max_workers=workers, thread_name_prefix='sync')
+    try:
+        futures = [executor.submit(sync_championship, championship.pk, full, replay, until) for championship in championships]
+        for future in as_completed(futures):
+            yield future.result()
+    finally:
+        if own_executor:
+            executor.shutdown(wait=True)
@@ -0,0 +1,606 @@
+"""
+Scoring engine for bets.
+
+Every scoring call site goes through the vectorized kernel below, which takes
+arrays of predicted and actual scores and returns an array of points in a
+single NumPy call, honouring each Pool's configured point values.
+
+All bets of a finished match are scored in a single set-based pass: one
+SELECT loads the predictions together with their pool's rules, one UPDATE
+writes the changed points and one UPDATE adds the resulting deltas to the
+affected Participation points and leaderboard counters (plus the per-round
+and per-week point buckets), whatever the number of bets on the match. The
+match is then flagged for the nightly global rollup (pools.rollup). Drift
+in the stored totals is repaired by reconcile_participation_points and
+reconcile_point_buckets (see the reconcile_points management command).
+"""
+
+import logging
+from collections import defaultdict, namedtuple
+
+import numpy as np
+from django.db import transaction
+from django.db.models import Case, When, Value, IntegerField, Sum, Count, F, Q
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+
+from .leaderboard import advance_streaks, refresh_leaderboard, refresh_snapshots, refresh_streaks
+from .models import Bet, Match, Participation, Pool, PoolRescore, RoundPoints, WeekPoints
+
+logger = logging.getLogger(__name__)
+
+# Categorias de acerto, em ordem crescente de pontuação
+WRONG, CORRECT_WINNER, CORRECT_DIFFERENCE, EXACT_SCORE = 0, 1, 2, 3
+
+
+class ScoringRules(namedtuple('ScoringRules', ['exact_score', 'correct_difference', 'correct_winner', 'wrong'])):
+    """Point values of a pool; each field may be a scalar or a per-bet array"""
+
+    __slots__ = ()
+
+    @classmethod
+    def from_pool(cls, pool):
+        return cls(
+            pool.exact_score_points,
+            pool.correct_difference_points,
+            pool.correct_winner_points,
+            pool.wrong_points,
+        )
+
+
+DEFAULT_RULES = ScoringRules(10, 5, 3, 0)
+
+# Contadores de Participation derivados das apostas (ver reconcile_participation_points)
+COUNTER_FIELDS = ['points', 'total_bets', 'finished_bets', 'correct_bets']
+
+
+def classify_predictions(home_bet, away_bet, home_real, away_real):
+    """
+    Classify predictions against actual scores.
+
+    Returns an int8 array with EXACT_SCORE, CORRECT_DIFFERENCE, CORRECT_WINNER
+    or WRONG for each prediction. Draws with a different score only count as
+    the correct outcome (CORRECT_WINNER), never as the correct difference.
+    """
+    home_bet = np.asarray(home_bet, dtype=np.int64)
+    away_bet = np.asarray(away_bet, dtype=np.int64)
+    home_real = np.asarray(home_real, dtype=np.int64)
+    away_real = np.asarray(away_real, dtype=np.int64)
+
+    real_diff = home_real - away_real
+    bet_diff = home_bet - away_bet
+    real_result = np.sign(real_diff)
+    same_result = real_result == np.sign(bet_diff)
+
+    return np.select(
+        [
+            (home_bet == home_real) & (away_bet == away_real),
+            same_result & (real_result != 0) & (real_diff == bet_diff),
+            same_result,
+        ],
+        [EXACT_SCORE, CORRECT_DIFFERENCE, CORRECT_WINNER],
+        default=WRONG,
+    ).astype(np.int8)
+
+
+def category_points(categories, rules=DEFAULT_RULES):
+    """Map category codes to points using the given rules"""
+    categories = np.asarray(categories)
+    return np.select(
+        [categories == EXACT_SCORE, categories == CORRECT_DIFFERENCE, categories == CORRECT_WINNER],
+        [rules.exact_score, rules.correct_difference, rules.correct_winner],
+        default=rules.wrong,
+    ).astype(np.int64)
+
+
+def score_predictions(home_bet, away_bet, home_real, away_real, rules=DEFAULT_RULES):
+    """
+    Vectorized scoring kernel.
+
+    All arguments broadcast against each other, so a whole match (one actual
+    score, many predictions) or a whole pool history (one actual score per
+    bet) is scored with a single call. Returns an int64 array of points.
+    """
+    categories = classify_predictions(home_bet, away_bet, home_real, away_real)
+    return category_points(categories, rules)
+
+
+def apply_participation_deltas(user_ids, pool_ids, **columns):
+    """
+    Add per-bet deltas to Participation counters (points, correct_bets, ...).
+
+    Each keyword maps a Participation column to an array of per-bet deltas.
+    Deltas are summed per (user, pool) and applied with a single UPDATE using
+    F() expressions, so the write cost is proportional to the changed bets and
+    never re-aggregates a participant's bet history.
+    """
+    names = list(columns)
+    totals = defaultdict(lambda: [0] * len(names))
+    for row in zip(user_ids, pool_ids, *columns.values()):
+        key = (int(row[0]), int(row[1]))
+        for position, delta in enumerate(row[2:]):
+            totals[key][position] += int(delta)
+
+    # Agrupar usuários por (bolão, deltas) para manter o CASE compacto
+    grouped = defaultdict(list)
+    for (user_id, pool_id), deltas in totals.items():
+        if any(deltas):
+            grouped[(pool_id, tuple(deltas))].append(user_id)
+
+    if not grouped:
+        return 0
+
+    rows = Q()
+    for (pool_id, _), users in grouped.items():
+        rows |= Q(pool_id=pool_id, user_id__in=users)
+
+    updates = {}
+    for position, name in enumerate(names):
+        whens = [
+            When(pool_id=pool_id, user_id__in=users, then=Value(deltas[position]))
+            for (pool_id, deltas), users in grouped.items()
+            if deltas[position]
+        ]
+        if whens:
+            updates[name] = F(name) + Case(*whens, default=Value(0), output_field=IntegerField())
+
+    return Participation.objects.filter(rows).update(**updates)
+
+
+def apply_bucket_deltas(model, key_field, user_ids, pool_ids, keys, points):
+    """
+    Add per-bet point deltas to a points-bucket table (RoundPoints by round,
+    WeekPoints by week).
+
+    Deltas are summed per (pool, key, user); missing rows are inserted first
+    with one INSERT (ignoring the ones that already exist, so concurrent
+    scorers of the same bucket never lose a delta) and the sums are then
+    added with a single CASE update grouped by (pool, key, delta).
+    """
+    totals = defaultdict(int)
+    for user_id, pool_id, key, delta in zip(user_ids, pool_ids, keys, points):
+        totals[(int(pool_id), key, int(user_id))] += int(delta)
+
+    grouped = defaultdict(list)
+    for (pool_id, key, user_id), delta in totals.items():
+        if delta:
+            grouped[(pool_id, key, delta)].append(user_id)
+
+    if not grouped:
+        return 0
+
+    model.objects.bulk_create(
+        [
+            model(pool_id=pool_id, user_id=user_id, **{key_field: key})
+            for (pool_id, key, _), users in grouped.items()
+            for user_id in users
+        ],
+        ignore_conflicts=True,
+    )
+
+    rows = Q()
+    whens = []
+    for (pool_id, key, delta), users in grouped.items():
+        bucket = Q(pool_id=pool_id, user_id__in=users, **{key_field: key})
+        rows |= bucket
+        whens.append(When(bucket, then=Value(delta)))
+
+    return model.objects.filter(rows).update(
+        points=F('points') + Case(*whens, default=Value(0), output_field=IntegerField())
+    )
+
+
+def apply_bucket_points(user_ids, pool_ids, rounds, kickoffs, points):
+    """Add per-bet point deltas to the round and week buckets"""
+    apply_bucket_deltas(RoundPoints, 'round', user_ids, pool_ids, [int(round_number) for round_number in rounds], points)
+    apply_bucket_deltas(WeekPoints, 'week', user_ids, pool_ids, [WeekPoints.week_of(kickoff) for kickoff in kickoffs], points)
+
+
+def refresh_bettor_streaks(user_ids, pool_ids):
+    """Recompute the streaks of the given (user, pool) pairs only"""
+    users_by_pool = defaultdict(set)
+    for user_id, pool_id in zip(user_ids, pool_ids):
+        users_by_pool[int(pool_id)].add(int(user_id))
+    for pool_id, users in users_by_pool.items():
+        refresh_streaks([pool_id], users)
+
+
+def reconcile_participation_points(pool=None, dry_run=False):
+    """
+    Recompute Participation points and bet counters from the bets and repair drift.
+
+    Works one pool at a time: one grouped aggregate over the pool's bets, one
+    read of its participations and one bulk update of the drifted rows,
+    followed by a leaderboard and streak refresh. Returns a list of
+    (participation_id, stored, expected), where stored and expected are
+    (points, total_bets, finished_bets, correct_bets) tuples.
+    """
+    pools = [pool] if pool is not None else Pool.objects.all()
+    drift = []
+
+    for current_pool in pools:
+        scored = Q(match__scored=True)
+        expected = {
+            row[0]: (row[1] or 0,) + row[2:]
+            for row in Bet.objects.filter(pool=current_pool).values('user_id').annotate(
+                total=Sum('points_earned', filter=Q(match__finished=True)),
+                bets=Count('id'),
+                finished=Count('id', filter=scored),
+                correct=Count('id', filter=scored & Q(points_earned__gt=0)),
+            ).values_list('user_id', 'total', 'bets', 'finished', 'correct')
+        }
+
+        repaired = []
+        participations = Participation.objects.filter(pool=current_pool).values_list(
+            'id', 'user_id', *COUNTER_FIELDS
+        )
+        for participation_id, user_id, *stored in participations.iterator(chunk_size=2000):
+            stored = tuple(stored)
+            totals = expected.get(user_id, (0, 0, 0, 0))
+            if stored != totals:
+                drift.append((participation_id, stored, totals))
+                repaired.append(Participation(id=participation_id, **dict(zip(COUNTER_FIELDS, totals))))
+
+        if repaired and not dry_run:
+            Participation.objects.bulk_update(repaired, COUNTER_FIELDS, batch_size=1000)
+            Pool.bump_results_version([current_pool.pk])
+        if not dry_run:
+            refresh_leaderboard([current_pool.pk])
+            refresh_streaks([current_pool.pk])
+
+    return drift
+
+
+def reconcile_point_buckets(pool=None, dry_run=False):
+    """
+    Rebuild the RoundPoints and WeekPoints buckets from the bets and repair drift.
+
+    The pool's finished bets are streamed once and summed per round and per
+    week, then the ranking snapshots are rebuilt from the repaired buckets.
+    Returns a list of (bucket, pool_id, user_id, key, stored, expected) for
+    every drifted row, where bucket is 'round' or 'week'.
+    """
+    pools = [pool] if pool is not None else Pool.objects.all()
+    drift = []
+
+    for current_pool in pools:
+        expected = {'round': defaultdict(int), 'week': defaultdict(int)}
+        for user_id, points, round_number, kickoff in Bet.objects.filter(
+            pool=current_pool, match__finished=True
+        ).values_list('user_id', 'points_earned', 'match__round', 'match__start_time').iterator(chunk_size=5000):
+            expected['round'][(user_id, round_number or 0)] += points
+            expected['week'][(user_id, WeekPoints.week_of(kickoff))] += points
+
+        for bucket, model in (('round', RoundPoints), ('week', WeekPoints)):
+            stored = {
+                (user_id, key): (row_id, points)
+                for row_id, user_id, key, points in model.objects.filter(
+                    pool=current_pool
+                ).values_list('id', 'user_id', bucket, 'points')
+            }
+
+            repaired, missing = [], []
+            for key in expected[bucket].keys() | stored.keys():
+                row_id, points = stored.get(key, (None, 0))
+                total = expected[bucket].get(key, 0)
+                if points == total:
+                    continue
+                drift.append((bucket, current_pool.pk, *key, points, total))
+                if row_id is None:
+                    missing.append(model(pool=current_pool, user_id=key[0], points=total, **{bucket: key[1]}))
+                else:
+                    repaired.append(model(id=row_id, points=total))
+
+            if not dry_run:
+                model.objects.bulk_create(missing, batch_size=1000)
+                model.objects.bulk_update(repaired, ['points'], batch_size=1000)
+
+        if not dry_run:
+            refresh_snapshots([current_pool.pk])
+
+    return drift
+
+
+def score_match(match):
+    """
+    Score every bet of a finished match and update the participants' totals.
+
+    Returns the number of bets whose points changed. Everything runs in one
+    transaction and every write is a single statement, so the number of
+    queries depends on the number of pools touched, not on the number of
+    bets: the bets are read once (with their pool's rules) and locked, the
+    changed points are written with one CASE update grouped by value, the
+    point and counter deltas are added to the participations and to the
+    round/week buckets with F() updates, and the leaderboard ranks and
+    round snapshots of each touched pool are refreshed with one read and one
+    grouped UPDATE. Streaks are extended from the match's bets alone
+    (advance_streaks); a corrected result recomputes only the bettors whose
+    points changed. The pool's results_version is bumped so cached
+    projections are recomputed. (SQLite still splits the bucket INSERT into
+    batches of 999 parameters.)
+
+    A match whose result was undone (reopened, or its score cleared) has its
+    bets unscored instead, see unscore_match.
+    """
+    if not match.finished or match.home_score is None or match.away_score is None:
+        return unscore_match(match)
+
+    with transaction.atomic():
+        scored, round_number, kickoff = Match.objects.select_for_update().filter(pk=match.pk).values_list(
+            'scored', 'round', 'start_time'
+        ).get()
+        first_scoring = not scored
+        rows = list(Bet.objects.select_for_update().filter(match=match).values_list(
+            'id', 'user_id', 'pool_id', 'home_score_bet', 'away_score_bet', 'points_earned',
+            'pool__exact_score_points', 'pool__correct_difference_points',
+            'pool__correct_winner_points', 'pool__wrong_points',
+        ))
+        # Resultado novo invalida as estatísticas derivadas, mesmo sem pontos alterados
+        pool_ids_touched = {match.pool_id, *(row[2] for row in rows)} - {None}
+        Pool.bump_results_version(pool_ids_touched)
+        if first_scoring:
+            Match.objects.filter(pk=match.pk).update(scored=True, rollup_pending=True)
+        if not rows:
+            if first_scoring:
+                refresh_snapshots(pool_ids_touched, from_round=round_number or 0)
+            return 0
+
+        columns = np.array(rows, dtype=np.int64).T
+        bet_ids, user_ids, pool_ids, home_bet, away_bet, old_points = columns[:6]
+        new_points = score_predictions(
+            home_bet, away_bet, match.home_score, match.away_score, ScoringRules(*columns[6:])
+        )
+
+        changed = new_points != old_points
+        if not changed.any() and not first_scoring:
+            return 0
+
+        changed_ids = bet_ids[changed]
+        changed_points = new_points[changed]
+        if changed.any():
+            Bet.objects.filter(pk__in=changed_ids.tolist()).update(
+                points_earned=Case(
+                    *[
+                        When(pk__in=changed_ids[changed_points == points].tolist(), then=Value(int(points)))
+                        for points in np.unique(changed_points)
+                    ],
+                    output_field=IntegerField()
+                )
+            )
+            if not first_scoring:
+                Match.objects.filter(pk=match.pk).update(rollup_pending=True)
+
+        # Na primeira pontuação as apostas passam a contar como finalizadas
+        was_correct = np.zeros_like(old_points) if first_scoring else (old_points > 0)
+        apply_participation_deltas(
+            user_ids, pool_ids,
+            points=new_points - old_points,
+            correct_bets=(new_points > 0).astype(np.int64) - was_correct,
+            finished_bets=np.full_like(bet_ids, int(first_scoring)),
+        )
+        apply_bucket_points(
+            user_ids, pool_ids, [round_number or 0] * len(bet_ids), [kickoff] * len(bet_ids), new_points - old_points
+        )
+        refresh_leaderboard(pool_ids_touched)
+        if first_scoring:
+            advance_streaks(match.pk, kickoff, zip(user_ids, pool_ids, new_points))
+        else:
+            refresh_bettor_streaks(user_ids[changed], pool_ids[changed])
+        refresh_snapshots(pool_ids_touched, from_round=round_number or 0)
+
+    logger.info(f"Pontuação atualizada para {len(changed_ids)} apostas da partida {match}")
+    return len(changed_ids)
+
+
+def unscore_match(match):
+    """
+    Reverse the scoring of a match whose result was undone: every bet's
+    points, its finished and correct counters and its round/week points are
+    subtracted with the same delta updates as score_match, the bets go back
+    to zero points and the match to unscored, so a later result is scored
+    from scratch. Returns the number of bets whose points changed.
+    """
+    with transaction.atomic():
+        scored, round_number, kickoff = Match.objects.select_for_update().filter(pk=match.pk).values_list(
+            'scored', 'round', 'start_time'
+        ).get()
+        if not scored:
+            return 0
+        rows = list(Bet.objects.select_for_update().filter(match=match).values_list('id', 'user_id', 'pool_id', 'points_earned'))
+        pool_ids_touched = {match.pool_id, *(row[2] for row in rows)} - {None}
+        Pool.bump_results_version(pool_ids_touched)
+        Match.objects.filter(pk=match.pk).update(scored=False, rollup_pending=True)
+        if not rows:
+            refresh_snapshots(pool_ids_touched, from_round=round_number or 0)
+            return 0
+
+        bet_ids, user_ids, pool_ids, old_points = np.array(rows, dtype=np.int64).T
+        Bet.objects.filter(pk__in=bet_ids.tolist()).exclude(points_earned=0).update(points_earned=0)
+        apply_participation_deltas(
+            user_ids, pool_ids,
+            points=-old_points,
+            correct_bets=-(old_points > 0).astype(np.int64),
+            finished_bets=np.full_like(bet_ids, -1),
+        )
+        apply_bucket_points(user_ids, pool_ids, [round_number or 0] * len(bet_ids), [kickoff] * len(bet_ids), -old_points)
+        refresh_leaderboard(pool_ids_touched)
+        refresh_bettor_streaks(user_ids, pool_ids)
+        refresh_snapshots(pool_ids_touched, from_round=round_number or 0)
+
+    changed = int((old_points != 0).sum())
+    logger.info(f"Pontuação estornada para {changed} apostas da partida {match}")
+    return changed
+
+
+def score_bet(bet, created=False):
+    """
+    Score one bet placed or edited on an already scored match.
+
+    The bet's points are recomputed with its pool's rules and the point and
+    counter deltas (plus finished_bets, for a new bet) go through the same
+    F() updates as score_match, so the participation and round/week totals
+    stay in step with the bet. Bets of matches not scored yet are left
+    alone: score_match counts them when the match is scored. Returns True
+    when the bet was scored.
+    """
+    with transaction.atomic():
+        match = Match.objects.select_for_update().filter(pk=bet.match_id, scored=True).values_list(
+            'home_score', 'away_score', 'round', 'start_time'
+        ).first()
+        if match is None:
+            return False
+        home_real, away_real, round_number, kickoff = match
+        old_points, *rules = Bet.objects.select_for_update().filter(pk=bet.pk).values_list(
+            'points_earned', 'pool__exact_score_points', 'pool__correct_difference_points',
+            'pool__correct_winner_points', 'pool__wrong_points',
+        ).get()
+        new_points = int(score_predictions(
+            bet.home_score_bet, bet.away_score_bet, home_real, away_real, ScoringRules(*rules)
+        ))
+        bet.points_earned = new_points
+        if new_points == old_points and not created:
+            return True
+
+        Bet.objects.filter(pk=bet.pk).update(points_earned=new_points)
+        Match.objects.filter(pk=bet.match_id).update(rollup_pending=True)
+        apply_participation_deltas(
+            [bet.user_id], [bet.pool_id],
+            points=[new_points - old_points],
+            correct_bets=[int(new_points > 0) - (0 if created else int(old_points > 0))],
+            finished_bets=[int(created)],
+        )
+        apply_bucket_points([bet.user_id], [bet.pool_id], [round_number or 0], [kickoff], [new_points - old_points])
+        Pool.bump_results_version([bet.pool_id])
+        refresh_leaderboard([bet.pool_id])
+        refresh_streaks([bet.pool_id], user_ids=[bet.user_id])
+        refresh_snapshots([bet.pool_id], from_round=round_number or 0)
+    return True
+
+
+def unscore_bet(bet, rerank=True):
+    """
+    Take a deleted bet of a scored match out of the participant's totals:
+    its points, finished and correct counters and round/week points are
+    subtracted. With rerank=False the leaderboard refresh is left to the
+    caller (a cascade deleting many bets refreshes once at the end).
+    Returns True when the bet had been scored.
+    """
+    match = Match.objects.filter(pk=bet.match_id, scored=True).values_list('round', 'start_time').first()
+    if match is None:
+        return False
+    round_number, kickoff = match
+    points = bet.points_earned
+    apply_participation_deltas(
+        [bet.user_id], [bet.pool_id],
+        points=[-points], correct_bets=[-int(points > 0)], finished_bets=[-1],
+    )
+    apply_bucket_points([bet.user_id], [bet.pool_id], [round_number or 0], [kickoff], [-points])
+    Pool.bump_results_version([bet.pool_id])
+    if rerank:
+        refresh_leaderboard([bet.pool_id])
+        refresh_streaks([bet.pool_id], user_ids=[bet.user_id])
+        refresh_snapshots([bet.pool_id], from_round=round_number or 0)
+    return True
+
+
+def rescore_pool(pool, rescore=None, chunk_size=5000, dry_run=False):
+    """
+    Rescore a pool's whole finished-bet history in bounded chunks.
+
+    A generator: each chunk of bets (keyset-paginated by id) is read, scored
+    with the pool's current rules and written back with one CASE update plus
+    one F() delta update, in its own short transaction, so the bet table is
+    never locked for long. Yields a dict per chunk with 'last_bet_id',
+    'processed', 'changed' and 'deltas' ({user_id: point delta}).
+
+    When a PoolRescore is given, its checkpoint is advanced in the same
+    transaction as the chunk's writes, so an interrupted run resumes exactly
+    where it stopped. If the checkpoint is reset meanwhile (rules changed
+    again), the run starts over from the beginning. With dry_run nothing is
+    written.
+    """
+    rules = ScoringRules.from_pool(pool)
+    last_bet_id = rescore.last_bet_id if rescore is not None else 0
+
+    while True:
+        with transaction.atomic():
+            if rescore is not None and not dry_run:
+                stored = PoolRescore.objects.select_for_update().get(pk=rescore.pk)
+                if stored.last_bet_id != last_bet_id:
+                    # Checkpoint reiniciado: regras mudaram de novo
+                    last_bet_id = stored.last_bet_id
+                    rules = ScoringRules.from_pool(Pool.objects.get(pk=pool.pk))
+                    rescore.bets_processed = stored.bets_processed
+                    rescore.bets_changed = stored.bets_changed
+
+            bets = Bet.objects.filter(pool=pool, match__finished=True, match__scored=True, id__gt=last_bet_id)
+            if not dry_run:
+                bets = bets.select_for_update()
+            rows = list(bets.order_by('id').values_list(
+                'id', 'user_id', 'home_score_bet', 'away_score_bet', 'points_earned',
+                'match__home_score', 'match__away_score', 'match__round', 'match__start_time', 'match_id',
+            )[:chunk_size])
+            if not rows:
+                break
+
+            columns = np.array(
+                [row[:5] + (row[5] or 0, row[6] or 0, row[7] or 0) for row in rows], dtype=np.int64
+            ).T
+            kickoffs = np.array([row[8] for row in rows], dtype=object)
+            match_ids = np.array([row[9] for row in rows], dtype=np.int64)
+            bet_ids, user_ids, home_bet, away_bet, old_points, home_real, away_real, rounds = columns
+            new_points = score_predictions(home_bet, away_bet, home_real, away_real, rules)
+            changed = new_points != old_points
+            last_bet_id = int(bet_ids[-1])
+
+            deltas = defaultdict(int)
+            for user_id, delta in zip(user_ids[changed].tolist(), (new_points - old_points)[changed].tolist()):
+                deltas[user_id] += delta
+
+            if not dry_run:
+                if changed.any():
+                    changed_ids = bet_ids[changed]
+                    changed_points = new_points[changed]
+                    Bet.objects.filter(pk__in=changed_ids.tolist()).update(
+                        points_earned=Case(
+                            *[
+                                When(pk__in=changed_ids[changed_points == points].tolist(), then=Value(int(points)))
+                                for points in np.unique(changed_points)
+                            ],
+                            output_field=IntegerField()
+                        )
+                    )
+                    apply_participation_deltas(
+                        user_ids[changed], [pool.pk] * int(changed.sum()),
+                        points=(new_points - old_points)[changed],
+                        correct_bets=(new_points > 0).astype(np.int64)[changed] - (old_points > 0)[changed],
+                    )
+                    apply_bucket_points(
+                        user_ids[changed], [pool.pk] * int(changed.sum()), rounds[changed], kickoffs[changed],
+                        (new_points - old_points)[changed],
+                    )
+                    Match.objects.filter(pk__in=np.unique(match_ids[changed]).tolist()).update(rollup_pending=True)
+                    Pool.bump_results_version([pool.pk])
+
+                if rescore is not None:
+                    rescore.status = 'running'
+                    rescore.last_bet_id = last_bet_id
+                    rescore.bets_processed += len(rows)
+                    rescore.bets_changed += int(changed.sum())
+                    rescore.save(update_fields=['status', 'last_bet_id', 'bets_processed', 'bets_changed', 'updated_at'])
+
+        yield {
+            'last_bet_id': last_bet_id,
+            'processed': len(rows),
+            'changed': int(changed.sum()),
+            'deltas': dict(deltas),
+        }
+
+    if not dry_run:
+        refresh_leaderboard([pool.pk])
+        refresh_streaks([pool.pk])
+        refresh_snapshots([pool.pk])
+    if rescore is not None and not dry_run:
+        rescore.status = 'done'
+        rescore.finished_at = timezone.now()
+        rescore.save(update_fields=['status', 'finished_at', 'updated_at'])
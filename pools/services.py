@@ -1,18 +1,75 @@
-import requests
 import logging
+from django.db import transaction
 from django.utils import timezone
-from datetime import datetime
-from .models import Championship, Team, Game, Standing
+from datetime import datetime, timedelta, timezone as dt_timezone
+from .models import Championship, Team, Game, Match, Standing
+from .apiclient import api_get
+from .payloads import endpoint_of, get_payload_store
 
 logger = logging.getLogger(__name__)
 
-def make_naive(dt):
-    """Convert timezone-aware datetime to naive datetime"""
-    if dt is None:
+# Campos escritos pela sincronização nos registros existentes
+TEAM_SYNC_FIELDS = ['name', 'short_name', 'code']
+GAME_SYNC_FIELDS = ['datetime', 'round', 'status', 'home_score', 'away_score', 'finished', 'last_updated']
+
+# Sincronização incremental: jogos que podem ter mudado desde a última execução
+SYNC_WINDOW_MARGIN = timedelta(days=2)
+SYNC_LOOKAHEAD = timedelta(days=7)
+
+def sync_window(last_update, now=None):
+    """
+    dateFrom/dateTo filters covering what can have changed since last_update:
+    games kicked off since shortly before it (results, late corrections) and
+    the next SYNC_LOOKAHEAD days (rescheduling). Whole UTC days, so repeated
+    runs on the same day send the same query and can get a 304.
+    """
+    now = now or timezone.now()
+    return {
+        'dateFrom': (last_update - SYNC_WINDOW_MARGIN).astimezone(dt_timezone.utc).date().isoformat(),
+        'dateTo': (now + SYNC_LOOKAHEAD).astimezone(dt_timezone.utc).date().isoformat(),
+    }
+
+def conditional_get(championship, key, url, headers=None, params=None):
+    """
+    GET an API endpoint, sending the validators stored for it (ETag and
+    Last-Modified) when the query is the same as last time. Returns the
+    response, or None on 304 Not Modified.
+    """
+    headers = dict(headers or {})
+    params = params or {}
+    stored = (championship.api_validators or {}).get(key, {})
+    if stored.get('params') == params:
+        if stored.get('etag'):
+            headers['If-None-Match'] = stored['etag']
+        if stored.get('last_modified'):
+            headers['If-Modified-Since'] = stored['last_modified']
+    
+    response = api_get(url, headers=headers, params=params)
+    if response.status_code == 304:
+        logger.info(f"{championship} {key}: not modified")
         return None
-    if timezone.is_aware(dt):
-        return timezone.make_naive(dt, timezone=timezone.utc)  # timezone.utc (não UTC())
-    return dt
+    return response
+
+def remember_validators(championship, key, response, params=None):
+    """Store the validators of a processed response on the championship (not saved)"""
+    validators = dict(championship.api_validators or {})
+    validators[key] = {
+        'params': params or {},
+        'etag': response.headers.get('ETag', ''),
+        'last_modified': response.headers.get('Last-Modified', ''),
+    }
+    championship.api_validators = validators
+
+def empty_counts():
+    return {'created': 0, 'changed': 0, 'unchanged': 0}
+
+def format_sync_report(report):
+    """One-line summary of a sync report"""
+    parts = [
+        f"{kind}: {counts['created']} created, {counts['changed']} changed, {counts['unchanged']} unchanged"
+        for kind, counts in report.items() if isinstance(counts, dict)
+    ]
+    return '; '.join(parts + [f"pool matches updated: {report.get('pool_matches', 0)}"])
 
 class ApiIntegrationService:
     """Base service for sports API integration"""
@@ -20,6 +77,7 @@ class ApiIntegrationService:
     def __init__(self, championship):
         self.championship = championship
         self.api_key = self._get_api_key()
+        self.report = None
         
     def _get_api_key(self):
         """Get API key based on provider"""
@@ -32,7 +90,7 @@ class ApiIntegrationService:
         }
         return api_keys.get(self.championship.api_provider, '')
     
-    def update_matches(self):
+    def update_matches(self, full=False):
         """Method to be implemented by subclasses"""
         raise NotImplementedError
     
@@ -40,14 +98,48 @@ class ApiIntegrationService:
         """Method to be implemented by subclasses"""
         raise NotImplementedError
     
-    def execute_update(self):
-        """Execute complete update"""
+    def replay_matches(self, store, until=None):
+        """Method to be implemented by subclasses"""
+        raise NotImplementedError
+    
+    def replay_standings(self, store, until=None):
+        """Method to be implemented by subclasses"""
+        raise NotImplementedError
+    
+    def replay(self, store=None, until=None):
+        """
+        Rebuild games and standings from the captured payloads (see
+        pools.payloads) up to `until`, without network access or API quota.
+        The championship's last update and validators are left alone, so the
+        next live sync still fetches what changed since then.
+        """
+        store = store or get_payload_store()
+        if store is None:
+            logger.error("API_PAYLOAD_DIR not configured, nothing to replay")
+            return False
         try:
-            self.update_matches()
-            self.update_standings()
-            self.championship.last_update = timezone.now()
-            self.championship.save()
+            self.replay_matches(store, until)
+            self.replay_standings(store, until)
             return True
+        except Exception as e:
+            logger.error(f"Error replaying championship {self.championship.name}: {str(e)}")
+            return False
+    
+    def execute_update(self, full=False):
+        """
+        Execute complete update. Unless full is set, only the window that can
+        have changed since the championship's last update is fetched; that
+        last update only advances when the matches were fetched (or were not
+        modified), so a failed sync is retried over the same window.
+        """
+        try:
+            started = timezone.now()
+            matches_ok = self.update_matches(full=full)
+            standings_ok = self.update_standings()
+            if matches_ok:
+                self.championship.last_update = started
+            self.championship.save()
+            return bool(matches_ok and standings_ok)
         except Exception as e:
             logger.error(f"Error updating championship {self.championship.name}: {str(e)}")
             return False
@@ -61,126 +153,225 @@ class FootballDataApiService(ApiIntegrationService):
         super().__init__(championship)
         self.headers = {"X-Auth-Token": self.api_key}
     
-    def update_matches(self):
-        """Update championship matches using the API"""
+    def update_matches(self, full=False):
+        """
+        Update championship matches using the API: the whole season when full
+        is set or on the first sync, otherwise only the sync_window since the
+        last update. Nothing is processed when the API answers 304.
+        """
         url = f"{self.base_url}/competitions/{self.championship.external_api_id}/matches"
-        response = requests.get(url, headers=self.headers)
+        last_update = self.championship.last_update
+        params = {} if full or last_update is None else sync_window(last_update)
+        response = conditional_get(self.championship, 'matches', url, self.headers, params)
         
+        if response is None:
+            return True
         if response.status_code == 200:
-            data = response.json()
-            
-            for match_data in data['matches']:
-                # Get or create teams
-                home_team, _ = Team.objects.get_or_create(
-                    external_api_id=str(match_data['homeTeam']['id']),
-                    championship=self.championship,
-                    defaults={
-                        'name': match_data['homeTeam']['name'],
-                        'short_name': match_data['homeTeam'].get('shortName', ''),
-                        'code': match_data['homeTeam'].get('tla', '')[:3],
-                    }
-                )
-                
-                away_team, _ = Team.objects.get_or_create(
-                    external_api_id=str(match_data['awayTeam']['id']),
-                    championship=self.championship,
-                    defaults={
-                        'name': match_data['awayTeam']['name'],
-                        'short_name': match_data['awayTeam'].get('shortName', ''),
-                        'code': match_data['awayTeam'].get('tla', '')[:3],
-                    }
-                )
-                
-                # Map round
-                try:
-                    round_number = int(match_data.get('matchday', 0))
-                except (ValueError, TypeError):
-                    round_number = 0
-                
-                # Convert date to naive before saving
-                match_date = datetime.fromisoformat(match_data['utcDate'].replace('Z', '+00:00'))
-                match_date = make_naive(match_date)
-                
-                # Create or update game
-                game, created = Game.objects.get_or_create(
-                    external_api_id=str(match_data['id']),
-                    championship=self.championship,
-                    defaults={
-                        'home_team': home_team,
-                        'away_team': away_team,
-                        'datetime': match_date,  # Converted date
-                        'round': round_number,
-                        'venue': match_data.get('venue', ''),
-                        'status': self._map_status(match_data['status']),
-                    }
-                )
-                
-                if not created:
-                    game.datetime = match_date  # Converted date
-                    game.status = self._map_status(match_data['status'])
-                    game.round = round_number
-                    
-                # Update score if the game is finished
-                if match_data['status'] in ['FINISHED', 'IN_PLAY', 'PAUSED']:
-                    game.home_score = match_data['score']['fullTime']['home']
-                    game.away_score = match_data['score']['fullTime']['away']
-                    
-                    if match_data['status'] == 'FINISHED':
-                        game.finished = True
-                    
-                game.save()
-                
-                # Update linked pool matches
-                if game.finished and hasattr(game, 'pool_matches'):
-                    for pool_match in game.pool_matches.all():
-                        pool_match.update_from_game()
-                
+            self.report = self.ingest_matches(response.json()['matches'])
+            remember_validators(self.championship, 'matches', response, params)
+            logger.info(f"Sync {self.championship}: {format_sync_report(self.report)}")
             return True
         else:
             logger.error(f"API Error: {response.status_code} - {response.text}")
             return False
     
+    def ingest_matches(self, matches):
+        """
+        Upsert the teams and games of a matches payload in one transaction.
+        
+        Existing rows are preloaded into dicts keyed by external_api_id and
+        diffed against the payload; new rows are inserted with bulk_create
+        and only the changed ones written with bulk_update. Pool matches of
+        finished games that are not finished yet (a link made after the game
+        ended, a failed earlier update) are then updated (their save queues
+        the scoring); finished ones are left alone so an admin's correction
+        survives, and are only overwritten by sync_api_data --update-results.
+        Returns a sync report: {'teams': counts, 'games': counts,
+        'pool_matches': n}, counts being {'created', 'changed', 'unchanged'}.
+        """
+        report = {'teams': empty_counts(), 'games': empty_counts(), 'pool_matches': 0}
+        
+        with transaction.atomic():
+            teams = self._upsert_teams(matches, report['teams'])
+            self._upsert_games(matches, teams, report['games'])
+            
+            # Partidas dos bolões ainda abertas ligadas a jogos finalizados
+            # (as já finalizadas podem ter sido corrigidas à mão)
+            pool_matches = Match.objects.filter(
+                related_game__championship=self.championship, related_game__status='finished', finished=False,
+            ).select_related('related_game')
+            for pool_match in pool_matches:
+                if pool_match.update_from_game():
+                    report['pool_matches'] += 1
+        
+        return report
+    
+    def _upsert_teams(self, matches, counts):
+        """Create or update the payload's teams; returns {external_api_id: Team}"""
+        payload = {}
+        for match_data in matches:
+            for side in ('homeTeam', 'awayTeam'):
+                team_data = match_data[side]
+                if team_data.get('id') is None:
+                    continue
+                payload[str(team_data['id'])] = {
+                    'name': team_data.get('name') or '',
+                    'short_name': team_data.get('shortName') or '',
+                    'code': (team_data.get('tla') or '')[:3],
+                }
+        
+        teams = {
+            team.external_api_id: team
+            for team in Team.objects.filter(championship=self.championship, external_api_id__in=list(payload))
+        }
+        created, changed = [], []
+        for external_id, values in payload.items():
+            team = teams.get(external_id)
+            if team is None:
+                created.append(Team(championship=self.championship, external_api_id=external_id, **values))
+            elif any(getattr(team, field) != value for field, value in values.items()):
+                for field, value in values.items():
+                    setattr(team, field, value)
+                changed.append(team)
+        
+        Team.objects.bulk_create(created, batch_size=500)
+        Team.objects.bulk_update(changed, TEAM_SYNC_FIELDS, batch_size=500)
+        counts.update(created=len(created), changed=len(changed), unchanged=len(payload) - len(created) - len(changed))
+        
+        if created:
+            # bulk_create não devolve as chaves no MySQL: relê os times novos
+            teams.update(
+                (team.external_api_id, team)
+                for team in Team.objects.filter(
+                    championship=self.championship, external_api_id__in=[team.external_api_id for team in created]
+                )
+            )
+        return teams
+    
+    def _game_values(self, match_data, teams):
+        """Game field values from a match payload (scores only once the game started)"""
+        try:
+            round_number = int(match_data.get('matchday') or 0)
+        except (ValueError, TypeError):
+            round_number = 0
+        
+        values = {
+            'home_team': teams[str(match_data['homeTeam']['id'])],
+            'away_team': teams[str(match_data['awayTeam']['id'])],
+            'datetime': datetime.fromisoformat(match_data['utcDate'].replace('Z', '+00:00')),
+            'round': round_number,
+            'venue': match_data.get('venue') or '',
+            'status': self._map_status(match_data['status']),
+        }
+        if match_data['status'] in ['FINISHED', 'IN_PLAY', 'PAUSED']:
+            values['home_score'] = match_data['score']['fullTime']['home']
+            values['away_score'] = match_data['score']['fullTime']['away']
+            if match_data['status'] == 'FINISHED':
+                values['finished'] = True
+        return values
+    
+    def _upsert_games(self, matches, teams, counts):
+        """Create or update the payload's games"""
+        payload = {
+            str(match_data['id']): self._game_values(match_data, teams)
+            for match_data in matches
+            if str(match_data['homeTeam'].get('id')) in teams and str(match_data['awayTeam'].get('id')) in teams
+        }
+        
+        games = {
+            game.external_api_id: game
+            for game in Game.objects.filter(championship=self.championship, external_api_id__in=list(payload))
+        }
+        now = timezone.now()
+        created, changed = [], []
+        for external_id, values in payload.items():
+            game = games.get(external_id)
+            if game is None:
+                created.append(Game(championship=self.championship, external_api_id=external_id, last_updated=now, **values))
+                continue
+            # Times e local só são definidos na criação
+            values = {field: value for field, value in values.items() if field not in ('home_team', 'away_team', 'venue')}
+            if any(getattr(game, field) != value for field, value in values.items()):
+                for field, value in values.items():
+                    setattr(game, field, value)
+                game.last_updated = now
+                changed.append(game)
+        
+        Game.objects.bulk_create(created, batch_size=500)
+        Game.objects.bulk_update(changed, GAME_SYNC_FIELDS, batch_size=500)
+        counts.update(created=len(created), changed=len(changed), unchanged=len(payload) - len(created) - len(changed))
+    
     def update_standings(self):
         """Update standings table using the API"""
         url = f"{self.base_url}/competitions/{self.championship.external_api_id}/standings"
-        response = requests.get(url, headers=self.headers)
+        response = conditional_get(self.championship, 'standings', url, self.headers)
         
+        if response is None:
+            return True
         if response.status_code == 200:
-            data = response.json()
-            
-            # Assume first table (usually the main league table)
-            if data.get('standings') and len(data['standings']) > 0:
-                table = data['standings'][0]['table']
-                
-                for position_data in table:
-                    try:
-                        team = Team.objects.get(
-                            external_api_id=str(position_data['team']['id']),
-                            championship=self.championship
-                        )
-                        
-                        standing, _ = Standing.objects.update_or_create(
-                            championship=self.championship,
-                            team=team,
-                            defaults={
-                                'position': position_data['position'],
-                                'played': position_data['playedGames'],
-                                'won': position_data['won'],
-                                'drawn': position_data['draw'],
-                                'lost': position_data['lost'],
-                                'goals_for': position_data['goalsFor'],
-                                'goals_against': position_data['goalsAgainst'],
-                                'points': position_data['points'],
-                            }
-                        )
-                    except Team.DoesNotExist:
-                        logger.warning(f"Team with ID {position_data['team']['id']} not found")
-                
+            self.apply_standings(response.json())
+            remember_validators(self.championship, 'standings', response)
             return True
         else:
             logger.error(f"API Standings Error: {response.status_code} - {response.text}")
             return False
     
+    def apply_standings(self, data):
+        """Write the first table of a standings payload (usually the main league table)"""
+        if not data.get('standings'):
+            return
+        table = data['standings'][0]['table']
+        teams = {
+            team.external_api_id: team
+            for team in Team.objects.filter(
+                championship=self.championship,
+                external_api_id__in=[str(position_data['team']['id']) for position_data in table],
+            )
+        }
+        for position_data in table:
+            team = teams.get(str(position_data['team']['id']))
+            if team is None:
+                logger.warning(f"Team with ID {position_data['team']['id']} not found")
+                continue
+            Standing.objects.update_or_create(
+                championship=self.championship,
+                team=team,
+                defaults={
+                    'position': position_data['position'],
+                    'played': position_data['playedGames'],
+                    'won': position_data['won'],
+                    'drawn': position_data['draw'],
+                    'lost': position_data['lost'],
+                    'goals_for': position_data['goalsFor'],
+                    'goals_against': position_data['goalsAgainst'],
+                    'points': position_data['points'],
+                }
+            )
+    
+    def replay_matches(self, store, until=None, competition=None):
+        """
+        Ingest every stored matches payload of the championship in fetch
+        order, so the games end as the latest capture left them. competition
+        is the id or code the payloads were fetched with (sync_api_data uses
+        the code), by default the championship's external_api_id.
+        """
+        url = f"{self.base_url}/competitions/{competition or self.championship.external_api_id}/matches"
+        self.report = {'teams': empty_counts(), 'games': empty_counts(), 'pool_matches': 0}
+        for entry in store.entries(endpoint_of(url), until=until):
+            report = self.ingest_matches(store.load(entry)['matches'])
+            for kind in ('teams', 'games'):
+                for key, value in report[kind].items():
+                    self.report[kind][key] += value
+            self.report['pool_matches'] += report['pool_matches']
+        logger.info(f"Replay {self.championship}: {format_sync_report(self.report)}")
+    
+    def replay_standings(self, store, until=None):
+        """Apply the latest stored standings payload"""
+        url = f"{self.base_url}/competitions/{self.championship.external_api_id}/standings"
+        entry = store.latest(endpoint_of(url), until=until)
+        if entry is not None:
+            self.apply_standings(store.load(entry))
+    
     def _map_status(self, api_status):
         """Map API status to our model"""
         status_map = {
@@ -18,9 +18,12 @@ import logging
 logger = logging.getLogger(__name__)
 
 
-@receiver(post_save, sender=Match)
-def notify_result_updated(sender, instance, **kwargs):
-    """Notifica usuários quando resultado de partida é atualizado"""
+def send_result_notifications(instance):
+    """
+    Notifica usuários quando resultado de partida é atualizado.
+    Chamada pelo worker de pontuação (process_scoring_jobs), depois que os
+    pontos das apostas já foram calculados.
+    """
     if instance.finished and instance.home_score is not None:
         # Buscar apostas dessa partida
         bets = instance.bet_set.select_related('user', 'pool')
@@ -174,40 +177,6 @@ def notify_bet_deadline_approaching(sender, instance, created, **kwargs):
             logger.error(f"Erro ao enviar lembrete de deadline: {e}")
 
 
-@receiver(post_save, sender=Match)
-def update_bet_points_on_result(sender, instance, **kwargs):
-    """Atualiza pontuação das apostas quando partida finaliza"""
-    if instance.finished and instance.home_score is not None and instance.away_score is not None:
-        try:
-            # Buscar todas as apostas dessa partida
-            bets = Bet.objects.filter(match=instance)
-            
-            for bet in bets:
-                # Calcular pontos
-                old_points = bet.points_earned
-                new_points = bet.calculate_points()
-                
-                if old_points != new_points:
-                    bet.points_earned = new_points
-                    bet.save(update_fields=['points_earned'])
-                    
-                    # Atualizar estatísticas da participação
-                    participation = Participation.objects.get(user=bet.user, pool=bet.pool)
-                    total_points = Bet.objects.filter(
-                        user=bet.user, 
-                        pool=bet.pool, 
-                        match__finished=True
-                    ).aggregate(total=Sum('points_earned'))['total'] or 0
-                    
-                    participation.points = total_points
-                    participation.save(update_fields=['points'])
-                    
-            logger.info(f"Pontuação atualizada para {bets.count()} apostas da partida {instance}")
-            
-        except Exception as e:
-            logger.error(f"Erro ao atualizar pontuação das apostas: {e}")
-
-
 @receiver(post_save, sender=Invitation)
 def send_invitation_email(sender, instance, created, **kwargs):
     """Envia email de convite quando convite é criado"""
@@ -283,11 +252,15 @@ def update_pool_statistics(sender, instance, created, **kwargs):
 
 # Signal para notificar ranking semanal
 def notify_weekly_ranking():
-    """Função para ser chamada por um cron job semanal"""
-    from django.db.models import Sum
+    """
+    Função para ser chamada por um cron job semanal.
+    Envia o top 3 da semana de ontem (a semana que acabou, se rodar na segunda),
+    somando os pontos por semana do jogo mantidos pela pontuação.
+    """
     from datetime import timedelta
+    from .history import last_weeks, window_ranking
     
-    one_week_ago = timezone.now() - timedelta(days=7)
+    week = last_weeks(1, timezone.now() - timedelta(days=1))
     
     # Para cada pool ativo
     active_pools = Pool.objects.filter(status='open')
@@ -295,13 +268,10 @@ def notify_weekly_ranking():
     for pool in active_pools:
         try:
             # Calcular ranking semanal
-            weekly_ranking = Bet.objects.filter(
-                pool=pool,
-                created_at__gte=one_week_ago,
-                match__finished=True
-            ).values('user').annotate(
-                weekly_points=Sum('points_earned')
-            ).order_by('-weekly_points')[:3]
+            weekly_ranking = [
+                {'user': row['user'], 'weekly_points': row['points'], 'position': row['position']}
+                for row in window_ranking(pool, weeks=week, limit=3)
+            ]
             
             if weekly_ranking:
                 # Enviar para todos os participantes
@@ -328,4 +298,4 @@ def notify_weekly_ranking():
                 logger.info(f"Ranking semanal enviado para pool {pool.name}")
                 
         except Exception as e:
-            logger.error(f"Erro ao enviar ranking semanal: {e}")
\ No newline at end of file
+            logger.error(f"Erro ao enviar ranking semanal: {e}")
@@ -0,0 +1,281 @@
+"""
+Monte Carlo title odds for pools.
+
+The scores of a pool's remaining matches are sampled from an independent
+Poisson goal model (home advantage plus per-team attack/defence strengths,
+fitted from finished Games and Standing totals). Every sampled season is
+scored against the whole bet matrix at once: each match keeps a small table
+of points per (sampled scoreline, distinct prediction), so scoring a batch of
+simulations is two array gathers and an add per match.
+
+Simulations run in independent chunks; big pools spread the chunks over a
+process pool. The chunk kernel only needs NumPy arrays, which is why Django
+models are imported inside the functions that read the database.
+
+The simulation never runs inside a request: the refresh_title_odds command
+precomputes the odds of the pools whose results changed into TitleOdds
+(one row per pool, tagged with the Pool.results_version they were computed
+from), and views only read that row (get_title_odds).
+"""
+
+import os
+from collections import namedtuple
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+from django.db.models import Q
+
+DEFAULT_SIMULATIONS = 10000
+MAX_SIMULATIONS = 50000
+SIMULATION_CHUNK = 1000
+
+# Placares amostrados são limitados a GOAL_CAP gols por time
+GOAL_CAP = 9
+OUTCOMES = (GOAL_CAP + 1) ** 2
+
+# Jogos fictícios de desempenho médio que suavizam times com poucos dados
+PRIOR_GAMES = 5
+DEFAULT_HOME_GOALS = 1.4
+DEFAULT_AWAY_GOALS = 1.1
+
+# Volume (simulações x participantes x partidas) a partir do qual usar processos
+PARALLEL_THRESHOLD = 200_000_000
+
+
+class GoalModel(namedtuple('GoalModel', ['home_goals', 'away_goals', 'attack', 'defence'])):
+    """League scoring rates plus per-team attack/defence multipliers"""
+
+    __slots__ = ()
+
+    def expected_goals(self, home_team_ids, away_team_ids):
+        """Poisson means (home, away) for aligned sequences of team ids"""
+        home_attack = np.array([self.attack.get(team, 1.0) for team in home_team_ids])
+        home_defence = np.array([self.defence.get(team, 1.0) for team in home_team_ids])
+        away_attack = np.array([self.attack.get(team, 1.0) for team in away_team_ids])
+        away_defence = np.array([self.defence.get(team, 1.0) for team in away_team_ids])
+        return (
+            self.home_goals * home_attack * away_defence,
+            self.away_goals * away_attack * home_defence,
+        )
+
+
+def fit_goal_model(championship_ids=(), team_ids=()):
+    """
+    Fit a GoalModel from finished Games and Standing rows.
+
+    Games of the given championships (or, without championships, any game of
+    the given teams) provide the home/away scoring rates and per-team goals.
+    A team's Standing totals are used instead when they cover more games
+    than the imported fixtures.
+    """
+    from .models import Game, Standing
+
+    games = Game.objects.filter(finished=True, home_score__isnull=False, away_score__isnull=False)
+    if championship_ids:
+        games = games.filter(championship_id__in=championship_ids)
+    else:
+        games = games.filter(Q(home_team_id__in=team_ids) | Q(away_team_id__in=team_ids))
+    rows = list(games.values_list('home_team_id', 'away_team_id', 'home_score', 'away_score'))
+
+    scored, conceded, played = {}, {}, {}
+    for home, away, home_score, away_score in rows:
+        for team, goals_for, goals_against in ((home, home_score, away_score), (away, away_score, home_score)):
+            scored[team] = scored.get(team, 0) + goals_for
+            conceded[team] = conceded.get(team, 0) + goals_against
+            played[team] = played.get(team, 0) + 1
+
+    standings = Standing.objects.filter(championship_id__in=championship_ids) if championship_ids else Standing.objects.none()
+    for team, games_played, goals_for, goals_against in standings.values_list('team_id', 'played', 'goals_for', 'goals_against'):
+        if games_played > played.get(team, 0):
+            scored[team], conceded[team], played[team] = goals_for, goals_against, games_played
+
+    if rows:
+        goals = np.array(rows, dtype=np.float64)[:, 2:]
+        home_goals, away_goals = goals.mean(axis=0)
+    elif played:
+        # Só classificação: taxa média por time, dividida pela vantagem de mando padrão
+        average = sum(scored.values()) / sum(played.values())
+        home_goals = average * 2 * DEFAULT_HOME_GOALS / (DEFAULT_HOME_GOALS + DEFAULT_AWAY_GOALS)
+        away_goals = average * 2 * DEFAULT_AWAY_GOALS / (DEFAULT_HOME_GOALS + DEFAULT_AWAY_GOALS)
+    else:
+        home_goals, away_goals = DEFAULT_HOME_GOALS, DEFAULT_AWAY_GOALS
+
+    average = max((home_goals + away_goals) / 2, 0.1)
+    attack = {
+        team: (scored[team] + PRIOR_GAMES * average) / ((played[team] + PRIOR_GAMES) * average)
+        for team in played
+    }
+    defence = {
+        team: (conceded[team] + PRIOR_GAMES * average) / ((played[team] + PRIOR_GAMES) * average)
+        for team in played
+    }
+    return GoalModel(float(home_goals), float(away_goals), attack, defence)
+
+
+def simulate_chunk(current_points, tables, classes, home_means, away_means, simulations, seed):
+    """
+    Simulate a batch of seasons; pure NumPy, safe to run in a worker process.
+
+    tables[m] holds the points of each distinct prediction of match m for
+    every capped scoreline (OUTCOMES x predictions) and classes[m] maps each
+    participant to their prediction column. Returns (first, top3): per
+    participant, the number of wins (ties split evenly) and of top-3
+    finishes (competition rank) in the batch.
+    """
+    rng = np.random.default_rng(seed)
+    n = len(current_points)
+    totals = np.broadcast_to(np.asarray(current_points, dtype=np.int64), (simulations, n)).copy()
+
+    if len(tables):
+        home = np.minimum(rng.poisson(home_means, size=(simulations, len(tables))), GOAL_CAP)
+        away = np.minimum(rng.poisson(away_means, size=(simulations, len(tables))), GOAL_CAP)
+        outcomes = home * (GOAL_CAP + 1) + away
+        for m, (table, match_classes) in enumerate(zip(tables, classes)):
+            totals += table[outcomes[:, m]][:, match_classes]
+
+    best = totals.max(axis=1, keepdims=True)
+    leaders = totals == best
+    first = (leaders / leaders.sum(axis=1, keepdims=True)).sum(axis=0)
+
+    # Top 3 (posição de competição): pontos >= terceira maior pontuação
+    third = -np.partition(-totals, min(2, n - 1), axis=1)[:, min(2, n - 1)]
+    top3 = (totals >= third[:, None]).sum(axis=0)
+    return first, top3
+
+
+def run_simulations(current_points, tables, classes, home_means, away_means, simulations=DEFAULT_SIMULATIONS, seed=None):
+    """
+    Run the simulations in chunks, in parallel for big pools.
+
+    Returns (first, top3) probability arrays aligned with current_points.
+    """
+    n = len(current_points)
+    chunks = [
+        min(SIMULATION_CHUNK, simulations - start)
+        for start in range(0, simulations, SIMULATION_CHUNK)
+    ]
+    seeds = np.random.SeedSequence(seed).spawn(len(chunks))
+    arguments = [
+        (current_points, tables, classes, home_means, away_means, size, chunk_seed)
+        for size, chunk_seed in zip(chunks, seeds)
+    ]
+
+    workers = min(os.cpu_count() or 1, len(chunks))
+    if workers > 1 and simulations * n * max(len(tables), 1) >= PARALLEL_THRESHOLD:
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            results = list(executor.map(simulate_chunk, *zip(*arguments)))
+    else:
+        results = [simulate_chunk(*chunk_arguments) for chunk_arguments in arguments]
+
+    first = sum(result[0] for result in results) / simulations
+    top3 = sum(result[1] for result in results) / simulations
+    return first, top3
+
+
+def build_simulation_inputs(pool):
+    """
+    Read a pool's participants, remaining matches and bets into arrays.
+
+    Participants without a bet on a match score nothing on it (the column
+    of a constant zero prediction class).
+    """
+    from .models import Bet, Match, Participation
+    from .scoring import ScoringRules, score_predictions
+
+    participations = list(Participation.objects.filter(pool=pool).values_list('user_id', 'points'))
+    user_ids = [user_id for user_id, _ in participations]
+    current_points = np.array([points for _, points in participations], dtype=np.int64)
+    index = {user_id: i for i, user_id in enumerate(user_ids)}
+
+    matches = list(Match.objects.filter(pool=pool, scored=False).values_list(
+        'id', 'home_team_id', 'away_team_id',
+        'related_game__home_team_id', 'related_game__away_team_id', 'related_game__championship_id',
+    ))
+    home_teams = [home or game_home for _, home, _, game_home, _, _ in matches]
+    away_teams = [away or game_away for _, _, away, _, game_away, _ in matches]
+
+    championship_ids = {pool.championship_id} | {row[5] for row in matches}
+    championship_ids.discard(None)
+    model = fit_goal_model(sorted(championship_ids), {team for team in home_teams + away_teams if team})
+    home_means, away_means = model.expected_goals(home_teams, away_teams)
+
+    predictions = {}
+    for match_id, user_id, home_bet, away_bet in Bet.objects.filter(
+        pool=pool, match__pool=pool, match__scored=False
+    ).values_list('match_id', 'user_id', 'home_score_bet', 'away_score_bet'):
+        if user_id in index:
+            predictions.setdefault(match_id, []).append((index[user_id], home_bet, away_bet))
+
+    grid = np.arange(OUTCOMES)
+    home_real, away_real = grid // (GOAL_CAP + 1), grid % (GOAL_CAP + 1)
+    rules = ScoringRules.from_pool(pool)
+
+    tables, classes = [], []
+    for match_id, *_ in matches:
+        match_classes = np.zeros(len(user_ids), dtype=np.int64)
+        columns = [np.zeros(OUTCOMES, dtype=np.int64)]  # coluna 0: sem palpite
+        rows = predictions.get(match_id)
+        if rows:
+            participants, home_bet, away_bet = (np.array(column, dtype=np.int64) for column in zip(*rows))
+            distinct, inverse = np.unique(np.stack([home_bet, away_bet], axis=1), axis=0, return_inverse=True)
+            match_classes[participants] = inverse.reshape(-1) + 1
+            columns.extend(score_predictions(distinct[:, 0], distinct[:, 1], home_real[:, None], away_real[:, None], rules).T)
+        tables.append(np.stack(columns, axis=1))
+        classes.append(match_classes)
+
+    return user_ids, current_points, tables, classes, home_means, away_means
+
+
+def title_odds(pool, simulations=DEFAULT_SIMULATIONS, seed=None):
+    """
+    Probability of each participant finishing first and in the top 3.
+
+    Returns {'simulations', 'remaining_matches', 'participants': {user_id:
+    {'first': p, 'top3': p}}}.
+    """
+    user_ids, current_points, tables, classes, home_means, away_means = build_simulation_inputs(pool)
+    if not user_ids:
+        return {'simulations': simulations, 'remaining_matches': len(tables), 'participants': {}}
+
+    first, top3 = run_simulations(current_points, tables, classes, home_means, away_means, simulations, seed)
+    return {
+        'simulations': simulations,
+        'remaining_matches': len(tables),
+        'participants': {
+            user_id: {'first': float(first[i]), 'top3': float(top3[i])}
+            for i, user_id in enumerate(user_ids)
+        },
+    }
+
+
+def refresh_title_odds(pool, simulations=DEFAULT_SIMULATIONS, force=False):
+    """
+    Run the simulation and store its odds, unless the stored odds are of the
+    pool's current results already (or force). Returns (odds, computed).
+    """
+    from .models import TitleOdds
+
+    stored = TitleOdds.objects.filter(pool=pool).first()
+    if stored is not None and not force and stored.results_version == pool.results_version:
+        return stored.as_dict(), False
+    odds = title_odds(pool, simulations)
+    odds['results_version'] = pool.results_version
+    TitleOdds.objects.update_or_create(pool=pool, defaults={
+        'results_version': odds['results_version'],
+        'simulations': odds['simulations'],
+        'remaining_matches': odds['remaining_matches'],
+        'participants': odds['participants'],
+    })
+    return odds, True
+
+
+def get_title_odds(pool):
+    """
+    Precomputed odds of the pool (compare their 'results_version' with the
+    pool's to know whether they are current), or None. Never runs the
+    simulation.
+    """
+    from .models import TitleOdds
+
+    stored = TitleOdds.objects.filter(pool=pool).first()
+    return stored.as_dict() if stored is not None else None
@@ -1,14 +1,51 @@
-from django.test import TestCase, Client, RequestFactory
+from django.test import TestCase, SimpleTestCase, TransactionTestCase, Client, RequestFactory
+from django.test.utils import CaptureQueriesContext, override_settings
+from django.core.management import call_command
+from django.db import connection
 from django.urls import reverse
 from django.utils import timezone
 from django.contrib.auth import get_user_model
 from django.contrib.messages.storage.fallback import FallbackStorage
-from pools.models import Pool, Match, Bet, Competition, Sport, Participation
+from pools.models import (
+    Pool, Match, Bet, Competition, Sport, Participation, RoundPoints, ScoringJob, PredictionCount, Championship,
+    GlobalScore, Team, Game, PoolRescore, TitleOdds, RankingSnapshot,
+)
 from pools.forms import BetForm
-from pools.views import calculate_bet_points, bet_match
+from pools.views import calculate_bet_points, bet_match, ranking_window
 from pools.mixins import PoolUserAccessMixin
+from pools.ranking import competition_ranks, pack_standings, unpack_standings
+from pools.projections import candidate_outcomes, compute_race_status
+from pools.live import compute_live_ranking
+from pools import exports
+from pools.rollup import rollup_pending_matches, get_hall_of_fame
+from pools.history import points_history, window_ranking, last_weeks
+from pools.simulation import simulate_chunk, refresh_title_odds, OUTCOMES, DEFAULT_SIMULATIONS
+from django.core.cache import cache
+from pools.leaderboard import (
+    compute_streaks, bet_trend, encode_cursor, decode_cursor, refresh_leaderboard, refresh_streaks, user_positions,
+    keyset_page, refresh_snapshots, round_movements,
+)
+from pools.headtohead import head_to_head, NO_BET
+from pools.ratelimit import TokenBucket
+from pools.apiclient import ApiClient, retry_after_seconds, use_client
+from pools.payloads import PayloadStore, ReplaySession
+from pools.jobs import claim_jobs, run_job, requeue_stale_jobs
+from pools.services import FootballDataApiService, sync_window
+from pools.scheduler import due_championships, sync_championships
+from pools.scoring import (
+    ScoringRules, score_predictions, classify_predictions, score_match, reconcile_participation_points, rescore_pool,
+    EXACT_SCORE, CORRECT_WINNER, WRONG
+)
 from datetime import timedelta
+import numpy as np
 import uuid
+import requests
+import tempfile
+import csv
+import gzip
+import json
+from unittest import mock
+from io import StringIO
 
 User = get_user_model()
 
@@ -469,3 +506,1486 @@ class PointCalculationTests(TestCase):
         
         points = calculate_bet_points(bet)
         self.assertEqual(points, 0)
+
+
+class ScoringKernelTests(SimpleTestCase):
+    """Testes para a engine vetorizada de pontuação"""
+    
+    def test_default_rules(self):
+        """Regras padrão: 10/5/3/0, empate com placar diferente vale 3"""
+        points = score_predictions(
+            [2, 2, 1, 0, 2],
+            [1, 0, 0, 0, 0],
+            [2, 3, 2, 1, 0],
+            [1, 1, 0, 1, 2]
+        )
+        self.assertEqual(points.tolist(), [10, 5, 3, 3, 0])
+    
+    def test_pool_configured_rules(self):
+        """Os pontos configurados no bolão são respeitados"""
+        rules = ScoringRules(exact_score=25, correct_difference=15, correct_winner=7, wrong=1)
+        points = score_predictions([1, 3, 2, 0], [0, 1, 0, 3], 2, 0, rules)
+        self.assertEqual(points.tolist(), [7, 15, 25, 1])
+    
+    def test_per_bet_rules_broadcast(self):
+        """Regras diferentes por aposta (apostas de bolões distintos)"""
+        rules = ScoringRules([10, 20], [5, 8], [3, 4], [0, 0])
+        points = score_predictions([1, 1], [1, 1], 1, 1, rules)
+        self.assertEqual(points.tolist(), [10, 20])
+    
+    def test_classification(self):
+        """Classificação das previsões por categoria"""
+        categories = classify_predictions([1, 2, 0, 0], [1, 0, 0, 1], 1, 1)
+        self.assertEqual(categories.tolist(), [EXACT_SCORE, WRONG, CORRECT_WINNER, WRONG])
+
+
+class CompetitionRanksTests(SimpleTestCase):
+    """Testes para o cálculo de posições com empates"""
+    
+    def test_ties_share_position(self):
+        """Empatados dividem a posição e a próxima pontuação pula posições"""
+        ranks = competition_ranks([10, 30, 20, 30, 5])
+        self.assertEqual(ranks.tolist(), [4, 1, 3, 1, 5])
+    
+    def test_empty(self):
+        self.assertEqual(competition_ranks([]).tolist(), [])
+
+
+class CandidateOutcomesTests(SimpleTestCase):
+    """Testes para os placares candidatos usados na projeção do título"""
+    
+    def test_covers_every_points_pattern(self):
+        """Qualquer placar real gera um vetor de pontos já coberto pelos candidatos"""
+        home_bet, away_bet = [1, 2, 0, 3], [1, 0, 0, 1]
+        home_real, away_real = candidate_outcomes(home_bet, away_bet)
+        candidates = {
+            tuple(score_predictions(home_bet, away_bet, home, away).tolist())
+            for home, away in zip(home_real, away_real)
+        }
+        for home in range(8):
+            for away in range(8):
+                self.assertIn(tuple(score_predictions(home_bet, away_bet, home, away).tolist()), candidates)
+    
+    def test_without_bets(self):
+        home_real, away_real = candidate_outcomes([], [])
+        self.assertEqual(len(home_real), 3)
+
+
+class TitleSimulationTests(SimpleTestCase):
+    """Testes para o núcleo da simulação Monte Carlo de título"""
+    
+    def test_decided_race(self):
+        """Sem partidas restantes o líder vence todas as simulações; empates dividem a vitória"""
+        first, top3 = simulate_chunk(np.array([30, 10, 30, 5]), [], [], np.zeros(0), np.zeros(0), 100, seed=1)
+        self.assertEqual(first.tolist(), [50.0, 0.0, 50.0, 0.0])
+        self.assertEqual(top3.tolist(), [100, 100, 100, 0])
+    
+    def test_points_from_tables(self):
+        """Os pontos de cada placar simulado vêm da tabela da classe de palpite"""
+        table = np.zeros((OUTCOMES, 2), dtype=np.int64)
+        table[:, 1] = 10
+        first, _ = simulate_chunk(np.array([0, 5]), [table], [np.array([1, 0])], np.ones(1), np.ones(1), 50, seed=1)
+        self.assertEqual(first.tolist(), [50.0, 0.0])
+
+
+class StreakTests(SimpleTestCase):
+    """Testes para o cálculo em passada única de sequências e tendências"""
+    
+    def test_streaks_per_user(self):
+        rows = [(1, 3), (1, 10), (1, 0), (1, 5), (2, 0), (2, 0), (3, 10), (3, 10), (3, 3)]
+        self.assertEqual(compute_streaks(rows), {
+            1: (1, 2, 'up'),
+            2: (0, 0, 'stable'),
+            3: (3, 3, 'stable'),
+        })
+    
+    def test_trend(self):
+        self.assertEqual(bet_trend([0, 0, 0, 10, 10, 10]), 'up')
+        self.assertEqual(bet_trend([10, 10, 10, 0, 3, 0]), 'down')
+        self.assertEqual(bet_trend([5, 5, 5, 5, 5, 6]), 'stable')
+        # Só as 3 mais recentes e até 3 anteriores contam
+        self.assertEqual(bet_trend([0, 0, 10, 0, 0, 10, 10, 10]), 'up')
+        self.assertEqual(bet_trend([3, 0, 0]), 'stable')
+
+
+class RankingCursorTests(SimpleTestCase):
+    """Testes para os cursores da paginação do ranking"""
+    
+    def test_round_trip(self):
+        self.assertEqual(decode_cursor(encode_cursor('a', 120, 42)), ('a', 120, 42))
+        self.assertEqual(decode_cursor(encode_cursor('b', 0, 7)), ('b', 0, 7))
+    
+    def test_invalid(self):
+        for cursor in ('', 'zzz', encode_cursor('x', 1, 1), 'YTox'):
+            with self.assertRaises(ValueError):
+                decode_cursor(cursor)
+
+
+class StandingsPackingTests(SimpleTestCase):
+    """Testes para o empacotamento dos snapshots de classificação"""
+    
+    def test_round_trip(self):
+        user_ids, points = np.array([9, 3, 7, 12, 1]), np.array([30, 25, 25, 25, -2])
+        ids, unpacked_points, positions = unpack_standings(pack_standings(user_ids, points))
+        self.assertEqual(ids.tolist(), user_ids.tolist())
+        self.assertEqual(unpacked_points.tolist(), points.tolist())
+        self.assertEqual(positions.tolist(), [1, 2, 2, 2, 5])
+    
+    def test_empty(self):
+        ids, points, positions = unpack_standings(pack_standings([], []))
+        self.assertEqual((ids.size, points.size, positions.size), (0, 0, 0))
+    
+    def test_compact_for_big_pools(self):
+        rng = np.random.default_rng(0)
+        user_ids = rng.choice(np.arange(1, 50000), 5000, replace=False)
+        points = rng.integers(0, 400, 5000)
+        order = np.lexsort((user_ids, -points))
+        self.assertLess(len(pack_standings(user_ids[order], points[order])), 12 * 1024)
+
+
+class HeadToHeadTests(SimpleTestCase):
+    """Testes para a comparação direta a partir da matriz de apostas"""
+    
+    def setUp(self):
+        self.matrix = {
+            'user_ids': np.array([3, 8]),
+            'matches': [
+                {'id': match_id, 'kickoff': timezone.now(), 'round': 1, 'home_team': 'A', 'away_team': 'B',
+                 'home_score': 1, 'away_score': 0}
+                for match_id in (10, 11, 12)
+            ],
+            'real_home': np.array([1, 1, 1]),
+            'real_away': np.array([0, 0, 0]),
+            'home': np.array([[1, 2, 1], [1, 0, NO_BET]]),
+            'away': np.array([[0, 0, 0], [0, 0, NO_BET]]),
+            'points': np.array([[10, 3, 10], [10, 0, 0]]),
+        }
+    
+    def test_common_matches_only(self):
+        comparison = head_to_head(self.matrix, 3, 8)
+        self.assertEqual(comparison['summary']['common_matches'], 2)
+        self.assertEqual(comparison['summary']['wins_a'], 1)
+        self.assertEqual(comparison['summary']['draws'], 1)
+        self.assertEqual(comparison['difference'], [0, 3])
+        self.assertEqual(comparison['common_exact'], [10])
+    
+    def test_unknown_participant(self):
+        self.assertIsNone(head_to_head(self.matrix, 3, 5))
+
+
+class TokenBucketTests(SimpleTestCase):
+    """Testes para o limitador de requisições compartilhado"""
+    
+    def setUp(self):
+        self.now = 0.0
+        self.slept = []
+        self.bucket = TokenBucket(10, clock=lambda: self.now, sleep=self.slept.append)
+    
+    def test_burst_then_waits(self):
+        waits = [self.bucket.reserve() for _ in range(7)]
+        self.assertEqual(waits[:5], [0.0] * 5)
+        self.assertAlmostEqual(waits[5], 12.0)
+        self.assertAlmostEqual(waits[6], 24.0)
+    
+    def test_never_exceeds_quota_per_minute(self):
+        granted = []
+        for _ in range(40):
+            wait = self.bucket.reserve()
+            granted.append(self.now + wait)
+        for start in granted:
+            self.assertLessEqual(sum(1 for moment in granted if start <= moment < start + 60), 10)
+    
+    def test_refills(self):
+        for _ in range(5):
+            self.bucket.acquire()
+        self.now = 24.0
+        self.assertEqual(self.bucket.acquire(), 0.0)
+        self.assertEqual(self.slept, [])
+
+
+class ApiClientTests(SimpleTestCase):
+    """Testes para o cliente HTTP compartilhado das APIs"""
+    
+    class FakeResponse:
+        def __init__(self, status_code, headers=None):
+            self.status_code = status_code
+            self.headers = headers or {}
+        
+        def close(self):
+            pass
+    
+    class FakeSession:
+        def __init__(self, outcomes):
+            self.outcomes = list(outcomes)
+            self.calls = []
+        
+        def get(self, url, **kwargs):
+            self.calls.append((url, kwargs))
+            outcome = self.outcomes.pop(0)
+            if isinstance(outcome, Exception):
+                raise outcome
+            return outcome
+    
+    def client_for(self, *outcomes):
+        self.slept = []
+        session = self.FakeSession(outcomes)
+        return ApiClient(session=session, timeout=(1, 2), sleep=self.slept.append, rand=lambda: 0.5), session
+    
+    def test_retries_server_errors_with_backoff(self):
+        client, session = self.client_for(self.FakeResponse(503), self.FakeResponse(502), self.FakeResponse(200))
+        response = client.get('https://api.example.com/v4/matches', params={'a': 1})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(self.slept, [0.5, 1.0])
+        self.assertEqual(session.calls[0][1], {'params': {'a': 1}, 'timeout': (1, 2)})
+        stats = client.stats()['api.example.com/v4/matches']
+        self.assertEqual((stats['requests'], stats['retries'], stats['errors']), (3, 2, 0))
+        self.assertEqual(stats['statuses'], {503: 1, 502: 1, 200: 1})
+    
+    def test_honours_retry_after(self):
+        client, _ = self.client_for(self.FakeResponse(429, {'Retry-After': '7'}), self.FakeResponse(200))
+        self.assertEqual(client.get('https://api.example.com/x').status_code, 200)
+        self.assertEqual(self.slept, [7.0])
+    
+    def test_gives_up_after_retries(self):
+        client, _ = self.client_for(*[self.FakeResponse(500)] * 4)
+        self.assertEqual(client.get('https://api.example.com/x').status_code, 500)
+        self.assertEqual(client.stats()['api.example.com/x']['errors'], 1)
+        
+        client, _ = self.client_for(*[requests.Timeout()] * 4)
+        with self.assertRaises(requests.Timeout):
+            client.get('https://api.example.com/x')
+        self.assertEqual(len(self.slept), 3)
+    
+    def test_client_errors_are_not_retried(self):
+        client, session = self.client_for(self.FakeResponse(404))
+        self.assertEqual(client.get('https://api.example.com/x').status_code, 404)
+        self.assertEqual(len(session.calls), 1)
+    
+    def test_retry_after_http_date(self):
+        self.assertEqual(retry_after_seconds('Wed, 21 Oct 2015 07:28:10 GMT', now=1445412480.0), 10.0)
+        self.assertIsNone(retry_after_seconds('soon'))
+
+
+class PayloadStoreTests(SimpleTestCase):
+    """Testes para o armazenamento das respostas brutas das APIs"""
+    
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp.cleanup)
+        self.store = PayloadStore(self.tmp.name)
+        self.start = timezone.now()
+    
+    def save(self, body, params=None, minutes=0, endpoint='api.example.com/v4/competitions/BSA/matches'):
+        return self.store.save(endpoint, params, body, {'ETag': '"e"'}, self.start + timedelta(minutes=minutes))
+    
+    def test_identical_bodies_share_a_blob(self):
+        first = self.save(b'{"matches": []}')
+        second = self.save(b'{"matches": []}', minutes=5)
+        self.assertEqual(first['sha256'], second['sha256'])
+        self.assertEqual(len(list((self.store.root / 'blobs').rglob('*.gz'))), 1)
+        self.assertEqual(len(self.store.entries()), 2)
+        self.assertEqual(self.store.load(second), {'matches': []})
+    
+    def test_entries_by_params_and_time(self):
+        self.save(b'1', {'dateTo': '2025-01-10', 'dateFrom': '2025-01-01'})
+        self.save(b'2', minutes=10)
+        self.save(b'3', minutes=20)
+        endpoint = 'api.example.com/v4/competitions/BSA/matches'
+        latest = self.store.latest(endpoint, {'dateFrom': '2025-01-01', 'dateTo': '2025-01-10'})
+        self.assertEqual(self.store.body(latest), b'1')
+        self.assertEqual(self.store.body(self.store.latest(endpoint)), b'3')
+        self.assertEqual(self.store.body(self.store.latest(endpoint, until=self.start + timedelta(minutes=15))), b'2')
+        self.assertEqual([self.store.body(entry) for entry in self.store.entries(endpoint, params={})], [b'2', b'3'])
+    
+    def test_replay_session(self):
+        self.save(b'{"matches": [1]}')
+        session = ReplaySession(self.store)
+        response = session.get('https://api.example.com/v4/competitions/BSA/matches', params={'dateFrom': 'x'})
+        self.assertEqual((response.status_code, response.json(), response.headers['ETag']), (200, {'matches': [1]}, '"e"'))
+        self.assertEqual(session.get('https://api.example.com/v4/competitions/PL/matches').status_code, 404)
+    
+    def test_index_is_read_once(self):
+        self.save(b'1')
+        store = PayloadStore(self.tmp.name)
+        session = ReplaySession(store)
+        with mock.patch.object(store, '_read_index', wraps=store._read_index) as read_index:
+            for _ in range(3):
+                session.get('https://api.example.com/v4/competitions/BSA/matches')
+            store.save('api.example.com/v4/competitions/BSA/matches', None, b'2', fetched_at=self.start + timedelta(minutes=5))
+            self.assertEqual(session.get('https://api.example.com/v4/competitions/BSA/matches').content, b'2')
+        self.assertEqual(read_index.call_count, 1)
+    
+    def test_prune_keeps_recent_and_latest_entries(self):
+        day = 24 * 60
+        self.save(b'antigo', minutes=-40 * day)
+        self.save(b'antigo tambem', minutes=-35 * day)
+        self.save(b'recente', minutes=-day)
+        self.save(b'so este', {'season': '2024'}, minutes=-40 * day)
+        with override_settings(API_PAYLOAD_DIR=self.tmp.name):
+            out = StringIO()
+            call_command('prune_api_payloads', days=30, stdout=out)
+        self.assertIn('Removed 2 index entries and 2 payload files.', out.getvalue())
+        store = PayloadStore(self.tmp.name)
+        self.assertEqual([store.body(entry) for entry in store.entries()], [b'so este', b'recente'])
+        self.assertEqual(len(list((store.root / 'blobs').rglob('*.gz'))), 2)
+        self.assertEqual(store.prune(self.start), (0, 0))
+    
+    def test_client_captures_successful_responses(self):
+        responses = [ApiClientTests.FakeResponse(404), ApiClientTests.FakeResponse(200, {'ETag': '"e"'})]
+        for response in responses:
+            response.content = b'{}'
+        client = ApiClient(session=ApiClientTests.FakeSession(responses), store=self.store, sleep=lambda wait: None)
+        client.get('https://api.example.com/x')
+        client.get('https://api.example.com/x', params={'a': 1})
+        self.assertEqual([entry['params'] for entry in self.store.entries('api.example.com/x')], [{'a': '1'}])
+
+
+class PoolFixtureMixin:
+    """Bolão com participantes, partidas e apostas criados em massa"""
+    
+    def make_pool(self, participants=3):
+        self.owner = User.objects.create_user(username='dono', password='testpass123')
+        sport = Sport.objects.create(name='Futebol')
+        self.competition = Competition.objects.create(
+            name='Torneio', sport=sport,
+            start_date=timezone.now().date(), end_date=timezone.now().date() + timedelta(days=90)
+        )
+        self.pool = Pool.objects.create(name='Bolão', owner=self.owner, competition=self.competition)
+        self.users = self.make_users(participants)
+        return self.pool
+    
+    def make_users(self, count, pool=None):
+        start = User.objects.count()
+        users = User.objects.bulk_create([User(username=f'jogador{start + i}') for i in range(count)])
+        users = list(User.objects.filter(username__in=[user.username for user in users]).order_by('id'))
+        Participation.objects.bulk_create([Participation(user=user, pool=pool or self.pool) for user in users])
+        return users
+    
+    def make_match(self, days=1, **kwargs):
+        return Match.objects.create(
+            competition=self.competition, pool=self.pool,
+            start_time=timezone.now() + timedelta(days=days), **kwargs
+        )
+    
+    def make_bets(self, match, predictions, users=None):
+        """Uma aposta por participante, com os palpites (casa, fora) em ordem"""
+        Bet.objects.bulk_create([
+            Bet(user=user, match=match, pool=self.pool, home_score_bet=home, away_score_bet=away)
+            for user, (home, away) in zip(users or self.users, predictions)
+        ])
+    
+    def finish(self, match, home, away):
+        match.home_score, match.away_score, match.finished = home, away, True
+        match.save()
+        return match
+
+
+class ScoreMatchQueryTests(PoolFixtureMixin, TestCase):
+    """A pontuação de uma partida não faz mais consultas com mais apostas"""
+    
+    def score_queries(self, bets, idle=0):
+        match = self.make_match()
+        self.make_users(idle)
+        self.make_bets(match, [(1, 0), (2, 0), (0, 1)] * (bets // 3) + [(1, 0)] * (bets % 3), self.make_users(bets))
+        self.finish(match, 1, 0)
+        with CaptureQueriesContext(connection) as queries:
+            self.assertEqual(score_match(match), bets - bets // 3)
+        return len(queries)
+    
+    def test_same_queries_for_few_and_many_bets(self):
+        self.make_pool(participants=0)
+        few = self.score_queries(5)
+        # Muitas apostas e mais de mil posições alteradas no ranking
+        self.assertEqual(self.score_queries(240, idle=1000), few)
+
+
+class ScoringLedgerTests(PoolFixtureMixin, TestCase):
+    """Totais de Participation e pontos por rodada acompanham as apostas"""
+    
+    def setUp(self):
+        self.make_pool()
+        self.match = self.make_match(round=2)
+        for user, (home, away) in zip(self.users, [(1, 0), (2, 0), (0, 1)]):
+            Bet.objects.create(user=user, match=self.match, pool=self.pool, home_score_bet=home, away_score_bet=away)
+    
+    def totals(self):
+        """(pontos, finalizadas, acertos, pontos da rodada) por participante"""
+        rounds = dict(RoundPoints.objects.filter(pool=self.pool, round=2).values_list('user_id', 'points'))
+        return [
+            (points, finished, correct, rounds.get(user_id, 0))
+            for user_id, points, finished, correct in Participation.objects.filter(pool=self.pool).order_by(
+                'user_id'
+            ).values_list('user_id', 'points', 'finished_bets', 'correct_bets')
+        ]
+    
+    def test_score_match_deltas(self):
+        score_match(self.finish(self.match, 1, 0))
+        self.assertEqual(self.totals(), [(10, 1, 1, 10), (3, 1, 1, 3), (0, 1, 0, 0)])
+        # Correção do placar: só as diferenças são aplicadas
+        score_match(self.finish(self.match, 2, 0))
+        self.assertEqual(self.totals(), [(3, 1, 1, 3), (10, 1, 1, 10), (0, 1, 0, 0)])
+        self.assertEqual(reconcile_participation_points(self.pool, dry_run=True), [])
+    
+    def test_bets_changed_after_scoring(self):
+        score_match(self.finish(self.match, 1, 0))
+        bet = Bet.objects.get(user=self.users[2], match=self.match)
+        bet.home_score_bet, bet.away_score_bet = 1, 0
+        bet.save()
+        self.assertEqual(Bet.objects.get(pk=bet.pk).points_earned, 10)
+        self.assertEqual(self.totals()[2], (10, 1, 1, 10))
+        
+        late = self.make_users(1)[0]
+        Bet.objects.create(user=late, match=self.match, pool=self.pool, home_score_bet=2, away_score_bet=1)
+        self.assertEqual(self.totals()[3], (5, 1, 1, 5))
+        
+        Bet.objects.get(user=self.users[0], match=self.match).delete()
+        self.assertEqual(self.totals()[0], (0, 0, 0, 0))
+        self.assertEqual(reconcile_participation_points(self.pool, dry_run=True), [])
+        
+        self.match.delete()
+        self.assertEqual({total[:3] for total in self.totals()}, {(0, 0, 0)})
+        self.assertEqual(reconcile_participation_points(self.pool, dry_run=True), [])
+    
+    def test_deferred_matches(self):
+        score_match(self.finish(self.match, 1, 0))
+        self.assertEqual(len(Match.objects.only('id')), 1)
+        match = Match.objects.only('id').get()
+        match.save()
+        self.assertEqual(ScoringJob.objects.filter(match=self.match).count(), 1)
+        match.home_score = 2
+        match.save()
+        self.assertEqual(ScoringJob.objects.filter(match=self.match).count(), 2)
+    
+    def test_deleting_user_or_competition(self):
+        score_match(self.finish(self.match, 1, 0))
+        # Os totais do usuário e do bolão saem na cascata, sem serem recriados pelo estorno
+        self.users[0].delete()
+        self.assertEqual(self.totals(), [(3, 1, 1, 3), (0, 1, 0, 0)])
+        self.competition.delete()
+        self.assertFalse(Pool.objects.exists())
+        self.assertFalse(RoundPoints.objects.exists())
+    
+    def test_undone_result_reverses_points(self):
+        score_match(self.finish(self.match, 1, 0))
+        self.match.finished = False
+        self.match.save()
+        self.assertEqual(ScoringJob.objects.filter(match=self.match).count(), 2)
+        score_match(self.match)
+        self.assertEqual({total for total in self.totals()}, {(0, 0, 0, 0)})
+        self.assertFalse(Match.objects.get(pk=self.match.pk).scored)
+        # Resultado lançado de novo: pontuado do zero
+        score_match(self.finish(self.match, 0, 1))
+        self.assertEqual(self.totals(), [(0, 1, 0, 0), (0, 1, 0, 0), (10, 1, 1, 10)])
+    
+    def test_reconcile_repairs_drift(self):
+        score_match(self.finish(self.match, 1, 0))
+        drifted = Participation.objects.get(pool=self.pool, user=self.users[0])
+        Participation.objects.filter(pk=drifted.pk).update(points=99, finished_bets=0)
+        
+        self.assertEqual(
+            reconcile_participation_points(self.pool, dry_run=True),
+            [(drifted.pk, (99, 1, 0, 1), (10, 1, 1, 1))]
+        )
+        self.assertEqual(Participation.objects.get(pk=drifted.pk).points, 99)
+        reconcile_participation_points(self.pool)
+        self.assertEqual(self.totals()[0], (10, 1, 1, 10))
+        self.assertEqual(Participation.objects.get(pk=drifted.pk).rank, 1)
+        self.assertEqual(reconcile_participation_points(self.pool, dry_run=True), [])
+
+
+class ScoringJobWorkerTests(PoolFixtureMixin, TestCase):
+    """Fila de pontuação: execução, lease dos jobs em andamento e limite de tentativas"""
+    
+    def setUp(self):
+        self.make_pool(participants=2)
+        self.match = self.make_match()
+        self.make_bets(self.match, [(1, 0), (0, 0)])
+        self.finish(self.match, 1, 0)
+        self.job = ScoringJob.objects.get(match=self.match)
+    
+    def age(self, minutes, **fields):
+        moment = timezone.now() - timedelta(minutes=minutes)
+        ScoringJob.objects.filter(pk=self.job.pk).update(status='running', started_at=moment, heartbeat_at=moment, **fields)
+    
+    def test_claim_and_run(self):
+        jobs = claim_jobs()
+        self.assertEqual(jobs, [self.job])
+        self.assertTrue(run_job(jobs[0]))
+        self.job.refresh_from_db()
+        self.assertEqual((self.job.status, self.job.attempts, self.job.bets_updated), ('done', 1, 1))
+        self.assertEqual(Participation.objects.get(pool=self.pool, user=self.users[0]).points, 10)
+        self.assertEqual(claim_jobs(), [])
+    
+    def test_enqueue_once_per_version(self):
+        self.assertEqual(ScoringJob.enqueue(self.match), self.job)
+        self.assertEqual(ScoringJob.objects.filter(match=self.match).count(), 1)
+        # Placar apagado: nova versão, para estornar os pontos
+        self.match.home_score = None
+        self.match.save()
+        self.assertEqual(ScoringJob.objects.filter(match=self.match).count(), 2)
+    
+    def test_live_lease_is_kept(self):
+        # Começou há uma hora, mas o worker ainda renova o lease
+        self.age(60, attempts=1)
+        ScoringJob.objects.filter(pk=self.job.pk).update(heartbeat_at=timezone.now())
+        self.assertEqual(requeue_stale_jobs(timedelta(minutes=10)), 0)
+        self.assertEqual(ScoringJob.objects.get(pk=self.job.pk).status, 'running')
+    
+    def test_expired_lease_is_requeued(self):
+        self.age(11, attempts=1)
+        self.assertEqual(requeue_stale_jobs(timedelta(minutes=10)), 1)
+        self.assertEqual(ScoringJob.objects.get(pk=self.job.pk).status, 'pending')
+    
+    def test_requeue_respects_max_attempts(self):
+        self.age(11, attempts=5)
+        self.assertEqual(requeue_stale_jobs(timedelta(minutes=10)), 1)
+        self.assertEqual(ScoringJob.objects.get(pk=self.job.pk).status, 'failed')
+        self.assertEqual(claim_jobs(), [])
+    
+    def test_lost_lease_does_not_finish(self):
+        stale = claim_jobs()[0]
+        self.age(11, attempts=1)
+        requeue_stale_jobs(timedelta(minutes=10))
+        current = claim_jobs()[0]
+        self.assertEqual(current.attempts, 2)
+        
+        self.assertFalse(run_job(stale))
+        self.assertEqual(ScoringJob.objects.get(pk=self.job.pk).status, 'running')
+        self.assertTrue(run_job(current))
+        self.assertEqual(ScoringJob.objects.get(pk=self.job.pk).status, 'done')
+
+
+class RaceStatusTests(PoolFixtureMixin, TestCase):
+    """Partidas encerradas mas ainda não pontuadas continuam em disputa"""
+    
+    def test_unscored_match_is_remaining(self):
+        self.make_pool(participants=2)
+        match = self.make_match(days=-1)
+        self.make_bets(match, [(1, 0), (0, 1)])
+        self.finish(match, 1, 0)
+        
+        status = compute_race_status(self.pool)
+        self.assertEqual(status['remaining_matches'], 1)
+        self.assertFalse(any(row['clinched'] or row['eliminated'] for row in status['participants'].values()))
+        
+        score_match(match)
+        status = compute_race_status(self.pool)
+        self.assertEqual(status['remaining_matches'], 0)
+        self.assertTrue(status['participants'][self.users[0].pk]['clinched'])
+
+
+class RankingOddsTests(PoolFixtureMixin, TestCase):
+    """A view só lê as chances de título pré-calculadas pelo comando"""
+    
+    def setUp(self):
+        self.make_pool(participants=2)
+        self.match = self.make_match()
+        self.make_bets(self.match, [(1, 0), (0, 1)])
+        self.url = reverse('pools:ranking_odds', kwargs={'slug': self.pool.slug})
+    
+    def test_not_computed_in_the_request(self):
+        response = self.client.get(self.url, {'simulations': 50000})
+        self.assertEqual(response.status_code, 503)
+    
+    def test_precomputed_odds(self):
+        self.pool.refresh_from_db()
+        self.assertTrue(refresh_title_odds(self.pool)[1])
+        response = self.client.get(self.url, {'simulations': 50000})
+        self.assertEqual(response.status_code, 200)
+        data = response.json()
+        self.assertEqual((data['simulations'], data['remaining_matches'], data['stale']), (DEFAULT_SIMULATIONS, 1, False))
+        self.assertEqual({row['user_id'] for row in data['participants']}, {user.pk for user in self.users})
+        
+        self.assertFalse(refresh_title_odds(self.pool)[1])
+        # Novo resultado: as chances antigas continuam servidas, marcadas como desatualizadas
+        Pool.bump_results_version([self.pool.pk])
+        self.assertTrue(self.client.get(self.url).json()['stale'])
+    
+    def test_command_stores_odds_for_every_process(self):
+        out = StringIO()
+        call_command('refresh_title_odds', simulations=1000, stdout=out)
+        self.assertIn('Title odds refreshed for 1 pools.', out.getvalue())
+        # Gravadas no banco, não no cache local do processo do comando
+        cache.clear()
+        odds = TitleOdds.objects.get(pool=self.pool)
+        self.assertEqual((odds.simulations, odds.results_version), (1000, Pool.objects.get(pk=self.pool.pk).results_version))
+        data = self.client.get(self.url).json()
+        self.assertEqual((data['simulations'], data['stale']), (1000, False))
+        
+        call_command('refresh_title_odds', stdout=out)
+        self.assertIn('Title odds refreshed for 0 pools.', out.getvalue())
+
+
+class PredictionCountTests(PoolFixtureMixin, TestCase):
+    """Histograma de palpites mantido pelos sinais de Bet"""
+    
+    def setUp(self):
+        self.make_pool(participants=4)
+        self.match = self.make_match()
+    
+    def bet(self, user, home, away):
+        return Bet.objects.create(user=user, match=self.match, pool=self.pool, home_score_bet=home, away_score_bet=away)
+    
+    def histogram(self):
+        return dict(
+            ((home, away), count)
+            for home, away, count in PredictionCount.objects.filter(match=self.match).values_list(
+                'home_score_bet', 'away_score_bet', 'count'
+            )
+        )
+    
+    def test_create_edit_delete(self):
+        first = self.bet(self.users[0], 1, 0)
+        self.bet(self.users[1], 1, 0)
+        self.bet(self.users[2], 0, 0)
+        self.assertEqual(self.histogram(), {(1, 0): 2, (0, 0): 1})
+        
+        # Editar o palpite move a aposta de placar; salvar sem mudar não conta de novo
+        first = Bet.objects.get(pk=first.pk)
+        first.home_score_bet = 2
+        first.save()
+        first.save()
+        self.assertEqual(self.histogram(), {(1, 0): 1, (0, 0): 1, (2, 0): 1})
+        
+        first.delete()
+        self.assertEqual(self.histogram(), {(1, 0): 1, (0, 0): 1, (2, 0): 0})
+    
+    def test_deferred_bets(self):
+        first = self.bet(self.users[0], 1, 0)
+        self.assertEqual(len(Bet.objects.only('id')), 1)
+        first = Bet.objects.only('id').get(pk=first.pk)
+        first.home_score_bet = 2
+        first.save()
+        self.assertEqual(self.histogram(), {(1, 0): 0, (2, 0): 1})
+        # A exclusão em cascata do usuário também carrega as apostas
+        self.users[0].delete()
+        self.assertEqual(self.histogram(), {(1, 0): 0, (2, 0): 0})
+    
+    def test_summaries(self):
+        for user, (home, away) in zip(self.users, [(2, 1), (2, 1), (1, 1), (0, 3)]):
+            self.bet(user, home, away)
+        other = self.make_match()
+        
+        summaries = PredictionCount.summaries([self.match.pk, other.pk], top=2)
+        self.assertEqual(list(summaries), [self.match.pk])
+        summary = summaries[self.match.pk]
+        self.assertEqual(summary['total'], 4)
+        self.assertEqual(
+            (summary['home_percentage'], summary['draw_percentage'], summary['away_percentage']), (50, 25, 25)
+        )
+        self.assertEqual((summary['avg_home_goals'], summary['avg_away_goals']), (1.25, 1.5))
+        self.assertEqual(summary['top_scorelines'][0], {'home': 2, 'away': 1, 'count': 2, 'percentage': 50})
+        self.assertEqual(len(summary['top_scorelines']), 2)
+
+
+class LiveRankingTests(PoolFixtureMixin, TestCase):
+    """Partidas encerradas aguardando o worker entram no ranking provisório"""
+    
+    def test_finished_but_unscored_is_provisional(self):
+        self.make_pool(participants=2)
+        match = self.make_match(days=-1)
+        self.make_bets(match, [(0, 1), (2, 1)])
+        self.assertIsNone(compute_live_ranking(self.pool))
+        
+        self.finish(match, 2, 1)
+        live = compute_live_ranking(self.pool)
+        self.assertEqual([row['finished'] for row in live['matches']], [True])
+        self.assertEqual(live['participants'][self.users[1].pk], {'points': 10, 'live_points': 10, 'position': 1, 'movement': 0})
+        self.assertEqual(live['participants'][self.users[0].pk]['position'], 2)
+        
+        # Depois da pontuação os pontos já estão em Participation
+        score_match(match)
+        self.assertIsNone(compute_live_ranking(self.pool))
+
+
+class RefreshLeaderboardTests(PoolFixtureMixin, TestCase):
+    """Posição, movimento, aproveitamento e média gravados no ranking"""
+    
+    def set_totals(self, *totals):
+        for user, (points, correct, finished) in zip(self.users, totals):
+            Participation.objects.filter(pool=self.pool, user=user).update(
+                points=points, correct_bets=correct, finished_bets=finished
+            )
+    
+    def board(self):
+        return list(Participation.objects.filter(pool=self.pool).order_by('user_id').values_list(
+            'rank', 'last_movement', 'accuracy', 'avg_points'
+        ))
+    
+    def test_ranks_and_movement(self):
+        self.make_pool(participants=3)
+        self.set_totals((10, 1, 2), (13, 2, 3), (10, 1, 1))
+        self.assertEqual(refresh_leaderboard([self.pool.pk]), 3)
+        self.assertEqual(self.board(), [(2, 0, 50.0, 5.0), (1, 0, 66.67, 4.33), (2, 0, 100.0, 10.0)])
+        self.assertEqual(refresh_leaderboard([self.pool.pk]), 0)
+        
+        # Só quem mudou de posição tem o movimento atualizado
+        self.set_totals((20, 2, 3), (13, 2, 3), (10, 1, 1))
+        self.assertEqual(refresh_leaderboard([self.pool.pk]), 3)
+        self.assertEqual([row[:2] for row in self.board()], [(1, 1), (2, -1), (3, -1)])
+        self.set_totals((20, 2, 3), (13, 2, 3), (10, 1, 2))
+        self.assertEqual(refresh_leaderboard([self.pool.pk]), 1)
+        self.assertEqual(self.board()[2], (3, -1, 50.0, 5.0))
+
+
+class IncrementalStreakTests(PoolFixtureMixin, TestCase):
+    """Sequências estendidas pela pontuação batem com o recálculo completo"""
+    
+    def setUp(self):
+        self.make_pool(participants=3)
+        self.matches = [self.make_match(days=-day) for day in (4, 3, 2, 1)]
+        predictions = [
+            [(1, 0), (1, 0), (0, 2)],
+            [(2, 0), (0, 0), (1, 1)],
+            [(0, 1), (3, 1), (0, 1)],
+            [(1, 1), (2, 2), (2, 0)],
+        ]
+        for match, match_predictions in zip(self.matches, predictions):
+            self.make_bets(match, match_predictions)
+    
+    def streaks(self):
+        return list(Participation.objects.filter(pool=self.pool).order_by('user_id').values_list(
+            'current_streak', 'longest_streak', 'trend', 'recent_points'
+        ))
+    
+    def assert_consistent(self):
+        stored = self.streaks()
+        self.assertEqual(refresh_streaks([self.pool.pk]), 0)
+        self.assertEqual(self.streaks(), stored)
+    
+    def test_in_and_out_of_order(self):
+        refresh_streaks([self.pool.pk])
+        for match, (home, away) in zip(self.matches[:2], [(1, 0), (2, 0)]):
+            score_match(self.finish(match, home, away))
+            self.assert_consistent()
+        self.assertEqual(self.streaks(), [(2, 2, 'stable', '10,10'), (0, 1, 'stable', '10,0'), (0, 0, 'stable', '0,0')])
+        
+        # A última partida pontuada antes da terceira
+        score_match(self.finish(self.matches[3], 2, 2))
+        self.assert_consistent()
+        score_match(self.finish(self.matches[2], 0, 1))
+        self.assert_consistent()
+        self.assertEqual(self.streaks()[1], (1, 1, 'down', '10,0,0,10'))
+        
+        # Placar corrigido
+        score_match(self.finish(self.matches[0], 0, 0))
+        self.assert_consistent()
+        self.assertEqual(self.streaks()[0], (3, 3, 'up', '0,10,10,3'))
+
+
+class UserPositionsTests(PoolFixtureMixin, TestCase):
+    """Posição do usuário em todos os seus bolões, com os vizinhos de ranking"""
+    
+    def test_positions_across_pools(self):
+        first = self.make_pool(participants=5)
+        for user, points in zip(self.users, [50, 40, 40, 20, 10]):
+            Participation.objects.filter(pool=first, user=user).update(points=points)
+        second = Pool.objects.create(name='Outro bolão', owner=self.owner, competition=self.competition)
+        Participation.objects.bulk_create([Participation(user=user, pool=second, points=5) for user in self.users[1:3]])
+        empty = Pool.objects.create(name='Sem mim', owner=self.owner, competition=self.competition)
+        refresh_leaderboard([first.pk, second.pk])
+        
+        me = self.users[2]
+        positions = user_positions(me, around=1)
+        self.assertEqual(set(positions), {first.pk, second.pk})
+        self.assertEqual(
+            {key: positions[first.pk][key] for key in ('position', 'points', 'total_participants')},
+            {'position': 2, 'points': 40, 'total_participants': 5}
+        )
+        # Empatados dividem a posição; a janela vai da posição 1 à 3
+        self.assertEqual(
+            [(row['user_id'], row['position']) for row in positions[first.pk]['neighbours']],
+            [(self.users[0].pk, 1), (self.users[1].pk, 2), (me.pk, 2)]
+        )
+        self.assertEqual(positions[second.pk]['position'], 1)
+        self.assertEqual(len(positions[second.pk]['neighbours']), 2)
+        
+        positions = user_positions(me, pool_ids=[first.pk, empty.pk])
+        self.assertEqual(positions[empty.pk], {'position': None, 'points': None, 'total_participants': 0, 'neighbours': []})
+        self.assertEqual(positions[first.pk]['neighbours'], [])
+
+
+class KeysetPageTests(PoolFixtureMixin, TestCase):
+    """Paginação por cursor do ranking sobre linhas reais, com empates"""
+    
+    def setUp(self):
+        self.make_pool(participants=25)
+        for i, user in enumerate(self.users):
+            Participation.objects.filter(pool=self.pool, user=user).update(points=(i * 7) % 5 * 10)
+        self.rows = Participation.objects.filter(pool=self.pool).values('user_id', 'points')
+        self.expected = [
+            row['user_id'] for row in sorted(self.rows, key=lambda row: (-row['points'], row['user_id']))
+        ]
+    
+    def ids(self, page):
+        return [row['user_id'] for row in page]
+    
+    def test_walk_forward_and_back(self):
+        seen, cursor, pages = [], None, []
+        while True:
+            page, cursor, previous = keyset_page(self.rows, 10, cursor=cursor)
+            pages.append((self.ids(page), previous))
+            seen += self.ids(page)
+            if cursor is None:
+                break
+        self.assertEqual(seen, self.expected)
+        self.assertEqual([len(ids) for ids, _ in pages], [10, 10, 5])
+        self.assertIsNone(pages[0][1])
+        
+        # Voltar a partir da última página devolve as mesmas páginas
+        page, next_cursor, previous = keyset_page(self.rows, 10, cursor=pages[2][1])
+        self.assertEqual(self.ids(page), pages[1][0])
+        self.assertIsNotNone(next_cursor)
+        page, _, previous = keyset_page(self.rows, 10, cursor=previous)
+        self.assertEqual(self.ids(page), pages[0][0])
+        self.assertIsNone(previous)
+    
+    def test_anchor_centres_the_row(self):
+        target = self.expected[12]
+        points = Participation.objects.get(pool=self.pool, user_id=target).points
+        page, next_cursor, previous = keyset_page(self.rows, 10, anchor=(points, target))
+        self.assertEqual(self.ids(page), self.expected[7:17])
+        self.assertIsNotNone(next_cursor)
+        self.assertIsNotNone(previous)
+        
+        # Instâncias também servem
+        page, _, _ = keyset_page(Participation.objects.filter(pool=self.pool), 10, anchor=(points, target))
+        self.assertEqual([row.user_id for row in page], self.expected[7:17])
+
+
+class StreamingExportTests(PoolFixtureMixin, TestCase):
+    """Exportações CSV em streaming lidas em blocos de linhas reais"""
+    
+    def setUp(self):
+        self.make_pool(participants=3)
+        for user, points in zip(self.users, [5, 20, 10]):
+            Participation.objects.filter(pool=self.pool, user=user).update(points=points)
+        refresh_leaderboard([self.pool.pk])
+        self.client.force_login(self.owner)
+    
+    def download(self, name, **params):
+        response = self.client.get(reverse(f'pools:{name}', kwargs={'slug': self.pool.slug}), params)
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.streaming)
+        return b''.join(response.streaming_content)
+    
+    def rows(self, content):
+        return list(csv.reader(content.decode('utf-8').splitlines()))
+    
+    def test_ranking_in_chunks(self):
+        with mock.patch.object(exports, 'EXPORT_CHUNK', 2):
+            content = self.download('export_ranking')
+            compressed = self.download('export_ranking', gzip=1)
+        rows = self.rows(content)
+        self.assertEqual(rows[0], exports.RANKING_HEADER)
+        self.assertEqual(
+            [row[:3] for row in rows[1:]],
+            [['1', self.users[1].username, '20'], ['2', self.users[2].username, '10'], ['3', self.users[0].username, '5']]
+        )
+        self.assertEqual(gzip.decompress(compressed), content)
+    
+    def test_bets_matrix_hides_upcoming_matches(self):
+        started = [self.make_match(days=-2), self.make_match(days=-1)]
+        upcoming = self.make_match(days=1)
+        self.make_bets(started[0], [(1, 0), (2, 2)])
+        self.make_bets(upcoming, [(3, 3)])
+        self.finish(started[0], 1, 0)
+        
+        with mock.patch.object(exports, 'MATRIX_CHUNK', 2):
+            rows = self.rows(self.download('export_bets'))
+        self.assertEqual(rows[0], exports.BETS_HEADER)
+        self.assertEqual(len(rows), 1 + len(self.users) * len(started))
+        self.assertNotIn(str(upcoming.pk), {row[1] for row in rows[1:]})
+        by_cell = {(row[0], row[1]): row[5:] for row in rows[1:]}
+        self.assertEqual(by_cell[(self.users[0].username, str(started[0].pk))], ['1 x 0', '1', '0', '0'])
+        self.assertEqual(by_cell[(self.users[2].username, str(started[0].pk))], ['1 x 0', '', '', ''])
+
+
+class GlobalRollupTests(PoolFixtureMixin, TestCase):
+    """Hall da fama: escopos aceitos no cache e estorno de apostas removidas"""
+    
+    def setUp(self):
+        cache.clear()
+        self.make_pool(participants=2)
+        self.pool.championship = Championship.objects.create(
+            name='Brasileirão', season='2026', sport=self.competition.sport,
+            start_date=self.competition.start_date, end_date=self.competition.end_date,
+        )
+        self.pool.save()
+        self.match = self.make_match(days=-1)
+        self.make_bets(self.match, [(1, 0), (0, 0)])
+        score_match(self.finish(self.match, 1, 0))
+        rollup_pending_matches()
+    
+    def scores(self, user):
+        return dict(
+            ((scope, key), (bets, correct, points))
+            for scope, key, bets, correct, points in GlobalScore.objects.filter(user=user).values_list(
+                'scope', 'key', 'bets', 'correct_bets', 'points'
+            )
+        )
+    
+    def test_known_scopes_only(self):
+        data = get_hall_of_fame('season', '2026')
+        self.assertEqual((data['scope'], data['key'], data['seasons']), ('season', '2026', ['2026']))
+        data = get_hall_of_fame('competition', str(self.competition.pk))
+        self.assertEqual(data['scope'], 'competition')
+        for scope, key in (('season', 'x' * 50), ('competition', '999999'), ('bogus', '')):
+            data = get_hall_of_fame(scope, key)
+            self.assertEqual((data['scope'], data['key']), ('overall', ''))
+    
+    def test_rollup_reaches_other_processes(self):
+        # O cache compartilhado fica no banco: outro processo vê a troca de versão do rollup
+        from django.conf import settings
+        self.assertTrue(settings.CACHES['default']['BACKEND'].endswith('DatabaseCache'))
+        table = connection.ops.quote_name(settings.CACHES['default']['LOCATION'])
+        
+        def stored_keys():
+            with connection.cursor() as cursor:
+                cursor.execute(f'SELECT cache_key FROM {table}')
+                return {row[0] for row in cursor.fetchall()}
+        
+        get_hall_of_fame()
+        self.assertIn(':1:hall_of_fame:version', stored_keys())
+        self.finish(self.match, 0, 0)
+        score_match(self.match)
+        rollup_pending_matches()
+        self.assertNotIn(':1:hall_of_fame:version', stored_keys())
+    
+    def test_deleted_bet_leaves_global_scores(self):
+        winner = self.users[0]
+        self.assertEqual(self.scores(winner), {
+            ('overall', ''): (1, 1, 10),
+            ('competition', str(self.competition.pk)): (1, 1, 10),
+            ('season', '2026'): (1, 1, 10),
+        })
+        Bet.objects.get(user=winner, match=self.match).delete()
+        self.assertEqual(set(self.scores(winner).values()), {(0, 0, 0)})
+        # O rollup seguinte não conta a aposta de novo
+        rollup_pending_matches()
+        self.assertEqual(set(self.scores(winner).values()), {(0, 0, 0)})
+    
+    def test_undone_result_leaves_global_scores(self):
+        self.match.finished = False
+        self.match.save()
+        score_match(self.match)
+        rollup_pending_matches()
+        for user in self.users:
+            self.assertEqual(set(self.scores(user).values()), {(0, 0, 0)})
+        self.assertFalse(Bet.objects.filter(rolled_up_points__isnull=False).exists())
+        
+        score_match(self.finish(self.match, 0, 0))
+        rollup_pending_matches()
+        self.assertEqual(self.scores(self.users[1])[('overall', '')], (1, 1, 10))
+        self.assertEqual(self.scores(self.users[0])[('overall', '')], (1, 0, 0))
+
+
+class MatchSyncTests(PoolFixtureMixin, TestCase):
+    """Sincronização dos jogos com a API e das partidas dos bolões a partir deles"""
+    
+    def setUp(self):
+        self.make_pool(participants=0)
+        self.championship = Championship.objects.create(
+            name='Brasileirão', season='2025', sport=self.competition.sport, api_provider='football-data',
+            external_api_id='2013', start_date=timezone.now().date(), end_date=timezone.now().date(),
+        )
+        self.home = Team.objects.create(name='Casa', code='CAS', championship=self.championship, external_api_id='1')
+        self.away = Team.objects.create(name='Fora', code='FOR', championship=self.championship, external_api_id='2')
+        self.kickoff = timezone.now().replace(microsecond=0) - timedelta(days=1)
+        self.service = FootballDataApiService(self.championship)
+    
+    def make_game(self, external_id, home, away):
+        return Game.objects.create(
+            championship=self.championship, round=1, home_team=self.home, away_team=self.away,
+            datetime=self.kickoff, home_score=home, away_score=away, status='finished', finished=True,
+            external_api_id=external_id,
+        )
+    
+    def payload(self, game):
+        return {
+            'id': int(game.external_api_id), 'matchday': 1, 'utcDate': game.datetime.isoformat(), 'status': 'FINISHED',
+            'homeTeam': {'id': 1, 'name': 'Casa', 'tla': 'CAS'},
+            'awayTeam': {'id': 2, 'name': 'Fora', 'tla': 'FOR'},
+            'score': {'fullTime': {'home': game.home_score, 'away': game.away_score}},
+        }
+    
+    def test_refreshes_unfinished_pool_matches_of_unchanged_games(self):
+        games = [self.make_game('10', 2, 1), self.make_game('11', 3, 3)]
+        # Ligada depois do fim do jogo e já sincronizada
+        unfinished = self.make_match(days=-1, related_game=games[0])
+        in_sync = self.make_match(days=-1, related_game=games[1], home_score=3, away_score=3, finished=True)
+        
+        report = self.service.ingest_matches([self.payload(game) for game in games])
+        self.assertEqual(report['games'], {'created': 0, 'changed': 0, 'unchanged': 2})
+        self.assertEqual(report['pool_matches'], 1)
+        for match, state in ((unfinished, (2, 1, True)), (in_sync, (3, 3, True))):
+            match.refresh_from_db()
+            self.assertEqual(match.get_result_state(), state)
+        self.assertEqual(self.service.ingest_matches([self.payload(game) for game in games])['pool_matches'], 0)
+    
+    def test_manual_correction_survives_a_sync(self):
+        game = self.make_game('10', 0, 0)
+        match = self.make_match(days=-1, related_game=game)
+        self.service.ingest_matches([self.payload(game)])
+        # Placar corrigido à mão pelo admin, e o jogo muda de novo na API
+        self.finish(match, 1, 0)
+        game.home_score = 2
+        payload = self.payload(game)
+        
+        report = self.service.ingest_matches([payload])
+        self.assertEqual((report['games']['changed'], report['pool_matches']), (1, 0))
+        match.refresh_from_db()
+        self.assertEqual(match.get_result_state(), (1, 0, True))
+        
+        # Só o --update-results sobrescreve a correção
+        Sport.objects.create(name='Football')
+        self.respond(
+            (200, b'{"id": 2013, "name": "Brasileirao"}', {}), (304, b'', {}),
+            (200, json.dumps({'matches': [payload]}).encode(), {}),
+        )
+        with self.settings(FOOTBALL_API_KEY='chave'):
+            call_command('sync_api_data', '--update-results', stdout=StringIO())
+        match.refresh_from_db()
+        self.assertEqual(match.get_result_state(), (2, 0, True))
+    
+    def test_round_is_looked_up_only_when_the_game_changes(self):
+        game, other = self.make_game('10', 2, 1), self.make_game('11', 0, 0)
+        other.round = 7
+        other.save()
+        match = self.make_match(days=-1, related_game=game)
+        self.assertEqual(match.round, 1)
+        
+        Match.objects.filter(pk=match.pk).update(round=None)
+        match = Match.objects.get(pk=match.pk)
+        with CaptureQueriesContext(connection) as queries:
+            match.save()
+        self.assertFalse([query for query in queries if 'pools_game' in query['sql']])
+        self.assertIsNone(match.round)
+        
+        match.related_game = other
+        match.save()
+        self.assertEqual(match.round, 7)
+    
+    def respond(self, *outcomes):
+        """Cliente da API respondendo em ordem (status, corpo, cabeçalhos) ou exceções"""
+        responses = []
+        for outcome in outcomes:
+            if isinstance(outcome, Exception):
+                responses.append(outcome)
+                continue
+            status, body, headers = outcome
+            response = requests.Response()
+            response.status_code = status
+            response._content = body
+            response.headers.update(headers)
+            responses.append(response)
+        session = ApiClientTests.FakeSession(responses)
+        client = use_client(ApiClient(session=session, retries=0, rate_limited=False))
+        client.__enter__()
+        self.addCleanup(client.__exit__, None, None, None)
+        return session
+    
+    def matches_calls(self, session):
+        return [kwargs for url, kwargs in session.calls if url.endswith('/matches')]
+    
+    def test_incremental_window_and_not_modified(self):
+        empty = (200, b'{"matches": [], "standings": []}', {'ETag': '"v1"'})
+        session = self.respond(empty, empty, empty, empty, (304, b'', {}), empty)
+        
+        # Primeira sincronização: temporada inteira
+        self.assertTrue(self.service.execute_update())
+        first_update = self.championship.last_update
+        self.assertIsNotNone(first_update)
+        
+        # Depois, só a janela desde a última atualização, sem validadores (a consulta mudou)
+        self.assertTrue(self.service.execute_update())
+        window = sync_window(first_update)
+        calls = self.matches_calls(session)
+        self.assertEqual([call['params'] for call in calls], [{}, window])
+        self.assertNotIn('If-None-Match', calls[1]['headers'])
+        self.assertEqual(self.championship.api_validators['matches'], {'params': window, 'etag': '"v1"', 'last_modified': ''})
+        
+        # Mesma janela de novo: envia o ETag e a resposta 304 não é processada
+        self.service.report = None
+        self.assertTrue(self.service.execute_update())
+        self.assertEqual(self.matches_calls(session)[2]['headers']['If-None-Match'], '"v1"')
+        self.assertIsNone(self.service.report)
+        self.assertGreaterEqual(self.championship.last_update, first_update)
+    
+    def test_failed_fetch_keeps_last_update(self):
+        last_update = timezone.now() - timedelta(days=3)
+        self.championship.last_update = last_update
+        self.championship.save()
+        self.respond(
+            (500, b'{}', {}), (200, b'{"standings": []}', {}),
+            requests.ConnectionError('sem rede'),
+        )
+        self.assertFalse(self.service.execute_update())
+        self.assertFalse(self.service.execute_update())
+        self.championship.refresh_from_db()
+        self.assertEqual(self.championship.last_update, last_update)
+    
+    @override_settings(FOOTBALL_API_KEY='chave')
+    def test_sync_command_keeps_last_update_on_failure(self):
+        Sport.objects.create(name='Football')
+        self.respond(
+            (200, b'{"id": 2013, "name": "Brasileirao"}', {}), (200, b'{"teams": []}', {}), (503, b'{}', {}),
+            (200, b'{"id": 2013, "name": "Brasileirao"}', {}), (304, b'', {}), (200, b'{"matches": []}', {}),
+        )
+        call_command('sync_api_data', stdout=StringIO())
+        self.championship.refresh_from_db()
+        self.assertIsNone(self.championship.last_update)
+        
+        call_command('sync_api_data', stdout=StringIO())
+        self.championship.refresh_from_db()
+        self.assertIsNotNone(self.championship.last_update)
+
+
+class SyncSchedulerTests(TransactionTestCase):
+    """Os campeonatos vencidos são sincronizados em paralelo, nas threads do agendador"""
+    
+    class ApiSession:
+        """Responde por URL (seguro entre threads): erro 500 para a competição '500'"""
+        
+        def get(self, url, **kwargs):
+            response = requests.Response()
+            response.status_code = 500 if '/competitions/500/' in url else 200
+            response._content = b'{"matches": [], "standings": []}'
+            return response
+    
+    def setUp(self):
+        client = use_client(ApiClient(session=self.ApiSession(), retries=0, rate_limited=False))
+        client.__enter__()
+        self.addCleanup(client.__exit__, None, None, None)
+        self.now = timezone.now()
+        self.sport = Sport.objects.create(name='Futebol')
+    
+    def championship(self, name, hours_ago=None, auto_update=True, provider='football-data', external_id='2013'):
+        return Championship.objects.create(
+            name=name, season='2025', sport=self.sport, api_provider=provider, external_api_id=external_id,
+            auto_update=auto_update, update_frequency=24,
+            last_update=self.now - timedelta(hours=hours_ago) if hours_ago is not None else None,
+            start_date=self.now.date(), end_date=self.now.date(),
+        )
+    
+    def test_syncs_due_championships_concurrently(self):
+        never = self.championship('Nunca')
+        overdue = self.championship('Atrasado', hours_ago=30)
+        failing = self.championship('Falhando', hours_ago=25, external_id='500')
+        manual = self.championship('Manual', provider='manual')
+        self.championship('Recente', hours_ago=1)
+        self.championship('Desligado', auto_update=False)
+        
+        due = due_championships(self.now)
+        self.assertEqual(due[:2], [overdue, failing])
+        self.assertEqual(set(due), {never, overdue, failing, manual})
+        
+        results = {championship.pk: success for championship, success, report in sync_championships(due, workers=3)}
+        self.assertEqual(results, {never.pk: True, overdue.pk: True, failing.pk: False, manual.pk: None})
+        
+        # Sincronizados saem da fila; a falha continua vencida, com a mesma janela
+        self.assertEqual(set(due_championships()), {failing, manual})
+        failing.refresh_from_db()
+        self.assertEqual(failing.last_update, self.now - timedelta(hours=25))
+        for championship in (never, overdue):
+            championship.refresh_from_db()
+            self.assertGreaterEqual(championship.last_update, self.now)
+    
+    def test_scheduler_command_once(self):
+        self.championship('Nunca')
+        out = StringIO()
+        call_command('run_sync_scheduler', once=True, workers=2, stdout=out)
+        self.assertIn("Championship 'Nunca' updated successfully.", out.getvalue())
+        self.assertEqual(due_championships(), [])
+
+
+class PoolRescoreTests(PoolFixtureMixin, TestCase):
+    """Repontuação do histórico do bolão quando as regras de pontos mudam"""
+    
+    def setUp(self):
+        self.make_pool()
+        for days, predictions, (home, away) in (
+            (-2, [(1, 0), (2, 0), (0, 1)], (1, 0)),
+            (-1, [(2, 2), (1, 1), (0, 1)], (2, 2)),
+        ):
+            match = self.make_match(days=days)
+            for user, (home_bet, away_bet) in zip(self.users, predictions):
+                Bet.objects.create(user=user, match=match, pool=self.pool, home_score_bet=home_bet, away_score_bet=away_bet)
+            score_match(self.finish(match, home, away))
+    
+    def change_rules(self):
+        pool = Pool.objects.get(pk=self.pool.pk)
+        pool.exact_score_points, pool.correct_difference_points, pool.correct_winner_points = 20, 2, 1
+        pool.save()
+        return pool
+    
+    def points(self):
+        return list(Participation.objects.filter(pool=self.pool).order_by('user_id').values_list('points', flat=True))
+    
+    def bet_points(self):
+        return sorted(Bet.objects.filter(pool=self.pool).values_list('points_earned', flat=True))
+    
+    def test_rule_change_queues_rescore(self):
+        pool = Pool.objects.get(pk=self.pool.pk)
+        pool.name = 'Outro nome'
+        pool.save()
+        self.assertFalse(PoolRescore.objects.exists())
+        self.change_rules()
+        self.assertEqual(list(PoolRescore.objects.values_list('pool_id', 'status')), [(self.pool.pk, 'pending')])
+    
+    def test_pending_rescore(self):
+        self.assertEqual(self.points(), [20, 6, 0])
+        self.change_rules()
+        call_command('rescore_pool', pending=True, stdout=StringIO())
+        self.assertEqual(self.points(), [40, 2, 0])
+        self.assertEqual(self.bet_points(), [0, 0, 1, 1, 20, 20])
+        self.assertEqual(PoolRescore.objects.get().status, 'done')
+        self.assertEqual(reconcile_participation_points(self.pool, dry_run=True), [])
+    
+    def test_interrupted_run_resumes_from_checkpoint(self):
+        pool = self.change_rules()
+        rescore = PoolRescore.objects.get()
+        chunks = rescore_pool(pool, rescore=rescore, chunk_size=2)
+        next(chunks)
+        chunks.close()
+        rescore.refresh_from_db()
+        self.assertEqual((rescore.status, rescore.bets_processed), ('running', 2))
+        
+        out = StringIO()
+        call_command('rescore_pool', self.pool.slug, chunk_size=2, stdout=out)
+        self.assertIn(f'Resuming rescore', out.getvalue())
+        rescore.refresh_from_db()
+        self.assertEqual((rescore.status, rescore.bets_processed), ('done', 6))
+        self.assertEqual(self.points(), [40, 2, 0])
+        self.assertEqual(reconcile_participation_points(self.pool, dry_run=True), [])
+    
+    def test_dry_run_writes_nothing(self):
+        self.change_rules()
+        out = StringIO()
+        with CaptureQueriesContext(connection) as queries:
+            call_command('rescore_pool', self.pool.slug, dry_run=True, stdout=out)
+        self.assertIn('Bets that would change: 4', out.getvalue())
+        self.assertIn('Participants whose points would change: 2', out.getvalue())
+        self.assertIn('Participants whose rank would change: 0', out.getvalue())
+        writes = [query['sql'] for query in queries if query['sql'].startswith(('UPDATE', 'INSERT', 'DELETE'))]
+        self.assertEqual(writes, [])
+        self.assertEqual(self.points(), [20, 6, 0])
+        self.assertEqual(PoolRescore.objects.get().last_bet_id, 0)
+    
+    def test_fix_relationships_rescores_pools(self):
+        # Regras alteradas sem passar pelo save: os pontos ficaram desatualizados
+        Pool.objects.filter(pk=self.pool.pk).update(exact_score_points=20, correct_difference_points=2, correct_winner_points=1)
+        call_command('fix_relationships', stdout=StringIO())
+        self.assertEqual(self.points(), [40, 2, 0])
+        self.assertEqual(self.bet_points(), [0, 0, 1, 1, 20, 20])
+    
+    def test_deferred_pools_load(self):
+        self.assertEqual([pool.name for pool in Pool.objects.only('name')], ['Bolão'])
+        pool = Pool.objects.only('name').get()
+        pool.name = 'Renomeado'
+        pool.save()
+        self.assertFalse(PoolRescore.objects.exists())
+        pool.exact_score_points = 20
+        pool.save()
+        self.assertFalse(PoolRescore.objects.exists())
+
+
+class CompareParticipantsTests(PoolFixtureMixin, TestCase):
+    """Comparação direta: acesso, participantes inválidos e cache por versão dos resultados"""
+    
+    def setUp(self):
+        cache.clear()
+        self.make_pool(participants=3)
+        self.match = self.make_match(days=-1)
+        self.make_bets(self.match, [(1, 0), (0, 0), (2, 1)])
+        self.url = reverse('pools:compare_participants', kwargs={'slug': self.pool.slug})
+        self.client.force_login(self.users[0])
+    
+    def compare(self, **params):
+        return self.client.get(self.url, params)
+    
+    def test_private_pool_needs_membership(self):
+        self.pool.visibility = 'private'
+        self.pool.save()
+        self.assertEqual(self.compare(b=self.users[1].pk).status_code, 200)
+        outsider = User.objects.create_user(username='intruso', password='testpass123')
+        self.client.force_login(outsider)
+        response = self.compare(a=self.users[0].pk, b=self.users[1].pk)
+        self.assertEqual(response.status_code, 403)
+        self.assertNotIn('summary', response.json())
+    
+    def test_bad_participants(self):
+        self.assertEqual(self.compare().status_code, 400)
+        self.assertEqual(self.compare(b='x').status_code, 400)
+        self.assertEqual(self.compare(b=999999).status_code, 404)
+        outsider = User.objects.create_user(username='intruso', password='testpass123')
+        self.assertEqual(self.compare(b=outsider.pk).status_code, 404)
+    
+    def test_new_results_invalidate_the_cached_matrix(self):
+        data = self.compare(b=self.users[1].pk).json()
+        self.assertEqual(data['summary']['common_matches'], 0)
+        self.assertEqual((data['a']['user'], data['b']['user']), (self.users[0].username, self.users[1].username))
+        
+        score_match(self.finish(self.match, 1, 0))
+        summary = self.compare(b=self.users[1].pk).json()['summary']
+        self.assertEqual((summary['common_matches'], summary['points_a'], summary['points_b']), (1, 10, 0))
+        self.assertEqual(summary['wins_a'], 1)
+
+
+class RankingSnapshotTests(PoolFixtureMixin, TestCase):
+    """Snapshots do ranking por rodada completa e a movimentação lida deles"""
+    
+    def setUp(self):
+        self.make_pool()
+        self.first, self.second = self.make_match(days=-3, round=1), self.make_match(days=-2, round=1)
+        self.third = self.make_match(days=-1, round=2)
+        self.make_bets(self.first, [(1, 0), (2, 0), (0, 1)])
+        self.make_bets(self.second, [(0, 3), (2, 2), (0, 3)])
+        self.make_bets(self.third, [(0, 2), (0, 3), (0, 1)])
+    
+    def snapshots(self):
+        """{rodada: {participante: (posição, pontos)}}"""
+        users = {user.pk: index for index, user in enumerate(self.users)}
+        return {
+            snapshot.round: {users[user_id]: value for user_id, value in snapshot.positions().items()}
+            for snapshot in RankingSnapshot.objects.filter(pool=self.pool)
+        }
+    
+    def play_both_rounds(self):
+        score_match(self.finish(self.first, 1, 0))
+        score_match(self.finish(self.second, 1, 1))
+        score_match(self.finish(self.third, 0, 3))
+    
+    def test_snapshot_is_built_when_a_round_completes(self):
+        score_match(self.finish(self.first, 1, 0))
+        self.assertEqual(self.snapshots(), {})
+        score_match(self.finish(self.second, 1, 1))
+        self.assertEqual(self.snapshots(), {1: {0: (1, 10), 1: (2, 6), 2: (3, 0)}})
+        
+        score_match(self.finish(self.third, 0, 3))
+        self.assertEqual(self.snapshots()[2], {0: (2, 13), 1: (1, 16), 2: (3, 3)})
+        # Rodada reaberta: o snapshot sai
+        self.second.finished = False
+        self.second.save()
+        score_match(self.second)
+        self.assertEqual(list(self.snapshots()), [2])
+    
+    def test_result_correction_rebuilds_later_snapshots(self):
+        self.play_both_rounds()
+        score_match(self.finish(self.first, 2, 0))
+        expected = {1: {0: (2, 3), 1: (1, 13), 2: (3, 0)}, 2: {0: (2, 6), 1: (1, 23), 2: (3, 3)}}
+        self.assertEqual(self.snapshots(), expected)
+        # Reconstruir do zero dá o mesmo resultado
+        RankingSnapshot.objects.all().delete()
+        self.assertEqual(refresh_snapshots([self.pool.pk]), 2)
+        self.assertEqual(self.snapshots(), expected)
+    
+    def test_round_movements(self):
+        self.play_both_rounds()
+        user_ids = [user.pk for user in self.users]
+        self.assertEqual(round_movements(self.pool, 1, user_ids), (None, {}))
+        movement_round, previous = round_movements(self.pool, 2, user_ids)
+        self.assertEqual(movement_round, 1)
+        ranks = dict(Participation.objects.filter(pool=self.pool).values_list('user_id', 'rank'))
+        # Primeiro caiu uma posição, o segundo subiu uma, o terceiro ficou onde estava
+        self.assertEqual([previous[user_id][0] - ranks[user_id] for user_id in user_ids], [-1, 1, 0])
+        self.assertEqual(round_movements(self.pool, 2, user_ids[:1]), (1, {user_ids[0]: (1, 10)}))
+        
+        self.client.force_login(self.users[0])
+        response = self.client.get(reverse('pools:ranking', kwargs={'slug': self.pool.slug}))
+        self.assertEqual(response.context['movement_round'], 1)
+        self.assertEqual(
+            {participant.user_id: participant.round_movement for participant in response.context['participants']},
+            dict(zip(user_ids, [-1, 1, 0])),
+        )
+
+
+class PointsHistoryTests(PoolFixtureMixin, TestCase):
+    """Pontos acumulados por rodada, somados dos buckets de RoundPoints"""
+    
+    def setUp(self):
+        self.make_pool()
+        matches = [self.make_match(days=-3, round=1), self.make_match(days=-2, round=2), self.make_match(days=-1, round=3)]
+        self.make_match(days=1, round=4)
+        self.make_bets(matches[0], [(1, 0), (2, 0), (0, 1)])
+        # O terceiro participante não apostou na rodada 2
+        self.make_bets(matches[1], [(2, 2), (0, 0)], users=self.users[:2])
+        self.make_bets(matches[2], [(0, 1), (1, 0), (0, 2)])
+        for match, (home, away) in zip(matches, [(1, 0), (2, 2), (0, 1)]):
+            score_match(self.finish(match, home, away))
+        self.user_ids = [user.pk for user in self.users]
+    
+    def test_cumulative_round_sums(self):
+        rounds, history = points_history(self.pool, self.user_ids)
+        self.assertEqual(rounds, [1, 2, 3])
+        self.assertEqual([history[user_id] for user_id in self.user_ids], [[10, 20, 30], [3, 6, 6], [0, 0, 3]])
+        
+        buckets = dict(((user_id, round_number), points) for user_id, round_number, points in RoundPoints.objects.filter(
+            pool=self.pool
+        ).values_list('user_id', 'round', 'points'))
+        self.assertNotIn((self.user_ids[2], 2), buckets)
+        for user_id in self.user_ids:
+            total = 0
+            for round_number, cumulative in zip(rounds, history[user_id]):
+                total += buckets.get((user_id, round_number), 0)
+                self.assertEqual(cumulative, total)
+    
+    def test_ranking_history_view(self):
+        url = reverse('pools:ranking_history', kwargs={'slug': self.pool.slug})
+        self.client.force_login(self.users[1])
+        outsider = User.objects.create_user(username='intruso', password='testpass123')
+        
+        data = self.client.get(url, {'user': [self.user_ids[0], self.user_ids[2], outsider.pk]}).json()
+        self.assertEqual((data['rounds'], data['labels']), ([1, 2, 3], ['R1', 'R2', 'R3']))
+        self.assertEqual(
+            [(row['user_id'], row['points']) for row in data['participants']],
+            [(self.user_ids[0], [10, 20, 30]), (self.user_ids[2], [0, 0, 3])],
+        )
+        # Sem ?user, o usuário atual
+        self.assertEqual(self.client.get(url).json()['participants'][0]['points'], [3, 6, 6])
+        self.assertEqual(self.client.get(url, {'user': 'x'}).status_code, 400)
+
+
+class WindowRankingTests(PoolFixtureMixin, TestCase):
+    """Ranking de um intervalo de rodadas ou das últimas semanas, somado dos buckets"""
+    
+    def setUp(self):
+        self.make_pool()
+        # Rodada 9 há um ano e meio, rodadas 10 a 15 nas últimas semanas, rodada 16 ainda por jogar
+        schedule = [(9, -550)] + [(round_number, 7 * (round_number - 16)) for round_number in range(10, 16)]
+        for round_number, days in schedule:
+            match = self.make_match(days=days, round=round_number)
+            self.make_bets(match, [(1, 0), (2, 0), (0, 1)] if round_number % 2 else [(0, 1), (0, 1), (1, 0)])
+            score_match(self.finish(match, 1, 0))
+        self.make_match(days=7, round=16)
+    
+    def ranking(self, **window):
+        return [(row['user'], row['points'], row['position']) for row in window_ranking(self.pool, **window)]
+    
+    def test_round_range(self):
+        # Rodadas 10 a 15: três ímpares (10, 3, 0 pontos) e três pares (0, 0, 10)
+        first, second, third = self.users
+        self.assertEqual(self.ranking(rounds=(10, 15)), [(first, 30, 1), (third, 30, 1), (second, 9, 3)])
+        self.assertEqual(self.ranking(rounds=(9, 9)), [(first, 10, 1), (second, 3, 2)])
+        self.assertEqual(self.ranking(rounds=(10, 15), limit=1), [(first, 30, 1)])
+        self.assertEqual(self.ranking(rounds=(16, 20)), [])
+    
+    def test_week_window(self):
+        first, second, third = self.users
+        self.assertEqual(self.ranking(weeks=last_weeks(1)), [])
+        self.assertEqual(self.ranking(weeks=last_weeks(2)), [(first, 10, 1), (second, 3, 2)])
+        # A rodada 9 fica fora mesmo da janela máxima de 52 semanas
+        self.assertEqual(self.ranking(weeks=last_weeks(52)), self.ranking(rounds=(10, 15)))
+        self.assertEqual(self.ranking(weeks=last_weeks(100))[0], (first, 40, 1))
+    
+    def test_ranking_window_params(self):
+        self.assertEqual(ranking_window({}), (1, None))
+        self.assertEqual(ranking_window({'rounds': '10-15', 'weeks': '4'}), (4, (10, 15)))
+        self.assertEqual(ranking_window({'rounds': '15-10'}), (1, (10, 15)))
+        self.assertEqual(ranking_window({'rounds': '12'}), (1, (12, 12)))
+        # Intervalo inválido: volta ao ranking semanal, sem perder ?weeks
+        self.assertEqual(ranking_window({'rounds': '10-x', 'weeks': '3'}), (3, None))
+        self.assertEqual(ranking_window({'rounds': '-5'}), (1, None))
+        self.assertEqual(ranking_window({'weeks': '500'}), (52, None))
+        self.assertEqual(ranking_window({'weeks': '0'}), (1, None))
+        self.assertEqual(ranking_window({'weeks': 'x', 'rounds': '10-15'}), (1, (10, 15)))
@@ -33,6 +33,13 @@ urlpatterns = [
     
     # Seção de Ranking - Melhorada
     path('<slug:slug>/ranking/', views.pool_ranking, name='ranking'),  # Ranking geral
+    path('<slug:slug>/ranking/odds/', views.ranking_odds, name='ranking_odds'),  # Chances de título (JSON)
+    path('<slug:slug>/ranking/live/', views.live_ranking, name='ranking_live'),  # Ranking provisório ao vivo (JSON)
+    path('<slug:slug>/ranking/history/', views.ranking_history, name='ranking_history'),  # Pontos acumulados por rodada (JSON)
+    path('<slug:slug>/ranking/api/', views.ranking_api, name='ranking_api'),  # Ranking paginado por cursor (JSON)
+    path('<slug:slug>/ranking/compare/', views.compare_participants, name='compare_participants'),  # Comparação direta (JSON)
+    path('<slug:slug>/ranking/export/', views.export_ranking, name='export_ranking'),  # Exportar CSV
+    path('<slug:slug>/bets/export/', views.export_bets, name='export_bets'),  # Exportar matriz de apostas (CSV)
     
     # Apostas
     path('<slug:slug>/apostas/', views.BetListView.as_view(), name='bet_list'),
@@ -6,14 +6,20 @@ from django.views.generic import ListView, CreateView, DetailView, UpdateView, D
 from django.contrib import messages
 from django.utils import timezone
 from django.db.models import Q, Count, Sum, F, Case, When, Value, Avg
-from django.http import HttpResponseRedirect, HttpResponse, JsonResponse
+from django.http import HttpResponseRedirect, HttpResponse, JsonResponse, StreamingHttpResponse
 import logging
-import csv
 from datetime import timedelta
 
-from .models import Pool, Participation, Bet, Match, Sport
+from .models import Pool, Participation, Bet, Match, Sport, PredictionCount
 from .forms import PoolForm, PoolJoinForm, BetForm, PoolWizardStepOneForm, PoolWizardStepTwoForm, PoolWizardStepThreeForm
 from .mixins import PoolOwnerRequiredMixin, PoolUserAccessMixin
+from .projections import get_race_status
+from .live import get_live_ranking
+from .leaderboard import user_positions, keyset_page, round_movements
+from .exports import csv_lines, gzip_stream, ranking_rows, bets_matrix_rows, RANKING_HEADER, BETS_HEADER
+from .history import points_history, round_label, last_weeks, window_ranking
+from .headtohead import get_bet_matrix, head_to_head
+from .simulation import get_title_odds
 from pools.models import Invitation
 from pools.forms import InvitationForm
 from django.db import IntegrityError
@@ -25,6 +31,35 @@ User = get_user_model()
 
 logger = logging.getLogger(__name__)
 
+# Máximo de participantes por consulta ao histórico de pontos
+HISTORY_MAX_USERS = 20
+
+# Janela máxima do ranking semanal (?weeks=), em semanas
+WEEKLY_RANKING_MAX_WEEKS = 52
+
+# API de ranking paginada: campo público -> coluna de Participation
+RANKING_API_FIELDS = {
+    'rank': 'rank',
+    'user_id': 'user_id',
+    'user': 'user__username',
+    'points': 'points',
+    'last_movement': 'last_movement',
+    'total_bets': 'total_bets',
+    'finished_bets': 'finished_bets',
+    'correct_bets': 'correct_bets',
+    'accuracy': 'accuracy',
+    'avg_points': 'avg_points',
+    'current_streak': 'current_streak',
+    'longest_streak': 'longest_streak',
+    'trend': 'trend',
+}
+RANKING_API_DEFAULT_FIELDS = ('rank', 'user', 'points')
+RANKING_API_DEFAULT_LIMIT = 50
+RANKING_API_MAX_LIMIT = 200
+
+# Linhas por página da tabela de ranking
+RANKING_PAGE_SIZE = 100
+
 
 class DashboardView(LoginRequiredMixin, TemplateView):
     template_name = 'pools/dashboard.html'
@@ -66,36 +101,13 @@ class DashboardView(LoginRequiredMixin, TemplateView):
             total_points = 0
             hit_rate = 0
         
-        # Rankings nos bolões
-        pool_rankings = []
-        for participation in active_pools:
-            pool = participation.pool
-            # Calcular ranking do usuário neste bolão
-            user_points = Bet.objects.filter(
-                user=user,
-                pool=pool,
-                match__finished=True
-            ).aggregate(Sum('points_earned'))['points_earned__sum'] or 0
-            
-            # Total de participantes
-            participants = pool.participation_set.count()
-            
-            # Posição do usuário
-            better_users = Bet.objects.filter(
-                pool=pool,
-                match__finished=True
-            ).values('user').annotate(
-                total=Sum('points_earned')
-            ).filter(total__gt=user_points).count()
-            
-            position = better_users + 1
-            
-            pool_rankings.append({
-                'pool': pool,
-                'position': position,
-                'total_participants': participants,
-                'points': user_points
-            })
+        # Posição em todos os bolões de uma vez (leaderboard materializado, busca pelo índice)
+        positions = user_positions(user, [p.pool_id for p in active_pools], around=1)
+        pool_rankings = [
+            {'pool': participation.pool, **positions[participation.pool_id]}
+            for participation in active_pools
+            if participation.pool_id in positions
+        ]
         
         context.update({
             'active_pools': active_pools,
@@ -478,21 +490,8 @@ class PoolDetailView(DetailView):
         # Informações básicas do bolão
         context['is_owner'] = pool.owner == user
         
-        # Buscar participações com ranking ordenado por pontos
-        participations = pool.participation_set.all().select_related('user').annotate(
-            total_bets=Count('user__bet', filter=Q(user__bet__match__pool=pool)),
-            accuracy=Case(
-                When(total_bets=0, then=Value(0)),
-                default=(Count('user__bet', filter=Q(
-                    user__bet__match__pool=pool,
-                    user__bet__match__finished=True,
-                    user__bet__points_earned__gt=0
-                )) * 100.0 / Count('user__bet', filter=Q(
-                    user__bet__match__pool=pool,
-                    user__bet__match__finished=True
-                )))
-            )
-        ).order_by('-points')
+        # Leaderboard materializado, já ordenado por posição
+        participations = pool.participation_set.all().select_related('user').order_by('rank', 'id')
         context['participants'] = participations
         context['participants_count'] = participations.count()
         
@@ -503,7 +502,7 @@ class PoolDetailView(DetailView):
                 user_participation = participations.get(user=user)
                 context['is_participant'] = True
                 context['user_participation'] = user_participation
-                context['user_position'] = list(participations).index(user_participation) + 1
+                context['user_position'] = user_participation.rank
             except Participation.DoesNotExist:
                 context['is_participant'] = False
         
@@ -516,6 +515,9 @@ class PoolDetailView(DetailView):
         ).select_related('home_team', 'away_team').order_by('start_time')[:10]
         context['upcoming_matches'] = upcoming_matches
         
+        # Distribuição dos palpites do bolão (histograma mantido por PredictionCount)
+        context['crowd_predictions'] = PredictionCount.summaries([match.id for match in upcoming_matches])
+        
         # Apostas do usuário (todas)
         if user.is_authenticated and context['is_participant']:
             user_bets = Bet.objects.filter(
@@ -542,21 +544,12 @@ class PoolDetailView(DetailView):
         
         # Estatísticas do usuário (se participante)
         if user_participation:
-            user_bets_total = Bet.objects.filter(user=user, match__pool=pool).count()
-            user_finished_bets = Bet.objects.filter(
-                user=user, 
-                match__pool=pool, 
-                match__finished=True
-            )
-            user_correct_bets = user_finished_bets.filter(points_earned__gt=0).count()
-            finished_bets_count = user_finished_bets.count()
-            
             context['user_stats'] = {
-                'total_bets': user_bets_total,
-                'correct_bets': user_correct_bets,
-                'accuracy_rate': (user_correct_bets / finished_bets_count * 100) if finished_bets_count > 0 else 0,
+                'total_bets': user_participation.total_bets,
+                'correct_bets': user_participation.correct_bets,
+                'accuracy_rate': user_participation.accuracy,
                 'total_points': user_participation.points,
-                'average_points': user_participation.points / finished_bets_count if finished_bets_count > 0 else 0
+                'average_points': user_participation.avg_points
             }
         
         # Top 3 para destaque
@@ -564,9 +557,9 @@ class PoolDetailView(DetailView):
         
         # Ranking completo com posições
         ranking_data = []
-        for idx, participation in enumerate(participations):
+        for participation in participations:
             ranking_data.append({
-                'position': idx + 1,
+                'position': participation.rank,
                 'participation': participation,
                 'is_current_user': participation.user == user
             })
@@ -975,96 +968,15 @@ def bet_match(request, slug, match_id):  # <-- Alterado de pool_id para slug
         'form': form,
         'existing_bet': existing_bet,
         'is_deadline_close': is_deadline_close,
+        'crowd': match.get_crowd_prediction(),
     }
     
     return render(request, 'pools/bet_form.html', context)
 
 def calculate_bet_points(bet):
     """Calcula os pontos ganhos por uma aposta após o resultado da partida"""
-    
-    match = bet.match
-    
-    # Verificar se a partida foi finalizada e tem resultado
-    if not match.finished or match.home_score is None or match.away_score is None:
-        return 0
-    
-    # Resultados reais
-    real_home_score = match.home_score
-    real_away_score = match.away_score
-    
-    # Apostas do usuário
-    bet_home_score = bet.home_score_bet
-    bet_away_score = bet.away_score_bet
-    
-    # Acertou placar exato (10 pontos)
-    if bet_home_score == real_home_score and bet_away_score == real_away_score:
-        return 10
-    
-    # Para empates, regra especial
-    if real_home_score == real_away_score and bet_home_score == bet_away_score:
-        # Se ambos são empates mas com placares diferentes, é 3 pontos
-        if real_home_score != bet_home_score:
-            return 3
-    
-    # Acertou o vencedor e o saldo de gols (5 pontos)
-    real_diff = real_home_score - real_away_score
-    bet_diff = bet_home_score - bet_away_score
-    
-    if (real_diff == bet_diff) and (
-        (real_home_score > real_away_score and bet_home_score > bet_away_score) or
-        (real_home_score < real_away_score and bet_home_score < bet_away_score)
-    ):
-        return 5
-    
-    # Acertou apenas o vencedor (3 pontos)
-    if (real_home_score > real_away_score and bet_home_score > bet_away_score) or \
-       (real_home_score < real_away_score and bet_home_score < bet_away_score) or \
-       (real_home_score == real_away_score and bet_home_score == bet_away_score):
-        return 3
-    
-    # Não acertou nada (0 pontos)
-    return 0
-
-def calculate_user_streak(user, pool):
-    """Calcula a sequência atual de acertos do usuário"""
-    recent_bets = Bet.objects.filter(
-        user=user,
-        pool=pool,
-        match__finished=True
-    ).order_by('-match__start_time')[:10]  # Últimas 10 apostas
-    
-    streak = 0
-    for bet in recent_bets:
-        if bet.points_earned > 0:
-            streak += 1
-        else:
-            break
-    
-    return streak
-
-def calculate_user_trend(user, pool):
-    """Calcula a tendência do usuário (alta, baixa, estável)"""
-    recent_bets = Bet.objects.filter(
-        user=user,
-        pool=pool,
-        match__finished=True
-    ).order_by('-match__start_time')[:6]  # Últimas 6 apostas
-    
-    if len(recent_bets) < 3:
-        return 'stable'
-    
-    first_half = recent_bets[3:]  # 3 mais antigas
-    second_half = recent_bets[:3]  # 3 mais recentes
-    
-    first_half_avg = sum(bet.points_earned for bet in first_half) / len(first_half)
-    second_half_avg = sum(bet.points_earned for bet in second_half) / len(second_half)
-    
-    if second_half_avg > first_half_avg * 1.2:
-        return 'up'
-    elif second_half_avg < first_half_avg * 0.8:
-        return 'down'
-    else:
-        return 'stable'
+    # Mesma engine de pontuação usada em pools.scoring (regras do bolão)
+    return bet.calculate_points()
 
 def pool_ranking(request, slug):
     """Exibe o ranking geral de participantes do bolão com análise avançada"""
@@ -1075,72 +987,72 @@ def pool_ranking(request, slug):
         messages.error(request, "Você não tem acesso a este bolão.")
         return redirect('pools:discover')
     
-    # Busca todos os participantes com estatísticas detalhadas
-    participants = Participation.objects.filter(pool=pool).select_related('user').annotate(
-        total_bets=Count('user__bet', filter=Q(user__bet__match__pool=pool)),
-        correct_bets=Count('user__bet', filter=Q(
-            user__bet__match__pool=pool,
-            user__bet__match__finished=True,
-            user__bet__points_earned__gt=0
-        )),
-        total_finished_bets=Count('user__bet', filter=Q(
-            user__bet__match__pool=pool,
-            user__bet__match__finished=True
-        )),
-        accuracy=Case(
-            When(total_finished_bets=0, then=Value(0)),
-            default=(F('correct_bets') * 100.0 / F('total_finished_bets'))
-        ),
-        avg_points=Avg('user__bet__points_earned', filter=Q(
-            user__bet__match__pool=pool,
-            user__bet__match__finished=True
-        ))
-    ).order_by('-points')
+    # Leaderboard materializado: posição, acertos, aproveitamento e média já calculados
+    leaderboard = Participation.objects.filter(pool=pool).select_related('user', 'user__profile')
+    
+    # Top 5 (pódio e gráfico) e a página atual da tabela, paginada por cursor
+    top_participants = list(leaderboard.order_by('-points', 'user_id')[:5])
+    cursor, anchor = request.GET.get('cursor'), None
+    if cursor == 'me':
+        cursor = None
+        if request.user.is_authenticated:
+            anchor = leaderboard.filter(user=request.user).values_list('points', 'user_id').first()
+    try:
+        participants, next_cursor, previous_cursor = keyset_page(leaderboard, RANKING_PAGE_SIZE, cursor=cursor, anchor=anchor)
+    except ValueError:
+        participants, next_cursor, previous_cursor = keyset_page(leaderboard, RANKING_PAGE_SIZE)
     
     # Calcular estatísticas especiais
-    best_performer = participants.first()
-    highest_accuracy = participants.order_by('-accuracy').first()
-    total_points = participants.aggregate(total=Sum('points'))['total'] or 0
+    total_participants = leaderboard.count()
+    best_performer = top_participants[0] if top_participants else None
+    highest_accuracy = leaderboard.order_by('-accuracy').first()
+    total_points = leaderboard.aggregate(total=Sum('points'))['total'] or 0
     
-    # Calcular sequências e tendências
-    for participant in participants:
-        participant.streak = calculate_user_streak(participant.user, pool)
-        participant.trend = calculate_user_trend(participant.user, pool)
+    # Pontuação máxima possível, campeão garantido e eliminados (cache por resultado)
+    race = get_race_status(pool)
     
-    # Top participantes para o gráfico (máximo 5)
-    top_participants = list(participants[:5])
+    # Ranking provisório com os placares dos jogos em andamento (cache curto, nada é gravado)
+    live = get_live_ranking(pool)
     
-    # Dados para gráfico de evolução
-    matches = Match.objects.filter(pool=pool, finished=True).order_by('start_time')
-    round_labels = [f"R{i+1}" for i in range(len(matches))]
+    for participant in participants + top_participants:
+        participant.race = race['participants'].get(participant.user_id, {})
+        participant.live = live['participants'].get(participant.user_id) if live else None
     
-    # Calcular histórico de pontos por rodada para cada participante
+    # Dados para gráfico de evolução: pontos acumulados por rodada (uma leitura do histórico)
+    rounds, history = points_history(pool, [participant.user_id for participant in top_participants])
+    round_labels = [round_label(round_number) for round_number in rounds]
     for participant in top_participants:
-        points_history = []
-        cumulative_points = 0
-        
-        for match in matches:
-            try:
-                bet = Bet.objects.get(user=participant.user, match=match, pool=pool)
-                cumulative_points += bet.points_earned
-            except Bet.DoesNotExist:
-                pass
-            points_history.append(cumulative_points)
-        
-        participant.points_history = points_history
+        participant.points_history = history[participant.user_id]
     
-    # Calcular sequência mais longa
-    longest_streak = {'streak': 0, 'user': None}
-    for participant in participants:
-        if participant.streak > longest_streak['streak']:
-            longest_streak = {'streak': participant.streak, 'user': participant.user}
+    # Maior sequência de acertos (calculada junto com o leaderboard)
+    longest = leaderboard.filter(longest_streak__gt=0).order_by('-longest_streak', 'rank').first()
+    longest_streak = {'streak': longest.longest_streak, 'user': longest.user} if longest else {'streak': 0, 'user': None}
     
     # Opções de rodadas para filtro
-    round_options = list(range(1, len(matches) + 1))
+    round_options = [round_number for round_number in rounds if round_number]
+    
+    # Movimentação desde N rodadas atrás (?since=N), lida do snapshot da rodada
+    try:
+        rounds_ago = max(int(request.GET.get('since', 1)), 1)
+    except ValueError:
+        rounds_ago = 1
+    movement_round, previous_positions = (None, {})
+    if round_options:
+        movement_round, previous_positions = round_movements(
+            pool, round_options[-1], [participant.user_id for participant in participants], rounds_ago
+        )
+    for participant in participants:
+        previous = previous_positions.get(participant.user_id)
+        participant.previous_position = previous[0] if previous else None
+        participant.round_movement = previous[0] - participant.rank if previous else None
     
     context = {
         'pool': pool,
         'participants': participants,
+        'podium': top_participants[:3],
+        'total_participants': total_participants,
+        'next_cursor': next_cursor,
+        'previous_cursor': previous_cursor,
         'is_owner': request.user == pool.owner,
         'is_participant': Participation.objects.filter(pool=pool, user=request.user).exists() if request.user.is_authenticated else False,
         'active_tab': 'ranking',
@@ -1151,11 +1063,14 @@ def pool_ranking(request, slug):
         'highest_accuracy': highest_accuracy,
         'longest_streak': longest_streak,
         'total_points': total_points,
+        'remaining_matches': race['remaining_matches'],
+        'live_matches': live['matches'] if live else [],
         
         # Dados para gráfico
         'top_participants': top_participants,
         'round_labels': round_labels,
         'round_options': round_options,
+        'movement_round': movement_round,
     }
     
     # Se for uma requisição AJAX, retorna apenas os dados
@@ -1167,89 +1082,265 @@ def pool_ranking(request, slug):
                     'points': p.points,
                     'accuracy': float(p.accuracy or 0),
                     'total_bets': p.total_bets,
-                    'streak': p.streak,
+                    'streak': p.current_streak,
+                    'longest_streak': p.longest_streak,
                     'trend': p.trend,
+                    'max_points': p.race.get('max_points'),
+                    'clinched': p.race.get('clinched', False),
+                    'eliminated': p.race.get('eliminated', False),
+                    'live': p.live,
+                    'previous_position': p.previous_position,
+                    'round_movement': p.round_movement,
                 }
                 for p in participants
             ],
+            'movement_round': movement_round,
+            'next': next_cursor,
+            'previous': previous_cursor,
             'updated': True
         })
     
     return render(request, 'pools/pool_ranking.html', context)
 
-@login_required
-def weekly_ranking(request, slug):
-    """Exibe o ranking com base nas apostas da última semana"""
+def live_ranking(request, slug):
+    """Ranking provisório ("se terminasse agora") durante os jogos em andamento, em JSON"""
     pool = get_object_or_404(Pool, slug=slug)
-    one_week_ago = timezone.now() - timedelta(days=7)
     
-    # Busca apostas da semana
-    weekly_bets = Bet.objects.filter(
-        pool=pool,
-        created_at__gte=one_week_ago
-    ).values('user').annotate(
-        weekly_points=Sum('points_earned')
-    ).order_by('-weekly_points')
-    
-    # Busca informações completas dos usuários
-    users_dict = {}
-    for bet in weekly_bets:
-        if bet['user'] not in users_dict:
-            user = User.objects.get(id=bet['user'])
-            users_dict[bet['user']] = {
-                'user': user,
-                'weekly_points': bet['weekly_points'],
-                'profile_pic': user.profile.profile_pic if hasattr(user, 'profile') else None
-            }
+    if pool.visibility == 'private' and request.user not in pool.participants.all() and request.user != pool.owner:
+        return JsonResponse({'error': 'Você não tem acesso a este bolão.'}, status=403)
+    
+    live = get_live_ranking(pool)
+    if not live:
+        return JsonResponse({'live': False, 'matches': [], 'participants': []})
+    
+    usernames = dict(get_user_model().objects.filter(id__in=live['participants']).values_list('id', 'username'))
+    return JsonResponse({
+        'live': True,
+        'updated_at': live['updated_at'],
+        'matches': live['matches'],
+        'participants': sorted(
+            [
+                {'user_id': user_id, 'user': usernames.get(user_id), **row}
+                for user_id, row in live['participants'].items()
+            ],
+            key=lambda row: (row['position'], row['user'] or '')
+        ),
+    })
+
+def ranking_api(request, slug):
+    """
+    Ranking paginado por cursor, em JSON.
+    
+    ?limit=N (máx. RANKING_API_MAX_LIMIT), ?fields=rank,user,points (campos
+    esparsos, ver RANKING_API_FIELDS), ?cursor=<next/previous da página
+    anterior> ou ?cursor=me para a página com a linha do usuário logado.
+    """
+    pool = get_object_or_404(Pool, slug=slug)
+    
+    if pool.visibility == 'private' and request.user not in pool.participants.all() and request.user != pool.owner:
+        return JsonResponse({'error': 'Você não tem acesso a este bolão.'}, status=403)
     
-    # Converte para lista e adiciona posição no ranking
-    weekly_ranking = list(users_dict.values())
-    for i, item in enumerate(weekly_ranking):
-        item['position'] = i + 1
+    try:
+        limit = max(1, min(int(request.GET.get('limit', RANKING_API_DEFAULT_LIMIT)), RANKING_API_MAX_LIMIT))
+    except ValueError:
+        limit = RANKING_API_DEFAULT_LIMIT
+    
+    fields = [field for field in request.GET.get('fields', '').split(',') if field in RANKING_API_FIELDS]
+    fields = fields or list(RANKING_API_DEFAULT_FIELDS)
+    columns = {RANKING_API_FIELDS[field] for field in fields} | {'points', 'user_id'}
+    rows = Participation.objects.filter(pool=pool).values(*columns)
+    
+    cursor, anchor = request.GET.get('cursor'), None
+    if cursor == 'me':
+        cursor = None
+        if request.user.is_authenticated:
+            anchor = Participation.objects.filter(pool=pool, user=request.user).values_list('points', 'user_id').first()
+        if anchor is None:
+            return JsonResponse({'error': 'Você não participa deste bolão.'}, status=404)
+    
+    try:
+        page, next_cursor, previous_cursor = keyset_page(rows, limit, cursor=cursor, anchor=anchor)
+    except ValueError:
+        return JsonResponse({'error': 'Cursor inválido.'}, status=400)
+    
+    return JsonResponse({
+        'results': [{field: row[RANKING_API_FIELDS[field]] for field in fields} for row in page],
+        'next': next_cursor,
+        'previous': previous_cursor,
+    })
+
+def ranking_odds(request, slug):
+    """
+    Probabilidades de título e de top 3 (simulação Monte Carlo) em JSON.
+    Só lê as chances pré-calculadas pelo comando refresh_title_odds; stale
+    indica que são de resultados anteriores aos atuais.
+    """
+    pool = get_object_or_404(Pool, slug=slug)
+    
+    if pool.visibility == 'private' and request.user not in pool.participants.all() and request.user != pool.owner:
+        return JsonResponse({'error': 'Você não tem acesso a este bolão.'}, status=403)
+    
+    odds = get_title_odds(pool)
+    if odds is None:
+        return JsonResponse({'error': 'Chances ainda não calculadas. Tente novamente em alguns minutos.'}, status=503)
+    usernames = dict(get_user_model().objects.filter(id__in=odds['participants']).values_list('id', 'username'))
+    points = dict(Participation.objects.filter(pool=pool).values_list('user_id', 'points'))
+    
+    return JsonResponse({
+        'simulations': odds['simulations'],
+        'remaining_matches': odds['remaining_matches'],
+        'stale': odds['results_version'] != pool.results_version,
+        'participants': sorted(
+            [
+                {
+                    'user_id': user_id,
+                    'user': usernames.get(user_id),
+                    'points': points.get(user_id, 0),
+                    'first': round(result['first'], 4),
+                    'top3': round(result['top3'], 4),
+                }
+                for user_id, result in odds['participants'].items()
+            ],
+            key=lambda row: (-row['first'], -row['top3'], -row['points'])
+        ),
+    })
+
+def ranking_history(request, slug):
+    """Pontos acumulados por rodada de qualquer participante (?user=<id>, repetível), em JSON"""
+    pool = get_object_or_404(Pool, slug=slug)
+    
+    if pool.visibility == 'private' and request.user not in pool.participants.all() and request.user != pool.owner:
+        return JsonResponse({'error': 'Você não tem acesso a este bolão.'}, status=403)
+    
+    try:
+        user_ids = [int(user_id) for user_id in request.GET.getlist('user')][:HISTORY_MAX_USERS]
+    except ValueError:
+        return JsonResponse({'error': 'Participante inválido.'}, status=400)
+    if not user_ids and request.user.is_authenticated:
+        user_ids = [request.user.id]
+    
+    usernames = dict(Participation.objects.filter(pool=pool, user_id__in=user_ids).values_list('user_id', 'user__username'))
+    user_ids = [user_id for user_id in user_ids if user_id in usernames]
+    rounds, history = points_history(pool, user_ids)
+    
+    return JsonResponse({
+        'rounds': rounds,
+        'labels': [round_label(round_number) for round_number in rounds],
+        'participants': [
+            {'user_id': user_id, 'user': usernames[user_id], 'points': history[user_id]}
+            for user_id in user_ids
+        ],
+    })
+
+def compare_participants(request, slug):
+    """Comparação direta entre dois participantes (?a=<id>&b=<id>; a padrão: usuário atual), em JSON"""
+    pool = get_object_or_404(Pool, slug=slug)
+    
+    if pool.visibility == 'private' and request.user not in pool.participants.all() and request.user != pool.owner:
+        return JsonResponse({'error': 'Você não tem acesso a este bolão.'}, status=403)
+    
+    try:
+        user_a = int(request.GET.get('a') or request.user.id)
+        user_b = int(request.GET['b'])
+    except (KeyError, TypeError, ValueError):
+        return JsonResponse({'error': 'Informe os dois participantes.'}, status=400)
+    
+    # Matriz de apostas do bolão: carregada uma vez e cacheada por versão dos resultados
+    comparison = head_to_head(get_bet_matrix(pool), user_a, user_b)
+    if comparison is None:
+        return JsonResponse({'error': 'Participante não encontrado neste bolão.'}, status=404)
+    
+    usernames = dict(get_user_model().objects.filter(pk__in=[user_a, user_b]).values_list('id', 'username'))
+    return JsonResponse({
+        'a': {'user_id': user_a, 'user': usernames.get(user_a)},
+        'b': {'user_id': user_b, 'user': usernames.get(user_b)},
+        **comparison,
+    })
+
+def ranking_window(params):
+    """
+    Janela do ranking por período: (semanas, rodadas) a partir de ?weeks=N
+    (1 a WEEKLY_RANKING_MAX_WEEKS) e ?rounds=10-15 (intervalo em qualquer
+    ordem, ou uma rodada só); valores inválidos caem no padrão, a última semana
+    """
+    rounds = None
+    try:
+        if params.get('rounds'):
+            first, _, last = params['rounds'].partition('-')
+            first, last = int(first), int(last or first)
+            rounds = (min(first, last), max(first, last))
+    except ValueError:
+        rounds = None
+    try:
+        weeks = min(max(1, int(params.get('weeks', 1))), WEEKLY_RANKING_MAX_WEEKS)
+    except ValueError:
+        weeks = 1
+    return weeks, rounds
+
+@login_required
+def weekly_ranking(request, slug):
+    """
+    Exibe o ranking dos pontos da semana (?weeks=N: últimas N semanas ISO)
+    ou de um intervalo de rodadas (?rounds=10-15), somando os buckets de pontos
+    """
+    pool = get_object_or_404(Pool, slug=slug)
+    weeks, rounds = ranking_window(request.GET)
+    
+    # Pontos por semana do jogo (não da aposta); usuários buscados de uma vez
+    weekly_ranking = [
+        {
+            'user': row['user'],
+            'weekly_points': row['points'],
+            'position': row['position'],
+            'profile_pic': row['user'].profile.profile_pic if hasattr(row['user'], 'profile') else None,
+        }
+        for row in window_ranking(pool, weeks=last_weeks(weeks), rounds=rounds)
+    ]
     
     context = {
         'pool': pool,
         'weekly_ranking': weekly_ranking,
         'active_tab': 'ranking',
-        'ranking_period': 'weekly'
+        'ranking_period': 'rounds' if rounds else 'weekly',
+        'weeks': weeks,
+        'rounds': rounds,
     }
     
     return render(request, 'pools/ranking_weekly.html', context)
 
+def streaming_csv(request, filename, header, rows):
+    """Resposta CSV em streaming; com ?gzip=1 o arquivo é comprimido durante o envio"""
+    lines = csv_lines(header, rows)
+    if request.GET.get('gzip'):
+        response = StreamingHttpResponse(gzip_stream(lines), content_type='application/gzip')
+        filename += '.gz'
+    else:
+        response = StreamingHttpResponse(lines, content_type='text/csv')
+    response['Content-Disposition'] = f'attachment; filename="{filename}"'
+    return response
+
 @login_required
 def export_ranking(request, slug):
-    """Exporta o ranking para arquivo CSV"""
+    """Exporta o ranking para arquivo CSV (em streaming)"""
     pool = get_object_or_404(Pool, slug=slug)
     
     # Verifica se o usuário tem acesso
     if request.user != pool.owner and request.user not in pool.participants.all():
         messages.error(request, "Você não tem acesso para exportar este ranking.")
         return redirect('pools:discover')
-        
-    participants = Participation.objects.filter(pool=pool).select_related('user').order_by('-points')
-    
-    # Cria o arquivo CSV
-    response = HttpResponse(content_type='text/csv')
-    response['Content-Disposition'] = f'attachment; filename="{pool.name}_ranking.csv"'
     
-    writer = csv.writer(response)
-    writer.writerow(['Posição', 'Usuário', 'Pontos', 'Apostas', 'Aproveitamento (%)'])
+    return streaming_csv(request, f"{pool.slug}_ranking.csv", RANKING_HEADER, ranking_rows(pool))
+
+@login_required
+def export_bets(request, slug):
+    """Exporta a matriz de apostas (participante x partida já iniciada) para CSV, em streaming"""
+    pool = get_object_or_404(Pool, slug=slug)
     
-    rank = 1
-    previous_points = None
-    for participant in participants:
-        if previous_points is not None and participant.points != previous_points:
-            rank += 1
-        writer.writerow([
-            rank,
-            participant.user.username,
-            participant.points,
-            participant.total_bets,
-            participant.accuracy
-        ])
-        previous_points = participant.points
+    if request.user != pool.owner and request.user not in pool.participants.all():
+        messages.error(request, "Você não tem acesso para exportar as apostas deste bolão.")
+        return redirect('pools:discover')
     
-    return response
+    return streaming_csv(request, f"{pool.slug}_apostas.csv", BETS_HEADER, bets_matrix_rows(pool))
 
 class InvitationCreateView(LoginRequiredMixin, View):
     """View para enviar convites para um bolão"""
@@ -12,6 +12,7 @@ from datetime import timedelta
 from .forms import CustomUserCreationForm, UserProfileForm, ProfileEditForm
 from .models import CustomUser
 from pools.models import Pool, Participation, Bet, Match
+from pools.leaderboard import user_positions
 
 # Adicione esta função auxiliar
 def cleanup_profile_pictures(user):
@@ -105,6 +106,19 @@ def edit_profile(request):
     
     return render(request, 'users/edit_profile.html', {'form': form})
 
+def pool_rankings(user, pools):
+    """Posição do usuário em cada bolão, lida de uma vez do leaderboard materializado"""
+    pools = list(pools)
+    positions = user_positions(user, [pool.id for pool in pools])
+    return [
+        {
+            'pool': pool,
+            'position': positions[pool.id]['position'] or '-',
+            'total_participants': positions[pool.id]['total_participants'],
+        }
+        for pool in pools
+    ]
+
 @login_required
 def dashboard(request):
     user = request.user
@@ -142,33 +156,8 @@ def dashboard(request):
         # Se o modelo Match não existir ou houver erro, usar lista vazia
         upcoming_matches = []
     
-    # Ranking dos pools do usuário (top 3 posições)
-    user_rankings = []
-    for pool in user_pools[:3]:
-        try:
-            # Calcular ranking simples baseado nos pontos
-            pool_bets = Bet.objects.filter(pool=pool).values('user').annotate(
-                total_points=Sum('points_earned')
-            ).order_by('-total_points')
-            
-            user_position = None
-            for index, bet_info in enumerate(pool_bets, 1):
-                if bet_info['user'] == user.id:
-                    user_position = index
-                    break
-            
-            user_rankings.append({
-                'pool': pool,
-                'position': user_position or '-',
-                'total_participants': pool_bets.count()
-            })
-        except:
-            # Em caso de erro, adicionar dados básicos
-            user_rankings.append({
-                'pool': pool,
-                'position': '-',
-                'total_participants': pool.participants.count()
-            })
+    # Ranking dos pools do usuário (top 3 posições), lido do leaderboard materializado
+    user_rankings = pool_rankings(user, user_pools[:3])
     
     # Dados para gráfico de performance (últimos 10 jogos)
     recent_bets = user_bets.order_by('-id')[:10]
@@ -236,30 +225,7 @@ class DashboardView(LoginRequiredMixin, TemplateView):
         except:
             upcoming_matches = []
         
-        user_rankings = []
-        for pool in user_pools[:3]:
-            try:
-                pool_bets = Bet.objects.filter(pool=pool).values('user').annotate(
-                    total_points=Sum('points_earned')
-                ).order_by('-total_points')
-                
-                user_position = None
-                for index, bet_info in enumerate(pool_bets, 1):
-                    if bet_info['user'] == user.id:
-                        user_position = index
-                        break
-                
-                user_rankings.append({
-                    'pool': pool,
-                    'position': user_position or '-',
-                    'total_participants': pool_bets.count()
-                })
-            except:
-                user_rankings.append({
-                    'pool': pool,
-                    'position': '-',
-                    'total_participants': pool.participants.count()
-                })
+        user_rankings = pool_rankings(user, user_pools[:3])
         
         recent_bets = user_bets.order_by('-id')[:10]
         performance_data = []